@@ -0,0 +1,42 @@
+"""Add assignment_events invalidation log
+
+Revision ID: 20261016_assignment_events
+Revises: 20261016_geocoding
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261016_assignment_events'
+down_revision = '20261016_geocoding'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if not inspector.has_table('assignment_events'):
+        op.create_table('assignment_events',
+            sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+            sa.Column('kind', sa.String(length=32), nullable=False),
+            sa.Column('order_id', sa.BigInteger(), nullable=True),
+            sa.Column('driver_id', sa.BigInteger(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_assignment_events_created_at', 'assignment_events', ['created_at'])
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if inspector.has_table('assignment_events'):
+        op.drop_index('ix_assignment_events_created_at', table_name='assignment_events')
+        op.drop_table('assignment_events')
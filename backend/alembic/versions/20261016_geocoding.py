@@ -0,0 +1,63 @@
+"""Add customer coordinates and geocode_cache table
+
+Revision ID: 20261016_geocoding
+Revises: 20261016_jobs_run_at
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261016_geocoding'
+down_revision = '20261016_jobs_run_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if inspector.has_table('customers'):
+        columns = {c['name'] for c in inspector.get_columns('customers')}
+        if 'lat' not in columns:
+            op.add_column('customers', sa.Column('lat', sa.Numeric(10, 6), nullable=True))
+        if 'lng' not in columns:
+            op.add_column('customers', sa.Column('lng', sa.Numeric(10, 6), nullable=True))
+        if 'geocode_source' not in columns:
+            op.add_column('customers', sa.Column('geocode_source', sa.String(length=20), nullable=True))
+
+    if not inspector.has_table('geocode_cache'):
+        op.create_table('geocode_cache',
+            sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+            sa.Column('address_key', sa.String(length=64), nullable=False),
+            sa.Column('normalized_address', sa.Text(), nullable=False),
+            sa.Column('lat', sa.Numeric(10, 6), nullable=True),
+            sa.Column('lng', sa.Numeric(10, 6), nullable=True),
+            sa.Column('provider', sa.String(length=20), nullable=False),
+            sa.Column('hits', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.Column('last_used_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_geocode_cache_address_key', 'geocode_cache', ['address_key'], unique=True)
+        op.create_index('ix_geocode_cache_last_used_at', 'geocode_cache', ['last_used_at'])
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if inspector.has_table('geocode_cache'):
+        op.drop_index('ix_geocode_cache_last_used_at', table_name='geocode_cache')
+        op.drop_index('ix_geocode_cache_address_key', table_name='geocode_cache')
+        op.drop_table('geocode_cache')
+
+    if inspector.has_table('customers'):
+        columns = {c['name'] for c in inspector.get_columns('customers')}
+        for name in ('geocode_source', 'lng', 'lat'):
+            if name in columns:
+                op.drop_column('customers', name)
@@ -0,0 +1,61 @@
+"""Add jobs.run_at and coalesce queued AUTO_ASSIGN jobs
+
+Revision ID: 20261016_jobs_run_at
+Revises: bead299a79e1
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261016_jobs_run_at'
+down_revision = 'bead299a79e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table('jobs'):
+        return
+
+    columns = {c['name'] for c in inspector.get_columns('jobs')}
+    if 'run_at' not in columns:
+        op.add_column('jobs', sa.Column('run_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Collapse any duplicate queued AUTO_ASSIGN jobs before adding the unique index
+    connection.execute(sa.text("""
+        DELETE FROM jobs
+         WHERE kind = 'AUTO_ASSIGN' AND status = 'queued'
+           AND id NOT IN (
+               SELECT min(id) FROM jobs WHERE kind = 'AUTO_ASSIGN' AND status = 'queued'
+           )
+    """))
+
+    indexes = {i['name'] for i in inspector.get_indexes('jobs')}
+    if 'uq_jobs_auto_assign_queued' not in indexes:
+        op.create_index(
+            'uq_jobs_auto_assign_queued',
+            'jobs',
+            ['kind'],
+            unique=True,
+            postgresql_where=sa.text("kind = 'AUTO_ASSIGN' AND status = 'queued'"),
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table('jobs'):
+        return
+
+    indexes = {i['name'] for i in inspector.get_indexes('jobs')}
+    if 'uq_jobs_auto_assign_queued' in indexes:
+        op.drop_index('uq_jobs_auto_assign_queued', table_name='jobs')
+    columns = {c['name'] for c in inspector.get_columns('jobs')}
+    if 'run_at' in columns:
+        op.drop_column('jobs', 'run_at')
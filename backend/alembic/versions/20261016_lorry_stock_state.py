@@ -0,0 +1,81 @@
+"""Add lorry_stock_state and lorry_stock_checkpoints
+
+Revision ID: 20261016_lorry_stock_state
+Revises: 20261016_order_balances
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261016_lorry_stock_state'
+down_revision = '20261016_order_balances'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if not inspector.has_table('lorry_stock_state'):
+        op.create_table('lorry_stock_state',
+            sa.Column('lorry_id', sa.String(length=50), nullable=False),
+            sa.Column('uid', sa.String(length=100), nullable=False),
+            sa.Column('action', sa.String(length=20), nullable=False),
+            sa.Column('transaction_id', sa.BigInteger(), nullable=False),
+            sa.Column('transaction_date', sa.DateTime(timezone=True), nullable=False),
+            sa.PrimaryKeyConstraint('lorry_id', 'uid')
+        )
+        op.create_index('ix_lorry_stock_state_lorry_action', 'lorry_stock_state', ['lorry_id', 'action'])
+        op.create_index('ix_lorry_stock_state_lorry_date', 'lorry_stock_state', ['lorry_id', 'transaction_date'])
+
+        # Unlike checkpoints, the current state must be complete from the start
+        if inspector.has_table('lorry_stock_transactions'):
+            op.execute("""
+                INSERT INTO lorry_stock_state (lorry_id, uid, action, transaction_id, transaction_date)
+                SELECT lorry_id, uid, action, id, transaction_date
+                FROM (
+                    SELECT lorry_id, uid, action, id, transaction_date,
+                           row_number() OVER (
+                               PARTITION BY lorry_id, uid
+                               ORDER BY transaction_date DESC, id DESC
+                           ) AS rn
+                    FROM lorry_stock_transactions
+                ) latest
+                WHERE rn = 1
+            """)
+
+    if inspector.has_table('lorry_stock_transactions'):
+        indexes = {ix['name'] for ix in inspector.get_indexes('lorry_stock_transactions')}
+        if 'ix_lorry_stock_transactions_lorry_date' not in indexes:
+            op.create_index('ix_lorry_stock_transactions_lorry_date', 'lorry_stock_transactions',
+                            ['lorry_id', 'transaction_date'])
+
+    if not inspector.has_table('lorry_stock_checkpoints'):
+        op.create_table('lorry_stock_checkpoints',
+            sa.Column('lorry_id', sa.String(length=50), nullable=False),
+            sa.Column('as_of_date', sa.Date(), nullable=False),
+            sa.Column('uids', sa.JSON(), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('lorry_id', 'as_of_date')
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if inspector.has_table('lorry_stock_checkpoints'):
+        op.drop_table('lorry_stock_checkpoints')
+    if inspector.has_table('lorry_stock_transactions'):
+        indexes = {ix['name'] for ix in inspector.get_indexes('lorry_stock_transactions')}
+        if 'ix_lorry_stock_transactions_lorry_date' in indexes:
+            op.drop_index('ix_lorry_stock_transactions_lorry_date', table_name='lorry_stock_transactions')
+    if inspector.has_table('lorry_stock_state'):
+        op.drop_index('ix_lorry_stock_state_lorry_date', table_name='lorry_stock_state')
+        op.drop_index('ix_lorry_stock_state_lorry_action', table_name='lorry_stock_state')
+        op.drop_table('lorry_stock_state')
@@ -0,0 +1,48 @@
+"""Add order_balances snapshot table
+
+Revision ID: 20261016_order_balances
+Revises: 20261016_parse_cache
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261016_order_balances'
+down_revision = '20261016_parse_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    # Rows are filled lazily on first read, so no backfill is needed here
+    if not inspector.has_table('order_balances'):
+        op.create_table('order_balances',
+            sa.Column('order_id', sa.BigInteger(), nullable=False),
+            sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+            sa.Column('computed_version', sa.BigInteger(), nullable=True),
+            sa.Column('expected', sa.Numeric(12, 2), nullable=True),
+            sa.Column('paid', sa.Numeric(12, 2), nullable=True),
+            sa.Column('balance', sa.Numeric(12, 2), nullable=True),
+            sa.Column('as_of', sa.Date(), nullable=True),
+            sa.Column('valid_until', sa.Date(), nullable=True),
+            sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('order_id')
+        )
+        op.create_index('ix_order_balances_valid_until', 'order_balances', ['valid_until'])
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if inspector.has_table('order_balances'):
+        op.drop_index('ix_order_balances_valid_until', table_name='order_balances')
+        op.drop_table('order_balances')
@@ -0,0 +1,46 @@
+"""Add parse_cache table for LLM parse results
+
+Revision ID: 20261016_parse_cache
+Revises: 20261016_assignment_events
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261016_parse_cache'
+down_revision = '20261016_assignment_events'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if not inspector.has_table('parse_cache'):
+        op.create_table('parse_cache',
+            sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+            sa.Column('cache_key', sa.String(length=64), nullable=False),
+            sa.Column('stage', sa.String(length=32), nullable=False),
+            sa.Column('result', sa.JSON(), nullable=False),
+            sa.Column('hits', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_parse_cache_cache_key', 'parse_cache', ['cache_key'], unique=True)
+        op.create_index('ix_parse_cache_expires_at', 'parse_cache', ['expires_at'])
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if inspector.has_table('parse_cache'):
+        op.drop_index('ix_parse_cache_expires_at', table_name='parse_cache')
+        op.drop_index('ix_parse_cache_cache_key', table_name='parse_cache')
+        op.drop_table('parse_cache')
@@ -0,0 +1,42 @@
+"""Add pod_photo_uploads staging table for POD_PHOTO jobs
+
+Revision ID: 20261016_pod_photo_uploads
+Revises: 20261016_sku_alias_updated_at
+Create Date: 2026-10-16 19:00:00.000000
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261016_pod_photo_uploads'
+down_revision = '20261016_sku_alias_updated_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if not inspector.has_table('pod_photo_uploads'):
+        op.create_table('pod_photo_uploads',
+            sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+            sa.Column('trip_id', sa.BigInteger(), nullable=False),
+            sa.Column('data', sa.LargeBinary(), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.ForeignKeyConstraint(['trip_id'], ['trips.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_pod_photo_uploads_trip_id', 'pod_photo_uploads', ['trip_id'])
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if inspector.has_table('pod_photo_uploads'):
+        op.drop_index('ix_pod_photo_uploads_trip_id', table_name='pod_photo_uploads')
+        op.drop_table('pod_photo_uploads')
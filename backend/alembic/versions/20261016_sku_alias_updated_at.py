@@ -0,0 +1,42 @@
+"""Add sku_alias.updated_at for the SKU index fingerprint
+
+Revision ID: 20261016_sku_alias_updated_at
+Revises: 20261016_uid_search
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261016_sku_alias_updated_at'
+down_revision = '20261016_uid_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table('sku_alias'):
+        return
+
+    columns = {c['name'] for c in inspector.get_columns('sku_alias')}
+    if 'updated_at' not in columns:
+        op.add_column(
+            'sku_alias',
+            sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.current_timestamp()),
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table('sku_alias'):
+        return
+
+    columns = {c['name'] for c in inspector.get_columns('sku_alias')}
+    if 'updated_at' in columns:
+        op.drop_column('sku_alias', 'updated_at')
@@ -0,0 +1,52 @@
+"""Indexes for UID search
+
+Revision ID: 20261016_uid_search
+Revises: 20261016_uid_sequences
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261016_uid_search'
+down_revision = '20261016_uid_sequences'
+branch_labels = None
+depends_on = None
+
+
+def _index_names(inspector, table):
+    return {ix['name'] for ix in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if inspector.has_table('item'):
+        if connection.dialect.name == 'postgresql':
+            # ILIKE '%...%' on uid / oem_serial
+            op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            op.execute("CREATE INDEX IF NOT EXISTS ix_item_uid_trgm ON item USING gin (uid gin_trgm_ops)")
+            op.execute("CREATE INDEX IF NOT EXISTS ix_item_oem_serial_trgm ON item USING gin (oem_serial gin_trgm_ops)")
+        elif connection.dialect.name == 'sqlite' and 'ix_item_uid_serial' not in _index_names(inspector, 'item'):
+            op.create_index('ix_item_uid_serial', 'item', ['uid', 'oem_serial'])
+
+    # Current location lookup by UID across lorries
+    if inspector.has_table('lorry_stock_state') and 'ix_lorry_stock_state_uid' not in _index_names(inspector, 'lorry_stock_state'):
+        op.create_index('ix_lorry_stock_state_uid', 'lorry_stock_state', ['uid'])
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if inspector.has_table('lorry_stock_state') and 'ix_lorry_stock_state_uid' in _index_names(inspector, 'lorry_stock_state'):
+        op.drop_index('ix_lorry_stock_state_uid', table_name='lorry_stock_state')
+    if connection.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_item_oem_serial_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_item_uid_trgm")
+    elif inspector.has_table('item') and 'ix_item_uid_serial' in _index_names(inspector, 'item'):
+        op.drop_index('ix_item_uid_serial', table_name='item')
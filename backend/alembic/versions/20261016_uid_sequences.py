@@ -0,0 +1,39 @@
+"""Add uid_sequences counter table
+
+Revision ID: 20261016_uid_sequences
+Revises: 20261016_lorry_stock_state
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261016_uid_sequences'
+down_revision = '20261016_lorry_stock_state'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    # Counters are seeded from existing item UIDs on first use of each prefix
+    if not inspector.has_table('uid_sequences'):
+        op.create_table('uid_sequences',
+            sa.Column('prefix', sa.String(length=64), nullable=False),
+            sa.Column('last_value', sa.BigInteger(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('prefix')
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if inspector.has_table('uid_sequences'):
+        op.drop_table('uid_sequences')
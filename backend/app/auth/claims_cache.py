@@ -0,0 +1,101 @@
+"""In-process caches for Firebase driver authentication
+
+The driver app polls several endpoints every few seconds, and each call used
+to verify the ID token signature and find the Driver (and User) rows.
+
+- ``claims_cache``: verified claims keyed by a SHA-256 of the raw token, kept
+  until the token's ``exp`` (or ``AUTH_CLAIMS_CACHE_MAX_SECS`` if shorter).
+- ``identity_cache``: the Driver and User ids for a Firebase uid, kept
+  ``AUTH_IDENTITY_CACHE_SECS``. Requests load the rows by primary key, so edits
+  and deactivation are seen at once; only the lookup by Firebase uid (and the
+  first-login sync) is skipped.
+
+Revocation: with ``AUTH_CHECK_REVOKED`` the Firebase revocation check runs on
+every cache miss; ``AUTH_CLAIMS_CACHE_MAX_SECS`` bounds how long a revoked or
+disabled token can keep working from cache. ``AUTH_CLAIMS_CACHE_SIZE=0``
+turns caching off.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.config import settings
+
+
+class TTLCache:
+    """Thread-safe LRU with a per-entry expiry and hit/miss counters."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any, ttl: float) -> None:
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+claims_cache = TTLCache(settings.AUTH_CLAIMS_CACHE_SIZE)
+identity_cache = TTLCache(settings.AUTH_CLAIMS_CACHE_SIZE)
+
+
+def token_key(id_token: str) -> str:
+    return hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+
+
+def claims_ttl(claims: Dict[str, Any]) -> float:
+    """Seconds the verified ``claims`` may be reused."""
+    ttl = float(claims.get("exp", 0)) - time.time()
+    if settings.AUTH_CLAIMS_CACHE_MAX_SECS > 0:
+        ttl = min(ttl, settings.AUTH_CLAIMS_CACHE_MAX_SECS)
+    return ttl
+
+
+def auth_cache_stats() -> Dict[str, Any]:
+    return {"claims": claims_cache.stats(), "identity": identity_cache.stats()}
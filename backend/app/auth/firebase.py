@@ -9,9 +9,11 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
+from ..core.config import settings
 from ..db import get_session
 from ..models import Driver, User, Role
 from ..core.security import hash_password
+from .claims_cache import claims_cache, claims_ttl, identity_cache, token_key
 
 firebase_app = None
 security = HTTPBearer()
@@ -29,8 +31,15 @@ def _get_app():
 
 
 def verify_firebase_id_token(id_token: str) -> Dict[str, Any]:
-    app = _get_app()
-    return firebase_auth.verify_id_token(id_token, app=app)
+    key = token_key(id_token)
+    claims = claims_cache.get(key)
+    if claims is None:
+        app = _get_app()
+        claims = firebase_auth.verify_id_token(
+            id_token, app=app, check_revoked=settings.AUTH_CHECK_REVOKED
+        )
+        claims_cache.put(key, claims, claims_ttl(claims))
+    return claims
 
 
 def get_firebase_user(uid: str) -> Dict[str, Any]:
@@ -100,26 +109,37 @@ def driver_auth(
         raise HTTPException(status_code=401, detail="Invalid token") from exc
     firebase_uid = claims["uid"]
 
-    # Fetch complete user data from Firebase Auth
-    print(f"🔍 FIREBASE FETCH: Getting complete user data for UID {firebase_uid}")
-    firebase_user = get_firebase_user(firebase_uid)
-
-    if not firebase_user:
-        raise HTTPException(
-            status_code=401, detail="Failed to fetch user data from Firebase"
-        )
-
-    # Extract data from Firebase user record
-    name = firebase_user.get("display_name")
-    phone = firebase_user.get("phone_number")
-    email = firebase_user.get("email")
-
-    print(f"🔍 FIREBASE DATA: name='{name}', phone='{phone}', email='{email}'")
+    # Recently resolved driver: primary-key loads only, so the rows are current
+    identity = identity_cache.get(firebase_uid)
+    if identity is not None:
+        driver_id, user_id = identity
+        driver = db.get(Driver, driver_id)
+        if driver is not None and driver.firebase_uid == firebase_uid:
+            request.state.user = db.get(User, user_id) if user_id is not None else None
+            request.state.driver = driver
+            return driver
+        identity_cache.invalidate(firebase_uid)
 
     # Try to find existing driver by Firebase UID
     driver = db.query(Driver).filter(Driver.firebase_uid == firebase_uid).one_or_none()
 
     if not driver:
+        # Fetch complete user data from Firebase Auth
+        print(f"🔍 FIREBASE FETCH: Getting complete user data for UID {firebase_uid}")
+        firebase_user = get_firebase_user(firebase_uid)
+
+        if not firebase_user:
+            raise HTTPException(
+                status_code=401, detail="Failed to fetch user data from Firebase"
+            )
+
+        # Extract data from Firebase user record
+        name = firebase_user.get("display_name")
+        phone = firebase_user.get("phone_number")
+        email = firebase_user.get("email")
+
+        print(f"🔍 FIREBASE DATA: name='{name}', phone='{phone}', email='{email}'")
+
         # Check if there's an existing driver by name (admin-created) that we should update
         if name:
             existing_driver = (
@@ -186,6 +206,11 @@ def driver_auth(
         db.rollback()
         request.state.user = None
     request.state.driver = driver
+    identity_cache.put(
+        firebase_uid,
+        (driver.id, request.state.user.id if request.state.user is not None else None),
+        settings.AUTH_IDENTITY_CACHE_SECS,
+    )
     return driver
 
 
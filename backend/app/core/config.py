@@ -17,10 +17,61 @@ class Settings(BaseSettings):
     TAX_LABEL: str = "SST"
     TAX_PERCENT: float = 0.0
 
+    # HTTP
+    HTTP_THREADPOOL_SIZE: int = 15  # concurrent sync handlers per web process; capped at DB pool_size + max_overflow
+    DB_REQUEST_STATEMENT_WARN: int = 100  # log requests running at least this many statements
+    DB_POOL_WAIT_WARN_MS: float = 250.0  # ... or waiting this long for a pooled connection
+
+    # Documents
+    DOCUMENT_CACHE_MAX_MB: int = 64  # rendered PDFs kept per process (0 disables)
+    DOCUMENT_ASSET_RETRY_SECS: float = 300.0  # back-off after a logo/QR download fails
+    DOCUMENT_RENDER_PROCESSES: int = 0  # batch render processes in app.worker (0 = one per core)
+    DOCUMENT_BATCH_CHUNK: int = 10  # orders per process pool task
+    DOCUMENT_BATCH_MAX_ORDERS: int = 2000
+
+    # File storage
+    STORAGE_BACKEND: str = "firebase"  # firebase | local (LOCAL_STORAGE_DIR served at LOCAL_STORAGE_BASE_URL)
+    LOCAL_STORAGE_DIR: str = "media"
+    LOCAL_STORAGE_BASE_URL: str = "/media"
+
+    # Push notifications
+    FCM_OUTBOX_ENABLED: bool = True  # deliver assignment pushes from app.worker (PUSH_NOTIFY jobs)
+    FCM_CONCURRENCY: int = 8  # parallel sends (and HTTP/2 connections) per delivery
+    FCM_TOKEN_REFRESH_MARGIN_SECS: float = 300.0  # refresh the cached OAuth token this long before expiry
+    FCM_RETRY_MAX_ATTEMPTS: int = 5  # PUSH_NOTIFY deliveries per notification before failed sends are dropped
+    FCM_RETRY_BACKOFF_SECS: float = 60.0  # delay of the first follow-up delivery, doubling per attempt
+
+    # Exports
+    EXPORT_BATCH_SIZE: int = 1000  # rows fetched per server-side cursor batch
+    EXPORT_LINK_TTL_MINUTES: int = 60  # signed download links for background exports
+
     # Worker
     WORKER_BATCH_SIZE: int = 10
     WORKER_POLL_SECS: float = 1.0
     WORKER_MAX_ATTEMPTS: int = 5
+    WORKER_LISTEN_ENABLED: bool = True  # wake on jobs NOTIFY instead of tight polling
+    WORKER_IDLE_POLL_SECS: float = 30.0  # safety-net poll while listening
+    WORKER_CONCURRENCY: int = 5  # executor threads; caps jobs claimed per replica
+    WORKER_LEASE_SECS: float = 300.0  # running jobs without a heartbeat this long are requeued
+    WORKER_RETRY_BACKOFF_SECS: float = 30.0  # first retry delay for retryable job kinds, doubling per attempt
+    AUTO_ASSIGN_DEBOUNCE_SECS: float = 15.0  # orders created within this window share one assignment pass
+    ASSIGNMENT_ENGINE: str = "local"  # local | llm (llm falls back to local on failure)
+    ASSIGNMENT_MAX_ORDERS_PER_DRIVER: int = 20
+    ASSIGNMENT_STATE_MAX_AGE_SECS: float = 900.0  # full rebuild of cached assignment state at least this often
+    ASSIGNMENT_EVENT_LOOKBACK_SECS: float = 300.0  # re-read recent events in case they committed out of id order
+
+    # Geocoding
+    GEOCODER: str = "none"  # none | nominatim | google
+    GOOGLE_MAPS_API_KEY: Optional[str] = None
+    GEOCODE_CACHE_MAX_ROWS: int = 50000
+    GEOCODE_NEGATIVE_TTL_DAYS: int = 7  # retry addresses the geocoder could not resolve
+    GEOCODE_MAX_LOOKUPS_PER_PASS: int = 25  # provider calls per assignment pass; cache hits are free
+
+    # LLM parse cache
+    PARSE_CACHE_ENABLED: bool = True
+    PARSE_CACHE_TTL_HOURS: float = 72.0
+    PARSE_CACHE_MEMORY_ENTRIES: int = 512  # in-process LRU in front of the parse_cache table
+    CLASSIFIER_RULES_ENABLED: bool = True  # settle clear-cut DELIVERY/RETURN messages without the LLM
 
     # Auth
     JWT_SECRET: str = Field(env="JWT_SECRET")
@@ -29,11 +80,17 @@ class Settings(BaseSettings):
     
     # Firebase
     FIREBASE_SERVICE_ACCOUNT_JSON: Optional[str] = None
+    AUTH_CLAIMS_CACHE_SIZE: int = 2048  # verified ID tokens kept per process (0 disables both auth caches)
+    AUTH_CLAIMS_CACHE_MAX_SECS: float = 0.0  # reuse claims at most this long (0 = until the token's exp)
+    AUTH_CHECK_REVOKED: bool = False  # also ask Firebase whether the token was revoked on each cache miss
+    AUTH_IDENTITY_CACHE_SECS: float = 30.0  # driver/user ids reused for a uid this long
     ADMIN_EMAILS: Optional[str] = None
     
     # UID Inventory System - Hard-coded to be enabled across all environments
     UID_INVENTORY_ENABLED: bool = True
     UID_SCAN_REQUIRED_AFTER_POD: bool = True
+    UID_BULK_GENERATE_MAX: int = 1000  # items per /inventory/bulk-generate request
+    UID_SEARCH_MAX_LIMIT: int = 200  # page size cap for /inventory/uid/search
     
     @property
     def uid_inventory_mode(self) -> str:
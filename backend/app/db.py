@@ -1,6 +1,19 @@
+import contextvars
+import logging
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from sqlalchemy import create_engine, event
+from sqlalchemy import exc as sa_exc
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+
+from .core.config import settings
+
+logger = logging.getLogger(__name__)
 
 def _coerce_psycopg(url: str) -> str:
     # Force SQLAlchemy to use psycopg v3 driver
@@ -16,14 +29,205 @@ def _append_sslmode(url: str) -> str:
         return f"{url}{sep}sslmode=require"
     return url
 
+def _env_int(name: str, default: int | None) -> int | None:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 if DATABASE_URL:
     DATABASE_URL = _coerce_psycopg(DATABASE_URL)
     DATABASE_URL = _append_sslmode(DATABASE_URL)
 
-engine = create_engine(DATABASE_URL) if DATABASE_URL else None
+# Connections per process. Size web pools so that
+# (gunicorn workers x (pool_size + max_overflow)) + worker replicas x worker pool
+# stays under the server's (or PgBouncer's) connection limit. A web process runs
+# at most pool_capacity() sync handlers at once (see main.size_threadpool), so
+# request threads never queue on the pool behind pool_timeout.
+POOL_PROFILES = {
+    # Request handlers: fail fast on exhaustion instead of queueing for 30s
+    "web": {"pool_size": 5, "max_overflow": 10, "pool_timeout": 10},
+    # app.worker: executor threads + the main loop and its maintenance pass
+    "worker": {
+        "pool_size": settings.WORKER_CONCURRENCY + 2,
+        "max_overflow": 2,
+        "pool_timeout": 30,
+    },
+    # One-off scripts and cron jobs: no idle connections left behind
+    "script": {"poolclass": NullPool},
+}
+
+DB_POOL_PROFILE = os.getenv("DB_POOL_PROFILE", "web")
+# Behind PgBouncer in transaction mode server-side prepared statements break
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "").lower() in ("1", "true", "yes")
+DB_SLOW_QUERY_MS = _env_float("DB_SLOW_QUERY_MS", 500.0)
+
+
+@dataclass
+class QueryStats:
+    """Statements run and pool wait time within one request or job."""
+    statements: int = 0
+    duration_ms: float = 0.0
+    pool_wait_ms: float = 0.0
+
+
+_query_stats: contextvars.ContextVar[QueryStats | None] = contextvars.ContextVar(
+    "query_stats", default=None
+)
+
+
+@contextmanager
+def track_queries():
+    """Collect QueryStats for everything this context (and threads it spawns) runs."""
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+class _PoolMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.timeouts = 0
+
+    def record(self, wait_ms: float, timed_out: bool):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+
+pool_metrics = _PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            wait_ms = (time.perf_counter() - start) * 1000
+            pool_metrics.record(wait_ms, timed_out)
+            stats = _query_stats.get()
+            if stats is not None:
+                stats.pool_wait_ms += wait_ms
+            if timed_out:
+                logger.error("db_pool_exhausted wait_ms=%.0f status=%s", wait_ms, self.status())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _handle_error(context):
+    # Failed statements never reach after_cursor_execute; drop their start time
+    if context.connection is not None and context.execution_context is not None:
+        starts = context.connection.info.get("query_start")
+        if starts:
+            starts.pop()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.duration_ms += elapsed_ms
+    if elapsed_ms >= DB_SLOW_QUERY_MS:
+        logger.warning("slow_query duration_ms=%.0f statement=%s", elapsed_ms, " ".join(statement.split())[:500])
+
+
+def make_engine(url: str, profile: str = "web"):
+    """Engine with the pool settings for ``profile`` (web, worker or script).
+
+    DB_POOL_SIZE, DB_MAX_OVERFLOW and DB_POOL_TIMEOUT override the profile.
+    """
+    options = dict(POOL_PROFILES.get(profile, POOL_PROFILES["web"]))
+    connect_args = {}
+    if url.startswith("postgresql"):
+        if options.get("poolclass") is not NullPool:
+            options["poolclass"] = TimedQueuePool
+            options["pool_size"] = _env_int("DB_POOL_SIZE", options["pool_size"])
+            options["max_overflow"] = _env_int("DB_MAX_OVERFLOW", options["max_overflow"])
+            options["pool_timeout"] = _env_float("DB_POOL_TIMEOUT", options["pool_timeout"])
+            options["pool_recycle"] = 1800
+        if DB_PGBOUNCER:
+            connect_args["prepare_threshold"] = None
+    else:
+        # SQLite and friends keep SQLAlchemy's default pool
+        options = {}
+    new_engine = create_engine(url, pool_pre_ping=True, connect_args=connect_args, **options)
+    event.listen(new_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(new_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(new_engine, "handle_error", _handle_error)
+    return new_engine
+
+
+engine = make_engine(DATABASE_URL, DB_POOL_PROFILE) if DATABASE_URL else None
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True) if engine else None
 
+
+def configure_engine(profile: str):
+    """Rebuild the process engine with another pool profile.
+
+    Call once at process start (app.worker, scripts) before any session is used;
+    ``SessionLocal`` is rebound in place so existing imports keep working.
+    """
+    global engine, DB_POOL_PROFILE
+    if not DATABASE_URL or profile == DB_POOL_PROFILE:
+        return engine
+    if engine is not None:
+        engine.dispose()
+    engine = make_engine(DATABASE_URL, profile)
+    DB_POOL_PROFILE = profile
+    SessionLocal.configure(bind=engine)
+    return engine
+
+
+def pool_capacity() -> int | None:
+    """Most connections this process's pool hands out at once; None if unbounded."""
+    if engine is None or not isinstance(engine.pool, QueuePool) or engine.pool._max_overflow < 0:
+        return None
+    return engine.pool.size() + engine.pool._max_overflow
+
+
+def pool_status() -> dict:
+    """Current pool occupancy and checkout wait totals for this process."""
+    status = {"profile": DB_POOL_PROFILE}
+    if engine is not None and isinstance(engine.pool, QueuePool):
+        status.update(
+            size=engine.pool.size(),
+            checked_out=engine.pool.checkedout(),
+            overflow=engine.pool.overflow(),
+            idle=engine.pool.checkedin(),
+        )
+    with pool_metrics.lock:
+        checkouts = pool_metrics.checkouts
+        status.update(
+            checkouts=checkouts,
+            wait_ms_avg=round(pool_metrics.wait_ms_total / checkouts, 2) if checkouts else 0.0,
+            wait_ms_max=round(pool_metrics.wait_ms_max, 2),
+            timeouts=pool_metrics.timeouts,
+        )
+    return status
+
 def get_session():
     if SessionLocal is None:
         raise RuntimeError("DATABASE_URL not configured for this environment.")
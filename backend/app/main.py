@@ -1,6 +1,9 @@
+import logging
 import os
+import time
+import anyio
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
@@ -9,6 +12,7 @@ from fastapi.staticfiles import StaticFiles
 load_dotenv()
 
 from .core.config import settings, cors_origins_list
+from .db import pool_capacity, track_queries
 from .routers import auth as auth_router
 from .routers import (
     health,
@@ -53,7 +57,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# No static file serving needed - all images served from Firebase Storage
+@app.on_event("startup")
+async def size_threadpool():
+    # Handlers and dependencies that use the sync Session are plain ``def`` and run
+    # in anyio's worker threads; this caps how many run at once per process. Never
+    # more than the pool can serve, or the extra threads just wait on pool_timeout.
+    threads = settings.HTTP_THREADPOOL_SIZE
+    capacity = pool_capacity()
+    if capacity is not None and threads > capacity:
+        logging.getLogger(__name__).warning(
+            "HTTP_THREADPOOL_SIZE=%s exceeds DB pool capacity %s; using %s", threads, capacity, capacity
+        )
+        threads = capacity
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+
+request_logger = logging.getLogger("app.requests")
+
+
+@app.middleware("http")
+async def db_accounting(request: Request, call_next):
+    started = time.perf_counter()
+    with track_queries() as stats:
+        response = await call_next(request)
+    duration_ms = (time.perf_counter() - started) * 1000
+    response.headers["Server-Timing"] = (
+        f'db;dur={stats.duration_ms:.1f};desc="{stats.statements} queries", '
+        f"pool;dur={stats.pool_wait_ms:.1f}, app;dur={duration_ms:.1f}"
+    )
+    if stats.statements >= settings.DB_REQUEST_STATEMENT_WARN or stats.pool_wait_ms >= settings.DB_POOL_WAIT_WARN_MS:
+        request_logger.warning(
+            "db_heavy_request method=%s path=%s status=%s duration_ms=%.0f statements=%s db_ms=%.0f pool_wait_ms=%.0f",
+            request.method,
+            request.url.path,
+            response.status_code,
+            duration_ms,
+            stats.statements,
+            stats.duration_ms,
+            stats.pool_wait_ms,
+        )
+    return response
+
+# Images are served from Firebase Storage; the local backend (dev/tests) serves its files here
+if settings.STORAGE_BACKEND == "local":
+    os.makedirs(settings.LOCAL_STORAGE_DIR, exist_ok=True)
+    app.mount(settings.LOCAL_STORAGE_BASE_URL, StaticFiles(directory=settings.LOCAL_STORAGE_DIR), name="media")
 
 app.include_router(health.router)
 app.include_router(auth_router.router)
@@ -26,6 +26,13 @@ from .lorry_assignment import LorryAssignment, LorryStockVerification, DriverHol
 from .lorry_stock_transaction import LorryStockTransaction
 from .uid_ledger import UIDLedgerEntry, LedgerEntrySource
 from .ai_verification_log import AIVerificationLog
+from .geocode_cache import GeocodeCache
+from .assignment_event import AssignmentEvent
+from .parse_cache import ParseCacheEntry
+from .order_balance import OrderBalance
+from .lorry_stock_state import LorryStockState, LorryStockCheckpoint
+from .uid_sequence import UIDSequence
+from .pod_photo_upload import PodPhotoUpload
 
 __all__ = [
     "Base",
@@ -64,4 +71,12 @@ __all__ = [
     "UIDLedgerEntry",
     "LedgerEntrySource",
     "AIVerificationLog",
+    "GeocodeCache",
+    "AssignmentEvent",
+    "ParseCacheEntry",
+    "OrderBalance",
+    "LorryStockState",
+    "LorryStockCheckpoint",
+    "UIDSequence",
+    "PodPhotoUpload",
 ]
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class AssignmentEvent(Base):
+    """Append-only log of changes that invalidate cached assignment state.
+
+    Written automatically on flush (see services/assignment_state.py) and read
+    by each process's AssignmentState to re-solve only what changed.
+    """
+    __tablename__ = "assignment_events"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(32), nullable=False)  # ORDER_CHANGED | DRIVER_CHANGED
+    order_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    driver_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
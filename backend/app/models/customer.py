@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import BigInteger, DateTime, String, Text, func
+from sqlalchemy import BigInteger, DateTime, Numeric, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column
 from .base import Base
 
@@ -10,5 +10,9 @@ class Customer(Base):
     phone: Mapped[str] = mapped_column(String(50), nullable=True, index=True)
     address: Mapped[str | None] = mapped_column(Text, nullable=True)
     map_url: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Resolved by services/geocoding.py; source is "map_url" or the geocoder name
+    lat: Mapped[float | None] = mapped_column(Numeric(10, 6), nullable=True)
+    lng: Mapped[float | None] = mapped_column(Numeric(10, 6), nullable=True)
+    geocode_source: Mapped[str | None] = mapped_column(String(20), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, Integer, Numeric, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class GeocodeCache(Base):
+    """Normalised address -> coordinates, so each address is geocoded once.
+
+    Rows with NULL lat/lng record a failed lookup and are retried after
+    GEOCODE_NEGATIVE_TTL_DAYS. Least recently used rows are evicted past
+    GEOCODE_CACHE_MAX_ROWS.
+    """
+    __tablename__ = "geocode_cache"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    address_key: Mapped[str] = mapped_column(String(64), unique=True, index=True, nullable=False)  # sha256 of normalised address
+    normalized_address: Mapped[str] = mapped_column(Text, nullable=False)
+    lat: Mapped[float | None] = mapped_column(Numeric(10, 6), nullable=True)
+    lng: Mapped[float | None] = mapped_column(Numeric(10, 6), nullable=True)
+    provider: Mapped[str] = mapped_column(String(20), nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    last_used_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, func, Enum as SQLEnum
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index, func, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from .base import Base
 import enum
@@ -30,6 +30,16 @@ class Item(Base):
     current_driver_id = Column(Integer, ForeignKey("drivers.id"), nullable=True)
     created_at = Column(DateTime, nullable=False, default=func.current_timestamp())
     
+    # Partial UID / serial search: pg_trgm indexes on Postgres; on SQLite a
+    # covering index so the uid-ordered scan never touches the table
+    __table_args__ = (
+        Index("ix_item_uid_trgm", "uid", postgresql_using="gin",
+              postgresql_ops={"uid": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_item_oem_serial_trgm", "oem_serial", postgresql_using="gin",
+              postgresql_ops={"oem_serial": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_item_uid_serial", "uid", "oem_serial").ddl_if(dialect="sqlite"),
+    )
+    
     # Relationships
     sku = relationship("SKU", back_populates="items")
     current_driver = relationship("Driver", foreign_keys=[current_driver_id])
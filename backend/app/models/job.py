@@ -1,10 +1,19 @@
-from sqlalchemy import BigInteger, DateTime, Text, Integer, String, func
+from sqlalchemy import BigInteger, DateTime, Index, Text, Integer, String, func, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 from .base import Base
 
 class Job(Base):
     __tablename__ = "jobs"
+    __table_args__ = (
+        # At most one queued AUTO_ASSIGN pass; further requests coalesce into it
+        Index(
+            "uq_jobs_auto_assign_queued",
+            "kind",
+            unique=True,
+            postgresql_where=text("kind = 'AUTO_ASSIGN' AND status = 'queued'"),
+        ),
+    )
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     kind: Mapped[str] = mapped_column(String(32), nullable=False)  # PARSE, CREATE, etc.
     payload: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default="{}")
@@ -12,5 +21,6 @@ class Job(Base):
     attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
     result: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    run_at: Mapped[str | None] = mapped_column(DateTime(timezone=True), nullable=True)  # not claimed before this time
     created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
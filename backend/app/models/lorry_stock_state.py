@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from sqlalchemy import BigInteger, Date, DateTime, Index, JSON, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class LorryStockState(Base):
+    """Latest ``lorry_stock_transactions`` row per (lorry, uid).
+
+    Maintained on flush (see services/lorry_stock_state.py), so current stock
+    is a lookup of the UIDs whose latest action is LOAD or COLLECTION instead
+    of a window over the lorry's whole history.
+    """
+    __tablename__ = "lorry_stock_state"
+
+    lorry_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    uid: Mapped[str] = mapped_column(String(100), primary_key=True)
+    action: Mapped[str] = mapped_column(String(20), nullable=False)
+    transaction_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    transaction_date: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_lorry_stock_state_lorry_action", "lorry_id", "action"),
+        Index("ix_lorry_stock_state_lorry_date", "lorry_id", "transaction_date"),
+        Index("ix_lorry_stock_state_uid", "uid"),
+    )
+
+
+class LorryStockCheckpoint(Base):
+    """UIDs on a lorry at the end of one KL business day.
+
+    Written daily by ``python -m app.scripts.checkpoint_lorry_stock``; an
+    as-of read replays only the transactions after the nearest checkpoint.
+    Checkpoints at or after the day of a back-dated transaction are deleted
+    when it is written.
+    """
+    __tablename__ = "lorry_stock_checkpoints"
+
+    lorry_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    as_of_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    uids: Mapped[list] = mapped_column(JSON, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
@@ -2,6 +2,7 @@ from datetime import datetime
 from sqlalchemy import (
     BigInteger,
     DateTime,
+    Index,
     String,
     ForeignKey,
     Text,
@@ -38,6 +39,11 @@ class LorryStockTransaction(Base):
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
 
+    __table_args__ = (
+        # Checkpoint deltas: one lorry's transactions in a date range
+        Index("ix_lorry_stock_transactions_lorry_date", "lorry_id", "transaction_date"),
+    )
+
     # Relationships
     order = relationship("Order")
     driver = relationship("Driver")
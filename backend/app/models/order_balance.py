@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import BigInteger, Date, DateTime, ForeignKey, Numeric, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class OrderBalance(Base):
+    """Materialized ``compute_balance`` result for one order.
+
+    ``version`` is bumped whenever the order, its plan, payments, trip or
+    adjustment orders change; the snapshot columns are current only while
+    ``computed_version`` equals it, and are recomputed on the next read
+    otherwise. ``valid_until`` is the last day the accrual part of ``expected``
+    holds; past it the row is rolled forward. NULL means it never changes
+    without another write.
+    """
+    __tablename__ = "order_balances"
+
+    order_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("orders.id", ondelete="CASCADE"), primary_key=True
+    )
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0")
+    computed_version: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    expected: Mapped[Decimal | None] = mapped_column(Numeric(12, 2), nullable=True)
+    paid: Mapped[Decimal | None] = mapped_column(Numeric(12, 2), nullable=True)
+    balance: Mapped[Decimal | None] = mapped_column(Numeric(12, 2), nullable=True)
+    as_of: Mapped[date | None] = mapped_column(Date, nullable=True)
+    valid_until: Mapped[date | None] = mapped_column(Date, nullable=True, index=True)
+    computed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
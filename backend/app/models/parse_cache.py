@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, Integer, String, JSON, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class ParseCacheEntry(Base):
+    """LLM parse result for one (stage, prompt version, normalised text).
+
+    ``cache_key`` is the sha256 of all three, so editing a prompt or schema
+    changes the key and old entries simply stop matching. Rows expire after
+    PARSE_CACHE_TTL_HOURS.
+    """
+    __tablename__ = "parse_cache"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    cache_key: Mapped[str] = mapped_column(String(64), unique=True, index=True, nullable=False)
+    stage: Mapped[str] = mapped_column(String(32), nullable=False)
+    result: Mapped[dict] = mapped_column(JSON, nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
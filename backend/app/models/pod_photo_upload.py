@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, ForeignKey, LargeBinary, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class PodPhotoUpload(Base):
+    """Original bytes of a POD photo waiting for its POD_PHOTO job.
+
+    Kept private in the database until the worker has rendered and uploaded
+    the variants (see services/pod_pipeline.py); the row is deleted once the
+    job succeeds or finally fails.
+    """
+    __tablename__ = "pod_photo_uploads"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    trip_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("trips.id"), nullable=False, index=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
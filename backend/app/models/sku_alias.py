@@ -11,6 +11,7 @@ class SKUAlias(Base):
     alias_text = Column(String, nullable=False)
     weight = Column(Integer, nullable=False, default=1)
     created_at = Column(DateTime, nullable=False, default=func.current_timestamp())
+    updated_at = Column(DateTime, nullable=False, default=func.current_timestamp(), onupdate=func.current_timestamp())
     
     # Constraints
     __table_args__ = (
@@ -54,6 +54,15 @@ class Trip(Base):
                 urls.append(url)
         return urls
 
+    @property
+    def pod_thumbnail_urls(self) -> list[str]:
+        """Thumbnail per PoD photo for list views; photos stored before size
+        variants existed have no thumbnail and fall back to the full image."""
+        return [
+            url[: -len("_full.jpg")] + "_thumb.jpg" if url.endswith("_full.jpg") else url
+            for url in self.pod_photo_urls
+        ]
+
     @property  
     def has_pod_photos(self) -> bool:
         """Check if at least one PoD photo is uploaded"""
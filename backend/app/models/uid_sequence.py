@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class UIDSequence(Base):
+    """Last sequence number handed out for one UID prefix.
+
+    A prefix is one (SKU, driver or ADMIN, date), e.g. ``SKU001-DRV003-20260316``.
+    Blocks are reserved by incrementing ``last_value`` in a single upsert (see
+    services/uid_sequence.py), so concurrent generators never share a number.
+    """
+    __tablename__ = "uid_sequences"
+
+    prefix: Mapped[str] = mapped_column(String(64), primary_key=True)
+    last_value: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
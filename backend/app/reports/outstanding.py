@@ -3,6 +3,9 @@ from datetime import date, datetime
 from decimal import Decimal
 from typing import Optional
 
+from sqlalchemy import Date, and_, case, extract, false, func, literal, or_, select
+from sqlalchemy.orm import aliased
+
 from ..services.ordersvc import _sum_posted_payments, q2
 
 DELIVERED_STATUSES = {"DELIVERED", "SUCCESS", "COMPLETED"}
@@ -138,3 +141,159 @@ def compute_balance(order, as_of: date, trip=None) -> Decimal:
     paid_parent = _sum_posted_payments(order)
     paid_adjustments = sum((_sum_posted_payments(ch) for ch in getattr(order, "adjustments", []) or []), DEC0)
     return q2(expected - q2(paid_parent + paid_adjustments))
+
+
+# --- Set-based engine -------------------------------------------------------
+#
+# The same expected/paid/balance rules as above, expressed in SQL so a report
+# can filter, paginate and total on the balance without loading ORM graphs.
+# Only dialect-neutral functions are used (date(), extract(), CASE).
+
+
+def _sql_months_between(start, as_of: date, cutoff=None):
+    """SQL twin of ``months_between`` for a date column ``start``."""
+    if cutoff is None:
+        end_before_as_of = false()
+        cutoff = literal(as_of, Date)
+    else:
+        end_before_as_of = and_(cutoff.isnot(None), cutoff < as_of)
+
+    def part(name):
+        return case((end_before_as_of, extract(name, cutoff)), else_=literal(getattr(as_of, name)))
+
+    months = (
+        (part("year") - extract("year", start)) * 12
+        + (part("month") - extract("month", start))
+        + case((part("day") >= extract("day", start), 1), else_=0)
+    )
+    end = case((end_before_as_of, cutoff), else_=literal(as_of, Date))
+    return case(
+        (or_(start.is_(None), start > as_of, end < start), 0),
+        (months < 0, 0),
+        else_=months,
+    )
+
+
+def _sql_cap(months, cap):
+    """``min(months, cap)`` when ``cap`` is set, else ``months``."""
+    return case((and_(cap.isnot(None), months > cap), cap), else_=months)
+
+
+def outstanding_rows(
+    as_of: date,
+    order_type: Optional[str] = None,
+    order_id: Optional[int] = None,
+    exclude_cleared: bool = True,
+):
+    """Subquery with one row per delivered order and its outstanding figures.
+
+    Columns: id, code, customer_name, type, status, expected, paid, fees,
+    balance, accrued. Mirrors ``compute_expected_for_order``/``compute_balance``
+    and ``calculate_plan_due`` for orders delivered on or before ``as_of``.
+    """
+    from ..models import Customer, Order, Payment, Plan, Trip
+
+    zero = literal(DEC0)
+    own_paid = (
+        select(Payment.order_id.label("order_id"), func.sum(Payment.amount).label("amount"))
+        .where(Payment.status == "POSTED")
+        .group_by(Payment.order_id)
+        .subquery()
+    )
+    adjustment = aliased(Order)
+    adjustment_paid = (
+        select(adjustment.parent_id.label("order_id"), func.sum(Payment.amount).label("amount"))
+        .join(Payment, Payment.order_id == adjustment.id)
+        .where(Payment.status == "POSTED", adjustment.parent_id.isnot(None))
+        .group_by(adjustment.parent_id)
+        .subquery()
+    )
+
+    order_type_u = func.upper(func.coalesce(Order.type, ""))
+    fees = (
+        func.coalesce(Order.delivery_fee, 0)
+        + func.coalesce(Order.return_delivery_fee, 0)
+        + func.coalesce(Order.penalty_fee, 0)
+    )
+    base = func.coalesce(Order.subtotal, 0) - func.coalesce(Order.discount, 0) + fees
+    monthly = func.coalesce(Plan.monthly_amount, 0)
+    cutoff = func.date(Order.returned_at)
+    delivered_on = func.date(Trip.delivered_at)
+    plan_months = case((Plan.months > 0, Plan.months), else_=None)
+
+    # compute_expected_for_order: month 1 is already in base
+    start = func.coalesce(func.date(Plan.start_date), delivered_on, func.date(Order.delivery_date))
+    months = _sql_months_between(start, as_of, cutoff)
+    additional = case((months > 1, months - 1), else_=0)
+    additional = case(
+        (order_type_u == "INSTALLMENT", _sql_cap(additional, plan_months - 1)),
+        else_=additional,
+    )
+    expected = case(
+        (order_type_u == "OUTRIGHT", base),
+        (or_(Plan.id.is_(None), monthly <= 0), base),
+        else_=base + monthly * additional,
+    )
+
+    # calculate_plan_due: from plan start (or delivery), first month included.
+    # Plan has no ``order`` relationship, so that function never sees a return
+    # cutoff or falls back to the order type; mirror it exactly.
+    plan_start = func.coalesce(func.date(Plan.start_date), delivered_on)
+    plan_type_u = func.upper(func.coalesce(Plan.plan_type, ""))
+    due_months = _sql_months_between(plan_start, as_of)
+    due_months = case((plan_type_u == "INSTALLMENT", _sql_cap(due_months, plan_months)), else_=due_months)
+    accrued = case((or_(Plan.id.is_(None), monthly <= 0), zero), else_=monthly * due_months)
+
+    paid = func.coalesce(own_paid.c.amount, 0) + func.coalesce(adjustment_paid.c.amount, 0)
+
+    stmt = (
+        select(
+            Order.id.label("id"),
+            Order.code.label("code"),
+            Customer.name.label("customer_name"),
+            Order.type.label("type"),
+            Order.status.label("status"),
+            expected.label("expected"),
+            paid.label("paid"),
+            fees.label("fees"),
+            (expected - paid).label("balance"),
+            accrued.label("accrued"),
+        )
+        .join(Trip, Order.id == Trip.order_id)
+        .join(Customer, Customer.id == Order.customer_id, isouter=True)
+        .join(Plan, Plan.order_id == Order.id, isouter=True)
+        .join(own_paid, own_paid.c.order_id == Order.id, isouter=True)
+        .join(adjustment_paid, adjustment_paid.c.order_id == Order.id, isouter=True)
+        .where(Trip.status == "DELIVERED")
+        .where(Trip.delivered_at.isnot(None))
+        .where(Trip.delivered_at <= datetime.combine(as_of, datetime.max.time()))
+    )
+    if order_id:
+        stmt = stmt.where(Order.id == order_id)
+    elif order_type and order_type != "ALL":
+        stmt = stmt.where(Order.type == order_type)
+    if exclude_cleared:
+        stmt = stmt.where(Order.status != "RETURNED")
+        stmt = stmt.where(~and_(Order.status == "CANCELLED", or_(Order.penalty_fee.is_(None), Order.penalty_fee <= 0)))
+    return stmt.subquery("outstanding")
+
+
+def outstanding_totals(db, rows, include_zero_balance: bool = False) -> dict:
+    """Count and grand totals over every row of ``outstanding_rows``, in one query."""
+    stmt = select(
+        func.count(),
+        func.coalesce(func.sum(rows.c.expected), 0),
+        func.coalesce(func.sum(rows.c.paid), 0),
+        func.coalesce(func.sum(rows.c.fees), 0),
+        func.coalesce(func.sum(rows.c.balance), 0),
+    )
+    if not include_zero_balance:
+        stmt = stmt.where(rows.c.balance > 0)
+    count, expected, paid, fees, balance = db.execute(stmt).one()
+    return {
+        "count": count,
+        "expected": q2(expected),
+        "paid": q2(paid),
+        "fees": q2(fees),
+        "balance": q2(balance),
+    }
@@ -31,7 +31,7 @@ def verify_development_environment() -> None:
 
 
 @router.delete("/delete-all-orders")
-async def delete_all_orders(
+def delete_all_orders(
     db: Session = Depends(get_session),
     current_user: User = Depends(verify_admin_access)
 ) -> Dict[str, Any]:
@@ -96,7 +96,7 @@ async def delete_all_orders(
 
 
 @router.delete("/delete-all-drivers")
-async def delete_all_drivers(
+def delete_all_drivers(
     db: Session = Depends(get_session),
     current_user: User = Depends(verify_admin_access)
 ) -> Dict[str, Any]:
@@ -148,7 +148,7 @@ async def delete_all_drivers(
 
 
 @router.delete("/delete-all-routes")
-async def delete_all_routes(
+def delete_all_routes(
     db: Session = Depends(get_session),
     current_user: User = Depends(verify_admin_access)
 ) -> Dict[str, Any]:
@@ -189,7 +189,7 @@ async def delete_all_routes(
 
 
 @router.post("/reset-database")
-async def reset_database(
+def reset_database(
     db: Session = Depends(get_session),
     current_user: User = Depends(verify_admin_access)
 ) -> Dict[str, Any]:
@@ -290,7 +290,7 @@ async def reset_database(
 
 
 @router.get("/system-stats")
-async def get_system_stats(
+def get_system_stats(
     db: Session = Depends(get_session),
     current_user: User = Depends(verify_admin_access)
 ) -> Dict[str, Any]:
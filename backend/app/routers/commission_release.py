@@ -38,7 +38,7 @@ class CommissionReleaseResponse(BaseModel):
 
 
 @router.post("/analyze/{trip_id}", response_model=dict)
-async def analyze_commission_eligibility(
+def analyze_commission_eligibility(
     trip_id: int,
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN, Role.CASHIER))
@@ -113,7 +113,7 @@ async def analyze_commission_eligibility(
 
 
 @router.post("/release", response_model=dict)
-async def release_commission(
+def release_commission(
     request: CommissionReleaseRequest,
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
@@ -240,7 +240,7 @@ async def release_commission(
 
 
 @router.get("/pending", response_model=dict)
-async def get_pending_commissions(
+def get_pending_commissions(
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN, Role.CASHIER))
 ):
@@ -288,7 +288,7 @@ async def get_pending_commissions(
 
 
 @router.post("/mark-cash-collected/{trip_id}", response_model=dict)
-async def mark_cash_collected(
+def mark_cash_collected(
     trip_id: int,
     notes: str = None,
     db: Session = Depends(get_session),
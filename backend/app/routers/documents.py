@@ -1,7 +1,16 @@
+import json
+from datetime import date
+from typing import List, Optional
+
 from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import RedirectResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
+from ..core.config import settings
 from ..db import get_session
 from ..models import Order, Payment, Role
+from ..services.background_jobs import JobStatus, job_service
+from ..services.document_batch import DOCUMENT_KINDS, OUTPUTS, create_batch_job, select_order_ids
 from ..services.documents import receipt_pdf, installment_agreement_pdf
 from ..auth.deps import require_roles
 
@@ -27,3 +36,49 @@ def installment(order_id: int, db: Session = Depends(get_session)):
         raise HTTPException(400, "No installment plan")
     pdf = installment_agreement_pdf(o, o.plan)
     return Response(content=pdf, media_type="application/pdf", headers={"Content-Disposition": f'inline; filename="instalment_{o.code}.pdf"'} )
+
+
+class DocumentBatchIn(BaseModel):
+    kind: str = "invoice"  # invoice | receipt (one per posted payment)
+    output: str = "zip"  # zip | pdf (merged)
+    order_ids: Optional[List[int]] = None
+    status: Optional[str] = None
+    type: Optional[str] = None
+    created_from: Optional[date] = None
+    created_to: Optional[date] = None
+
+
+@router.post("/batch")
+def create_document_batch(body: DocumentBatchIn, db: Session = Depends(get_session)):
+    """Render invoices or receipts for many orders in app.worker.
+
+    Poll ``/jobs/{job_id}`` for progress, then fetch ``/documents/batch/{job_id}/download``.
+    """
+    if body.kind not in DOCUMENT_KINDS:
+        raise HTTPException(400, f"kind must be one of {', '.join(DOCUMENT_KINDS)}")
+    if body.output not in OUTPUTS:
+        raise HTTPException(400, f"output must be one of {', '.join(OUTPUTS)}")
+    if not (body.order_ids or body.status or body.type or body.created_from or body.created_to):
+        raise HTTPException(400, "Give order_ids or at least one filter")
+    order_ids = select_order_ids(
+        db, body.order_ids, body.status, body.type, body.created_from, body.created_to
+    )
+    if not order_ids:
+        raise HTTPException(404, "No orders match")
+    if len(order_ids) > settings.DOCUMENT_BATCH_MAX_ORDERS:
+        raise HTTPException(400, f"At most {settings.DOCUMENT_BATCH_MAX_ORDERS} orders per batch")
+    job = create_batch_job(db, body.kind, order_ids, body.output)
+    return {"job_id": job.id, "status": "queued", "orders": len(order_ids)}
+
+
+@router.get("/batch/{job_id}/download")
+def download_document_batch(job_id: str, db: Session = Depends(get_session)):
+    job = job_service.get_job(db, job_id)
+    if not job or job.job_type != "render_documents":
+        raise HTTPException(404, "Batch not found")
+    if job.status != JobStatus.COMPLETED or not job.result_data:
+        raise HTTPException(409, f"Batch is {job.status}")
+    from ..utils.storage import export_download_url
+
+    result = json.loads(job.result_data)
+    return RedirectResponse(export_download_url(result["path"], settings.EXPORT_LINK_TTL_MINUTES))
@@ -32,7 +32,7 @@ router = APIRouter(prefix="/driver", tags=["driver-mobile"])
 
 # User info endpoint
 @router.get("/me")
-async def get_current_user(
+def get_current_user(
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
 ):
@@ -45,7 +45,7 @@ async def get_current_user(
 
 # Re-export drivers endpoints with mobile-friendly routing
 @router.get("/jobs")
-async def get_mobile_jobs(
+def get_mobile_jobs(
     status_filter: str = Query("active", description="active|completed|all"),
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
@@ -56,7 +56,7 @@ async def get_mobile_jobs(
     return get_driver_jobs(status_filter, driver, db)
 
 @router.get("/jobs/{job_id}")
-async def get_mobile_job(
+def get_mobile_job(
     job_id: str,
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
@@ -66,7 +66,7 @@ async def get_mobile_job(
     return get_driver_job(job_id, driver, db)
 
 @router.post("/locations")
-async def post_mobile_locations(
+def post_mobile_locations(
     locations: List[Dict[str, Any]],
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
@@ -76,7 +76,7 @@ async def post_mobile_locations(
     return post_driver_locations(locations, driver, db)
 
 @router.patch("/orders/{order_id}")
-async def update_mobile_order_status(
+def update_mobile_order_status(
     order_id: int,
     payload: Dict[str, Any],
     driver: Driver = Depends(driver_auth),
@@ -101,7 +101,7 @@ async def update_mobile_order_status(
     return result
 
 @router.post("/orders/{order_id}/pod-photo")
-async def upload_mobile_pod_photo(
+def upload_mobile_pod_photo(
     order_id: int,
     file: UploadFile = File(...),
     photo_number: int = Query(1),
@@ -113,7 +113,7 @@ async def upload_mobile_pod_photo(
     return upload_pod_photo(order_id, file, photo_number, driver, db)
 
 @router.get("/orders")
-async def get_mobile_orders(
+def get_mobile_orders(
     month: Optional[str] = Query(None),
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
@@ -123,7 +123,7 @@ async def get_mobile_orders(
     return list_assigned_orders(month, driver, db)
 
 @router.get("/commissions")
-async def get_mobile_commissions(
+def get_mobile_commissions(
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
 ):
@@ -132,7 +132,7 @@ async def get_mobile_commissions(
     return my_commissions(driver, db)
 
 @router.get("/upsell-incentives")
-async def get_mobile_upsell_incentives(
+def get_mobile_upsell_incentives(
     month: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
     driver: Driver = Depends(driver_auth),
@@ -144,7 +144,7 @@ async def get_mobile_upsell_incentives(
 
 # Shift management endpoints
 @router.post("/shifts/clock-in")
-async def mobile_clock_in(
+def mobile_clock_in(
     request: ClockInRequest,
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
@@ -193,65 +193,65 @@ async def mobile_clock_in(
     from ..routers.lorry_management import ClockInWithStockRequest
     stock_request = ClockInWithStockRequest(**stock_request_data)
     
-    return await clock_in_with_stock_verification(stock_request, db, driver)
+    return clock_in_with_stock_verification(stock_request, db, driver)
 
 @router.post("/shifts/clock-out")
-async def mobile_clock_out(
+def mobile_clock_out(
     request: ClockOutRequest,
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
 ):
     """Clock out - mobile app compatible"""
     from ..routers.shifts import clock_out
-    return await clock_out(request, driver, db)
+    return clock_out(request, driver, db)
 
 @router.get("/shifts/status")
-async def mobile_shift_status(
+def mobile_shift_status(
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
 ):
     """Get shift status - mobile app compatible"""
     from ..routers.shifts import get_shift_status
-    return await get_shift_status(driver, db)
+    return get_shift_status(driver, db)
 
 @router.get("/shifts/active")
-async def mobile_active_shift(
+def mobile_active_shift(
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
 ):
     """Get active shift - mobile app compatible"""
     from ..routers.shifts import get_active_shift
-    return await get_active_shift(driver, db)
+    return get_active_shift(driver, db)
 
 @router.get("/shifts/history")
-async def mobile_shift_history(
+def mobile_shift_history(
     limit: int = Query(10),
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
 ):
     """Get shift history - mobile app compatible"""
     from ..routers.shifts import get_shift_history
-    return await get_shift_history(limit, driver, db)
+    return get_shift_history(limit, driver, db)
 
 # Inventory endpoints
 @router.get("/inventory/config")
-async def mobile_inventory_config():
+def mobile_inventory_config():
     """Get inventory config - mobile app compatible"""
     from ..routers.inventory import get_inventory_config
-    return await get_inventory_config()
+    return get_inventory_config()
 
 @router.post("/inventory/uid/scan")
-async def mobile_uid_scan(
+def mobile_uid_scan(
     request: Dict[str, Any],
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
 ):
     """Scan UID - mobile app compatible"""
     from ..routers.inventory import scan_uid_endpoint
-    return await scan_uid_endpoint(request, db)
+    return scan_uid_endpoint(request, db)
 
 @router.get("/inventory/lorry/{driver_id}/stock")
-async def mobile_lorry_stock(
+def mobile_lorry_stock(
     driver_id: int,
     date: str = Query(...),
     driver: Driver = Depends(driver_auth),
@@ -262,7 +262,7 @@ async def mobile_lorry_stock(
     return get_driver_lorry_stock(driver_id, date, db, driver)
 
 @router.post("/inventory/lorry/{driver_id}/stock/upload")
-async def mobile_lorry_stock_upload(
+def mobile_lorry_stock_upload(
     driver_id: int,
     body: Dict[str, Any],
     driver: Driver = Depends(driver_auth),
@@ -273,17 +273,18 @@ async def mobile_lorry_stock_upload(
     return {"error": "Stock upload functionality not implemented", "status": "not_implemented"}
 
 @router.post("/inventory/sku/resolve")
-async def mobile_sku_resolve(
+def mobile_sku_resolve(
     request: Dict[str, Any],
+    driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
 ):
     """Resolve SKU - mobile app compatible"""
-    from ..routers.inventory import resolve_sku
-    return await resolve_sku(request, db)
+    from ..routers.inventory import SKUBatchResolveRequest, resolve_sku_names
+    return resolve_sku_names(SKUBatchResolveRequest(**request), db, driver)
 
 # Trip status management (more explicit than order status)
 @router.patch("/trips/{trip_id}/status")
-async def update_mobile_trip_status(
+def update_mobile_trip_status(
     trip_id: int,
     payload: Dict[str, Any],
     driver: Driver = Depends(driver_auth),
@@ -313,7 +314,7 @@ async def update_mobile_trip_status(
 
 # Order management
 @router.post("/orders/simple")
-async def mobile_create_order(
+def mobile_create_order(
     request: Dict[str, Any],
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
@@ -329,30 +330,30 @@ async def mobile_create_order(
 
 # Lorry management
 @router.get("/lorry-management/my-assignment")
-async def mobile_my_assignment(
+def mobile_my_assignment(
     date: Optional[str] = Query(None),
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
 ):
     """Get my lorry assignment - mobile app compatible"""
     from ..routers.lorry_management import get_my_lorry_assignment
-    return await get_my_lorry_assignment(date, db, driver)
+    return get_my_lorry_assignment(date, db, driver)
 
 @router.post("/lorry-management/clock-in-with-stock")
-async def mobile_clock_in_with_stock(
+def mobile_clock_in_with_stock(
     request: Dict[str, Any],
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
 ):
     """Clock in with stock verification - mobile app compatible"""
     from ..routers.lorry_management import clock_in_with_stock_verification
-    return await clock_in_with_stock_verification(request, driver, db)
+    return clock_in_with_stock_verification(request, driver, db)
 
 @router.get("/lorry-management/driver-status")
-async def mobile_driver_status(
+def mobile_driver_status(
     driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
 ):
     """Get driver status - mobile app compatible"""
     from ..routers.lorry_management import get_driver_status
-    return await get_driver_status(db, driver)
\ No newline at end of file
+    return get_driver_status(db, driver)
\ No newline at end of file
@@ -19,7 +19,7 @@ from ..schemas import (
     CommissionMonthOut,
     UIDActionIn,
 )
-from ..utils.storage import save_pod_image
+from ..services.pod_pipeline import reserve_pod_photo
 from ..reports.outstanding import compute_balance
 from ..core.config import settings
 from ..utils.responses import envelope
@@ -406,25 +406,19 @@ def upload_pod_photo(
         
     data = file.file.read()
     try:
-        url = save_pod_image(data)
-    except Exception as e:  # pragma: no cover - pillow errors
+        photo = reserve_pod_photo(db, trip, photo_number, data)
+    except ValueError as e:
         raise HTTPException(400, str(e)) from e
-    
-    # Store in the appropriate photo slot
-    if photo_number == 1:
-        trip.pod_photo_url_1 = url
-    elif photo_number == 2:
-        trip.pod_photo_url_2 = url
-    elif photo_number == 3:
-        trip.pod_photo_url_3 = url
-    
-    # Also update the legacy field for backward compatibility
-    if photo_number == 1:
-        trip.pod_photo_url = url
-        
+
+    # The slot already holds the final URL; resizing and upload run as a
+    # POD_PHOTO job in app.worker (see services/pod_pipeline)
     db.commit()
-    db.refresh(trip)
-    return {"url": url, "photo_number": photo_number}
+    return {
+        "url": photo["urls"]["full"],
+        "thumbnail_url": photo["urls"]["thumb"],
+        "photo_number": photo_number,
+        "status": "processing",
+    }
 
 
 def _process_uid_actions(
@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func
-from datetime import date, datetime
-from io import BytesIO
-from openpyxl import Workbook
+from sqlalchemy import func
+from datetime import date
 import uuid
 from pydantic import BaseModel
 
+from ..core.config import settings
 from ..db import get_session
-from ..models import Payment, Order, Customer, Role
+from ..models import Payment, Role, Job
 from ..auth.deps import require_roles
+from ..services.cash_export import (
+    MEDIA_TYPES,
+    cash_rows_query,
+    mark_for_export,
+    row_to_dict,
+    stream_cash_export,
+)
+from ..services.job_signal import notify_job_enqueued
 
 router = APIRouter(
     prefix="/export",
@@ -17,53 +25,43 @@ router = APIRouter(
     dependencies=[Depends(require_roles(Role.ADMIN))],
 )
 
-@router.get("/cash.xlsx")
-def cash_export(start: str, end: str, mark: bool = False, db: Session = Depends(get_session)):
+
+def _parse_range(start: str, end: str) -> tuple[date, date]:
     try:
-        start_d = date.fromisoformat(start)
-        end_d = date.fromisoformat(end)
+        return date.fromisoformat(start), date.fromisoformat(end)
     except Exception:
         raise HTTPException(400, "Invalid date format (YYYY-MM-DD)")
 
-    q = (
-        db.query(Payment, Order, Customer)
-        .join(Order, Order.id == Payment.order_id)
-        .join(Customer, Customer.id == Order.customer_id)
-        .filter(Payment.status == "POSTED")
-        .filter(Payment.date >= start_d, Payment.date <= end_d)
-        .order_by(Payment.date.asc(), Payment.id.asc())
-    )
+
+def _cash_file(start: str, end: str, mark: bool, fmt: str, db: Session) -> StreamingResponse:
+    start_d, end_d = _parse_range(start, end)
+    run_id = None
     if mark:
-        q = q.filter(Payment.exported_at.is_(None))
-    rows = q.all()
-
-    wb = Workbook(); ws = wb.active; ws.title = "Payments"
-    ws.append(["Date","Order Code","Customer","Amount","Method","Reference","Category"])
-    total = 0.0
-    exported_ids: list[int] = []
-    for p,o,c in rows:
-        ws.append([str(p.date), o.code, c.name, float(p.amount), p.method, p.reference, p.category])
-        total += float(p.amount)
-        exported_ids.append(p.id)
-    ws.append(["","","TOTAL", total,"","",""])
-    bio = BytesIO(); wb.save(bio); bio.seek(0)
-
-    if mark and exported_ids:
-        run_id = str(uuid.uuid4())
-        now = datetime.utcnow()
-        db.query(Payment).filter(Payment.id.in_(exported_ids)).update(
-            {"export_run_id": run_id, "exported_at": now}, synchronize_session=False
-        )
+        run_id = mark_for_export(db, start_d, end_d)
         db.commit()
-
-    headers = {"Content-Disposition": f'attachment; filename="cash_{start}_{end}.xlsx"'}
-    return Response(
-        content=bio.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    headers = {"Content-Disposition": f'attachment; filename="cash_{start}_{end}.{fmt}"'}
+    return StreamingResponse(
+        stream_cash_export(start_d, end_d, fmt, run_id),
+        media_type=MEDIA_TYPES[fmt],
         headers=headers,
     )
 
 
+@router.get("/cash.xlsx")
+def cash_export(start: str, end: str, mark: bool = False, db: Session = Depends(get_session)):
+    return _cash_file(start, end, mark, "xlsx", db)
+
+
+@router.get("/cash.csv")
+def cash_export_csv(start: str, end: str, mark: bool = False, db: Session = Depends(get_session)):
+    return _cash_file(start, end, mark, "csv", db)
+
+
+@router.get("/cash.ndjson")
+def cash_export_ndjson(start: str, end: str, mark: bool = False, db: Session = Depends(get_session)):
+    return _cash_file(start, end, mark, "ndjson", db)
+
+
 @router.get("/payments_received.xlsx")
 def payments_received_export(start: str, end: str, db: Session = Depends(get_session)):
     """Export posted payments by received date in Excel format.
@@ -88,55 +86,54 @@ def cash_export_json(body: CashExportIn, db: Session = Depends(get_session)):
     When ``mark`` is true, behaves like ``/export/cash.xlsx`` by stamping
     ``export_run_id``/``exported_at`` so they are excluded from future runs.
     """
-    try:
-        start_d = date.fromisoformat(body.start)
-        end_d = date.fromisoformat(body.end)
-    except Exception:
-        raise HTTPException(400, "Invalid date format (YYYY-MM-DD)")
-
-    q = (
-        db.query(Payment, Order, Customer)
-        .join(Order, Order.id == Payment.order_id)
-        .join(Customer, Customer.id == Order.customer_id)
-        .filter(Payment.status == "POSTED")
-        .filter(Payment.date >= start_d, Payment.date <= end_d)
-        .order_by(Payment.date.asc(), Payment.id.asc())
-    )
+    start_d, end_d = _parse_range(body.start, body.end)
+    run_id = None
     if body.mark:
-        q = q.filter(Payment.exported_at.is_(None))
-    rows = q.all()
-
-    total = 0.0
-    exported_ids: list[int] = []
-    out: list[dict] = []
-    for p, o, c in rows:
-        total += float(p.amount)
-        exported_ids.append(p.id)
-        out.append(
-            {
-                "id": p.id,
-                "date": str(p.date),
-                "order_id": p.order_id,
-                "order_code": o.code,
-                "customer_name": c.name,
-                "amount": float(p.amount),
-                "method": p.method,
-                "reference": p.reference,
-                "category": p.category,
-            }
-        )
-
-    if body.mark and exported_ids:
-        run_id = str(uuid.uuid4())
-        now = datetime.utcnow()
-        db.query(Payment).filter(Payment.id.in_(exported_ids)).update(
-            {"export_run_id": run_id, "exported_at": now}, synchronize_session=False
-        )
+        run_id = mark_for_export(db, start_d, end_d)
         db.commit()
 
+    out = [row_to_dict(r) for r in db.execute(cash_rows_query(start_d, end_d, run_id))]
+    total = sum(item["amount"] for item in out)
     return {"items": out, "total": total}
 
 
+class CashExportJobIn(CashExportIn):
+    format: str = "xlsx"
+
+
+@router.post("/cash/jobs")
+def create_cash_export_job(body: CashExportJobIn, db: Session = Depends(get_session)):
+    """Build a cash export in app.worker; poll ``/export/cash/jobs/{id}`` for the link."""
+    _parse_range(body.start, body.end)
+    if body.format not in MEDIA_TYPES:
+        raise HTTPException(400, f"format must be one of {', '.join(MEDIA_TYPES)}")
+    payload = {
+        "start": body.start,
+        "end": body.end,
+        "format": body.format,
+        "run_id": str(uuid.uuid4()) if body.mark else None,
+    }
+    job = Job(kind="CASH_EXPORT", status="queued", payload=payload)
+    db.add(job)
+    notify_job_enqueued(db, job.kind)
+    db.commit()
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.get("/cash/jobs/{job_id}")
+def get_cash_export_job(job_id: int, db: Session = Depends(get_session)):
+    job = db.get(Job, job_id)
+    if not job or job.kind != "CASH_EXPORT":
+        raise HTTPException(404, "Export job not found")
+    out = {"job_id": job.id, "status": job.status, "error": job.last_error if job.status == "error" else None}
+    if job.status == "done" and job.result:
+        from ..utils.storage import export_download_url
+
+        out.update(job.result)
+        out["download_url"] = export_download_url(job.result["path"], settings.EXPORT_LINK_TTL_MINUTES)
+    return out
+
+
 @router.get("/runs")
 def list_runs(db: Session = Depends(get_session)):
     rows = (
@@ -165,29 +162,7 @@ def list_runs(db: Session = Depends(get_session)):
 
 @router.get("/runs/{run_id}")
 def get_run(run_id: str, db: Session = Depends(get_session)):
-    rows = (
-        db.query(Payment, Order, Customer)
-        .join(Order, Order.id == Payment.order_id)
-        .join(Customer, Customer.id == Order.customer_id)
-        .filter(Payment.export_run_id == run_id)
-        .order_by(Payment.date.asc(), Payment.id.asc())
-        .all()
-    )
-    out = [
-        {
-            "id": p.id,
-            "date": str(p.date),
-            "order_id": p.order_id,
-            "order_code": o.code,
-            "customer_name": c.name,
-            "amount": float(p.amount),
-            "method": p.method,
-            "reference": p.reference,
-            "category": p.category,
-        }
-        for p, o, c in rows
-    ]
-    return out
+    return [row_to_dict(r) for r in db.execute(cash_rows_query(None, None, run_id))]
 
 
 @router.post("/runs/{run_id}/rollback")
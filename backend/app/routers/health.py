@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 from ..core.config import settings
+from ..db import pool_status
+from ..auth.claims_cache import auth_cache_stats
 
 router = APIRouter(tags=["system"])
 
@@ -10,3 +12,11 @@ def healthz():
 @router.get("/version")
 def version():
     return {"version": settings.APP_VERSION}
+
+@router.get("/healthz/db")
+def healthz_db():
+    return {"ok": True, "pool": pool_status()}
+
+@router.get("/healthz/auth-cache")
+def healthz_auth_cache():
+    return {"ok": True, **auth_cache_stats()}
@@ -4,10 +4,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from sqlalchemy import select, and_, func
-from sqlalchemy.exc import IntegrityError
 from datetime import date, datetime, timedelta
 from typing import List, Optional
-import time
 import qrcode
 import qrcode.image.svg
 from io import BytesIO
@@ -16,10 +14,12 @@ from PIL import Image
 
 from ..db import get_session
 from ..models import Order, OrderItemUID, Item, SKU, LorryStock, SKUAlias, Driver, LorryAssignment
-from ..models.item import ItemType, ItemStatus
+from ..models.item import ItemType
 from ..models.order_item_uid import UIDAction
 from ..services.inventory_service import InventoryService
 from ..services.lorry_inventory_service import LorryInventoryService
+from ..services.sku_index import get_index as get_sku_index
+from ..services.uid_sequence import ADMIN_OWNER, driver_owner
 from ..auth.deps import require_roles, Role, get_current_user, admin_auth
 from ..auth.firebase import driver_auth
 from ..core.config import settings
@@ -70,7 +70,8 @@ class GenerateQRResponse(BaseModel):
     message: str
 
 class StockLineItem(BaseModel):
-    sku_id: int
+    sku_id: Optional[int] = None
+    sku_name: Optional[str] = None  # resolved to sku_id when sku_id is not given
     counted_quantity: int
 
 class LorryStockUploadRequest(BaseModel):
@@ -86,9 +87,8 @@ class SKUResolveRequest(BaseModel):
     name: str
     threshold: Optional[float] = 0.8
 
-class SKUResolveResponse(BaseModel):
-    matches: List[dict]
-    suggestions: List[str]
+class SKUBatchResolveRequest(BaseModel):
+    raw_names: List[str]
 
 class SKUMatch(BaseModel):
     raw: str
@@ -106,7 +106,7 @@ class SKUAliasRequest(BaseModel):
 
 
 @router.post("/orders/{order_id}/uids/issue", response_model=dict)
-async def scan_uids_for_delivery(
+def scan_uids_for_delivery(
     order_id: int,
     request: UIDScanRequest,
     db: Session = Depends(get_session),
@@ -214,7 +214,7 @@ async def scan_uids_for_delivery(
 
 
 @router.post("/orders/{order_id}/uids/return", response_model=dict)
-async def scan_uids_for_return(
+def scan_uids_for_return(
     order_id: int,
     request: UIDScanRequest,
     db: Session = Depends(get_session),
@@ -297,7 +297,7 @@ async def scan_uids_for_return(
 
 
 @router.get("/orders/{order_id}/uids", response_model=dict)
-async def get_order_uids(
+def get_order_uids(
     order_id: int,
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN, Role.CASHIER))
@@ -333,7 +333,7 @@ async def get_order_uids(
 
 
 @router.post("/lorry/{driver_id}/stock/upload", response_model=dict)
-async def upload_lorry_stock(
+def upload_lorry_stock(
     driver_id: int,
     request: LorryStockUploadRequest,
     db: Session = Depends(get_session),
@@ -411,7 +411,7 @@ async def upload_lorry_stock(
 
 
 @router.get("/lorry/{driver_id}/stock", response_model=dict)
-async def get_lorry_stock_driver(
+def get_lorry_stock_driver(
     driver_id: int,
     date: str,  # REQUIRED
     db: Session = Depends(get_session),
@@ -422,7 +422,7 @@ async def get_lorry_stock_driver(
 
 
 @router.get("/admin/lorry/{driver_id}/stock", response_model=dict)
-async def get_lorry_stock_admin(
+def get_lorry_stock_admin(
     driver_id: int,
     date: str,  # REQUIRED
     db: Session = Depends(get_session),
@@ -652,24 +652,20 @@ def _calculate_lorry_reconciliation(db: Session, driver_id: int, as_of_date: dat
 
 
 @router.post("/sku/resolve", response_model=dict)
-async def resolve_sku_names(
-    request: SKUResolveRequest,
+def resolve_sku_names(
+    request: SKUBatchResolveRequest,
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN, Role.CASHIER))
 ):
     """Resolve raw product names to SKU IDs using exact, alias, and fuzzy matching"""
-    matches = []
-    
-    for raw_name in request.raw_names:
-        match = _resolve_single_sku_name(db, raw_name)
-        matches.append(match)
+    matches = [SKUMatch(**m) for m in get_sku_index(db).resolve_many(request.raw_names)]
     
     response = SKUResolveResponse(matches=matches)
     return envelope(response.model_dump())
 
 
 @router.post("/sku/alias", response_model=dict)
-async def create_sku_alias(
+def create_sku_alias(
     request: SKUAliasRequest,
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN, Role.CASHIER))
@@ -719,104 +715,6 @@ async def create_sku_alias(
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-def _resolve_single_sku_name(db: Session, raw_name: str) -> SKUMatch:
-    """Resolve a single raw name to SKU using multiple strategies"""
-    raw_name = raw_name.strip()
-    
-    # Strategy 1: Exact SKU code match
-    exact_sku = db.execute(
-        select(SKU).where(SKU.code.ilike(raw_name))
-    ).scalar_one_or_none()
-    
-    if exact_sku:
-        return SKUMatch(
-            raw=raw_name,
-            sku_id=exact_sku.id,
-            match_type="EXACT",
-            score=1.0,
-            suggestions=[]
-        )
-    
-    # Strategy 2: Alias match
-    alias_match = db.execute(
-        select(SKUAlias, SKU)
-        .join(SKU, SKUAlias.sku_id == SKU.id)
-        .where(SKUAlias.alias_text.ilike(f"%{raw_name.lower()}%"))
-        .order_by(SKUAlias.weight.desc())
-    ).first()
-    
-    if alias_match:
-        alias, sku = alias_match
-        return SKUMatch(
-            raw=raw_name,
-            sku_id=sku.id,
-            match_type="ALIAS",
-            score=0.9,
-            suggestions=[]
-        )
-    
-    # Strategy 3: Fuzzy matching
-    all_skus = db.execute(select(SKU).where(SKU.is_active == True)).scalars().all()
-    
-    try:
-        from rapidfuzz import fuzz
-        
-        best_match = None
-        best_score = 0
-        suggestions = []
-        
-        for sku in all_skus:
-            # Check against SKU name and code
-            name_score = fuzz.token_set_ratio(raw_name.lower(), sku.name.lower()) / 100
-            code_score = fuzz.token_set_ratio(raw_name.lower(), sku.code.lower()) / 100
-            
-            max_score = max(name_score, code_score)
-            
-            if max_score >= 0.85:  # High threshold for fuzzy matching
-                if max_score > best_score:
-                    best_match = sku
-                    best_score = max_score
-                
-                if max_score >= 0.75:  # Add to suggestions
-                    suggestions.append(sku.id)
-        
-        if best_match:
-            return SKUMatch(
-                raw=raw_name,
-                sku_id=best_match.id,
-                match_type="FUZZY",
-                score=best_score,
-                suggestions=suggestions[:5]  # Limit to top 5 suggestions
-            )
-    
-    except ImportError:
-        # rapidfuzz not available, skip fuzzy matching
-        pass
-    
-    # No match found
-    # Still provide some suggestions based on partial name matching
-    partial_matches = db.execute(
-        select(SKU)
-        .where(
-            and_(
-                SKU.is_active == True,
-                SKU.name.ilike(f"%{raw_name}%")
-            )
-        )
-        .limit(5)
-    ).scalars().all()
-    
-    suggestions = [sku.id for sku in partial_matches]
-    
-    return SKUMatch(
-        raw=raw_name,
-        sku_id=None,
-        match_type="NONE",
-        score=0.0,
-        suggestions=suggestions
-    )
-
-
 def _get_serialized_items_count(db: Session, order: Order) -> int:
     """Get the count of serialized items in an order"""
     # This is a simplified version - in reality you'd check order items against SKU is_serialized flag
@@ -834,7 +732,7 @@ def _get_serialized_items_count(db: Session, order: Order) -> int:
 # Enhanced UID System Endpoints - Keep simple workflow integration
 
 @router.get("/config", response_model=dict)
-async def get_inventory_config():
+def get_inventory_config():
     """Get inventory system configuration - integrates with existing commission workflow"""
     return envelope({
         "uid_inventory_enabled": settings.UID_INVENTORY_ENABLED,
@@ -844,7 +742,7 @@ async def get_inventory_config():
 
 
 @router.post("/uid/scan", response_model=dict)
-async def scan_uid(
+def scan_uid(
     request: UIDScanRequest,
     db: Session = Depends(get_session),
     current_user = Depends(get_current_user)
@@ -956,7 +854,7 @@ async def scan_uid(
 
 
 @router.post("/generate-uid", response_model=dict)
-async def generate_uid(
+def generate_uid(
     request: GenerateUIDRequest,
     db: Session = Depends(get_session),
     current_user = Depends(get_current_user)
@@ -975,62 +873,21 @@ async def generate_uid(
         item_type = ItemType.NEW if request.item_type.upper() == "NEW" else ItemType.RENTAL
         
         # Generate simple admin UID format: SKU001-ADMIN-20240906-001
-        sku_code = f"SKU{sku.id:03d}"
-        today_str = datetime.utcnow().strftime("%Y%m%d")
-        
-        # Generate UIDs atomically with retry on conflicts
-        items = []
-        copies = 2 if item_type == ItemType.NEW else 1
-        max_retries = 3
-        
-        for attempt in range(max_retries):
-            try:
-                # Get next sequence number for today
-                existing_count = db.execute(
-                    select(func.count(Item.uid)).where(
-                        Item.uid.like(f"{sku_code}-ADMIN-{today_str}-%")
-                    )
-                ).scalar() or 0
-                
-                items = []  # Reset items list on retry
-                
-                for copy_num in range(1, copies + 1):
-                    seq_num = existing_count + copy_num
-                    if copies > 1:
-                        uid = f"{sku_code}-ADMIN-{today_str}-{seq_num:03d}-C{copy_num}"
-                    else:
-                        uid = f"{sku_code}-ADMIN-{today_str}-{seq_num:03d}"
-                    
-                    item = Item(
-                        uid=uid,
-                        sku_id=request.sku_id,
-                        item_type=item_type,
-                        copy_number=copy_num if copies > 1 else None,
-                        oem_serial=request.serial_number,
-                        status=ItemStatus.WAREHOUSE,
-                        created_at=datetime.utcnow()
-                    )
-                    items.append(item)
-                    db.add(item)
-                
-                db.commit()
-                break  # Success, exit retry loop
-                
-            except IntegrityError as e:
-                db.rollback()
-                if attempt < max_retries - 1:
-                    # Retry on unique constraint violation with exponential backoff
-                    time.sleep(0.1 * (2 ** attempt))
-                    continue
-                else:
-                    # Max retries exceeded
-                    raise HTTPException(
-                        status_code=500, 
-                        detail="Failed to generate unique UID after multiple attempts. Please try again."
-                    )
-            except Exception as e:
-                db.rollback()
-                raise  # Re-raise non-recoverable errors immediately
+        # The sequence number comes from a reserved block, so concurrent requests never collide
+        service = InventoryService(db)
+        try:
+            items = service.generate_items(
+                sku_id=request.sku_id,
+                owner=ADMIN_OWNER,
+                generation_date=datetime.utcnow().date(),
+                item_type=item_type,
+                quantity=1,
+                serial_number=request.serial_number,
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
         
         # Log audit action
         log_action(
@@ -1043,10 +900,10 @@ async def generate_uid(
         )
         
         item_data = [{
-            "uid": item.uid,
-            "type": item.item_type.value,
-            "copy_number": item.copy_number,
-            "serial": item.oem_serial
+            "uid": item["uid"],
+            "type": item["item_type"].value,
+            "copy_number": item["copy_number"],
+            "serial": item["oem_serial"]
         } for item in items]
         
         return envelope({
@@ -1060,7 +917,7 @@ async def generate_uid(
 
 
 @router.get("/orders/{order_id}/uid-summary", response_model=dict)
-async def get_order_uid_summary(
+def get_order_uid_summary(
     order_id: int,
     db: Session = Depends(get_session),
     current_user = Depends(get_current_user)
@@ -1084,7 +941,7 @@ async def get_order_uid_summary(
 
 
 @router.post("/sku/resolve-v2", response_model=dict)
-async def resolve_sku_v2(
+def resolve_sku_v2(
     request: SKUResolveRequest,
     db: Session = Depends(get_session),
     current_user = Depends(get_current_user)
@@ -1105,7 +962,7 @@ async def resolve_sku_v2(
 
 
 @router.post("/sku/alias-v2", response_model=dict)
-async def add_sku_alias_v2(
+def add_sku_alias_v2(
     request: dict,  # {sku_id: int, alias: str}
     db: Session = Depends(get_session),
     current_user = Depends(get_current_user)
@@ -1134,7 +991,7 @@ async def add_sku_alias_v2(
 
 
 @router.get("/drivers/{driver_id}/stock-status", response_model=dict)
-async def stock_status_driver(
+def stock_status_driver(
     driver_id: int,
     date: str,  # REQUIRED
     db: Session = Depends(get_session),
@@ -1145,7 +1002,7 @@ async def stock_status_driver(
 
 
 @router.get("/admin/drivers/{driver_id}/stock-status", response_model=dict)
-async def stock_status_admin(
+def stock_status_admin(
     driver_id: int,
     date: str,  # REQUIRED
     db: Session = Depends(get_session),
@@ -1241,7 +1098,7 @@ def _stock_status_core(db: Session, driver_id: int, date: str):
 
 
 @router.post("/lorry-stock/upload", response_model=dict)
-async def upload_lorry_stock_v2(
+def upload_lorry_stock_v2(
     request: LorryStockUploadRequest,
     db: Session = Depends(get_session),
     current_user = Depends(get_current_user)
@@ -1264,6 +1121,16 @@ async def upload_lorry_stock_v2(
             )
         )
         
+        # Lines given by product name are resolved against one SKU index snapshot
+        named = [item for item in request.stock_data if item.sku_id is None]
+        if named:
+            resolved = get_sku_index(db).resolve_many(item.sku_name or "" for item in named)
+            unresolved = [m["raw"] for m in resolved if m["sku_id"] is None]
+            if unresolved:
+                raise HTTPException(status_code=400, detail={"unresolved_sku_names": unresolved})
+            for item, match in zip(named, resolved):
+                item.sku_id = match["sku_id"]
+        
         # Add new records
         items_processed = 0
         for item in request.stock_data:
@@ -1295,12 +1162,14 @@ async def upload_lorry_stock_v2(
             "message": f"Successfully uploaded stock for {request.date}"
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/uid/{uid}/details", response_model=dict)
-async def get_uid_details(
+def get_uid_details(
     uid: str,
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
@@ -1418,63 +1287,36 @@ async def get_uid_details(
 
 
 @router.get("/uid/search", response_model=dict)
-async def search_uids(
+def search_uids(
     query: str,
     limit: int = 50,
+    after: Optional[str] = None,
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
 ):
-    """Search UIDs by various criteria"""
-    if len(query.strip()) < 2:
+    """Search UIDs and serials by substring, a page at a time.
+
+    Results are ordered by UID; pass the returned ``next_after`` as ``after``
+    to fetch the next page.
+    """
+    query = query.strip()
+    if len(query) < 2:
         raise HTTPException(status_code=400, detail="Query must be at least 2 characters")
+    limit = max(1, min(limit, settings.UID_SEARCH_MAX_LIMIT))
     
-    # Search UIDs by pattern
-    uid_results = db.execute(
-        select(Item, SKU)
-        .join(SKU, Item.sku_id == SKU.id)
-        .where(Item.uid.ilike(f"%{query}%"))
-        .limit(limit)
-    ).all()
-    
-    results = []
-    for item, sku in uid_results:
-        # Get latest stock location
-        from ..models import LorryStockTransaction
-        latest_transaction = db.execute(
-            select(LorryStockTransaction)
-            .where(LorryStockTransaction.uid == item.uid)
-            .order_by(LorryStockTransaction.transaction_date.desc())
-            .limit(1)
-        ).scalar_one_or_none()
-        
-        current_location = "Unknown"
-        if latest_transaction:
-            if latest_transaction.action in ["LOAD", "COLLECTION"]:
-                current_location = f"Lorry {latest_transaction.lorry_id}"
-            elif latest_transaction.action in ["UNLOAD"]:
-                current_location = "Warehouse"
-            elif latest_transaction.action in ["DELIVERY"]:
-                current_location = "Delivered"
-        
-        results.append({
-            "uid": item.uid,
-            "sku_code": sku.code,
-            "sku_name": sku.name,
-            "status": item.status.value,
-            "current_location": current_location,
-            "created_at": item.created_at.isoformat()
-        })
+    results = InventoryService(db).search_items(query, limit, after)
     
     return envelope({
         "query": query,
         "results": results,
         "total_found": len(results),
-        "limit_applied": limit
+        "limit_applied": limit,
+        "next_after": results[-1]["uid"] if len(results) == limit else None
     })
 
 
 @router.post("/bulk-generate", response_model=dict)
-async def bulk_generate_uids(
+def bulk_generate_uids(
     request: dict,  # Use dict to handle flexible input
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
@@ -1493,8 +1335,9 @@ async def bulk_generate_uids(
         if not sku_id or not driver_id:
             raise HTTPException(status_code=400, detail="SKU ID and Driver ID are required")
         
-        if quantity < 1 or quantity > 100:
-            raise HTTPException(status_code=400, detail="Quantity must be between 1 and 100")
+        max_quantity = settings.UID_BULK_GENERATE_MAX
+        if not isinstance(quantity, int) or quantity < 1 or quantity > max_quantity:
+            raise HTTPException(status_code=400, detail=f"Quantity must be between 1 and {max_quantity}")
         
         # Get SKU and Driver info
         sku = db.get(SKU, sku_id)
@@ -1514,36 +1357,20 @@ async def bulk_generate_uids(
         else:
             gen_date = date.today()
         
-        # Use inventory service for UID generation
+        # One sequence block and one INSERT for the whole batch, committed together
+        item_type_enum = ItemType.NEW if item_type == 'NEW' else ItemType.RENTAL
         service = InventoryService(db)
-        generated_uids = []
-        errors = []
-        
-        # Generate UIDs for each item
-        for i in range(quantity):
-            try:
-                # Create a temporary item type enum
-                from ..models.item import ItemType
-                item_type_enum = ItemType.NEW if item_type == 'NEW' else ItemType.RENTAL
-                
-                # Generate UID(s) for this item
-                uids = service.generate_uid_for_item(
-                    sku_id=sku_id,
-                    driver_id=driver_id,
-                    item_type=item_type_enum,
-                    generation_date=gen_date
-                )
-                
-                if isinstance(uids, list):
-                    generated_uids.extend(uids)
-                else:
-                    generated_uids.append(uids)
-                    
-            except Exception as e:
-                errors.append(f"Failed to generate UID for item {i+1}: {str(e)}")
+        items = service.generate_items(
+            sku_id=sku_id,
+            owner=driver_owner(driver_id),
+            generation_date=gen_date,
+            item_type=item_type_enum,
+            quantity=quantity,
+        )
+        db.commit()
+        generated_uids = [item["uid"] for item in items]
         
         # Log audit action
-        from ..services.audit_service import log_action
         log_action(
             db,
             user_id=current_user.id,
@@ -1563,10 +1390,10 @@ async def bulk_generate_uids(
         )
         
         return envelope({
-            "success": len(errors) == 0,
+            "success": True,
             "generated_uids": generated_uids,
             "total_generated": len(generated_uids),
-            "errors": errors,
+            "errors": [],
             "generation_details": {
                 "sku_code": sku.code,
                 "driver_name": driver.name,
@@ -1579,12 +1406,12 @@ async def bulk_generate_uids(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Bulk UID generation failed: {e}")
+        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/skus", response_model=dict)
-async def get_skus(
+def get_skus(
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
 ):
@@ -1622,7 +1449,7 @@ class QRCodeResponse(BaseModel):
 
 
 @router.post("/generate-qr", response_model=dict)
-async def generate_qr_code(
+def generate_qr_code(
     request: QRCodeRequest,
     db: Session = Depends(get_session),
     current_user = Depends(get_current_user)
@@ -1673,7 +1500,7 @@ async def generate_qr_code(
 
 
 @router.get("/uid/{uid}/ledger", response_model=dict)
-async def get_uid_ledger_history(
+def get_uid_ledger_history(
     uid: str,
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN, Role.CASHIER))
@@ -1697,7 +1524,7 @@ async def get_uid_ledger_history(
 
 
 @router.get("/ledger/audit-trail", response_model=dict)
-async def get_ledger_audit_trail(
+def get_ledger_audit_trail(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     uid: Optional[str] = None,
@@ -1767,7 +1594,7 @@ async def get_ledger_audit_trail(
 
 
 @router.get("/ledger/statistics", response_model=dict)
-async def get_ledger_statistics(
+def get_ledger_statistics(
     days: int = 30,
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN, Role.CASHIER))
@@ -1787,7 +1614,7 @@ async def get_ledger_statistics(
 
 
 @router.post("/uid/{uid}/scan", response_model=dict)
-async def record_uid_scan(
+def record_uid_scan(
     uid: str,
     request: dict,
     db: Session = Depends(get_session),
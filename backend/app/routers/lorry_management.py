@@ -142,7 +142,7 @@ class ClockInResponse(BaseModel):
 
 
 @router.get("/assignments", response_model=dict)
-async def get_lorry_assignments(
+def get_lorry_assignments(
     date: Optional[str] = None,  # YYYY-MM-DD
     driver_id: Optional[int] = None,
     lorry_id: Optional[str] = None,
@@ -189,7 +189,7 @@ async def get_lorry_assignments(
 
 # Driver endpoints for clock-in with stock verification
 @router.get("/my-assignment", response_model=dict)
-async def get_my_lorry_assignment(
+def get_my_lorry_assignment(
     date: Optional[str] = None,  # YYYY-MM-DD, defaults to today
     db: Session = Depends(get_session),
     driver = Depends(driver_auth)
@@ -247,7 +247,7 @@ async def get_my_lorry_assignment(
 
 
 @router.post("/clock-in-with-stock", response_model=dict)
-async def clock_in_with_stock_verification(
+def clock_in_with_stock_verification(
     request: ClockInWithStockRequest,
     db: Session = Depends(get_session),
     driver = Depends(driver_auth)
@@ -297,7 +297,7 @@ async def clock_in_with_stock_verification(
     unexpected_uids = []
     
     # Get expected UIDs for this lorry from previous day's verification or initial stock
-    expected_uids = await _get_expected_lorry_stock(db, assignment.lorry_id, today)
+    expected_uids = _get_expected_lorry_stock(db, assignment.lorry_id, today)
     
     # Detect variances
     scanned_set = set(request.scanned_uids)
@@ -333,7 +333,7 @@ async def clock_in_with_stock_verification(
     
     # Handle variance detection and driver holds
     if variance_detected and settings.UID_INVENTORY_ENABLED:
-        await _handle_variance_driver_holds(db, assignment, verification, variance_count, missing_uids, unexpected_uids)
+        _handle_variance_driver_holds(db, assignment, verification, variance_count, missing_uids, unexpected_uids)
     
     db.commit()
     
@@ -373,7 +373,7 @@ async def clock_in_with_stock_verification(
 
 
 @router.get("/driver-status", response_model=dict)
-async def get_driver_status(
+def get_driver_status(
     db: Session = Depends(get_session),
     driver = Depends(driver_auth)
 ):
@@ -422,7 +422,7 @@ async def get_driver_status(
 
 # Driver hold management endpoints
 @router.post("/holds", response_model=dict)
-async def create_driver_hold(
+def create_driver_hold(
     request: DriverHoldRequest,
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
@@ -491,7 +491,7 @@ async def create_driver_hold(
 
 
 @router.get("/holds", response_model=dict)
-async def get_driver_holds(
+def get_driver_holds(
     driver_id: Optional[int] = None,
     status: Optional[str] = None,  # ACTIVE, RESOLVED
     db: Session = Depends(get_session),
@@ -531,7 +531,7 @@ class ResolveHoldRequest(BaseModel):
     resolution_notes: str
 
 @router.patch("/holds/{hold_id}/resolve", response_model=dict)
-async def resolve_driver_hold(
+def resolve_driver_hold(
     hold_id: int,
     request: ResolveHoldRequest,
     db: Session = Depends(get_session),
@@ -569,7 +569,7 @@ async def resolve_driver_hold(
 
 
 # Helper functions
-async def _get_expected_lorry_stock(db: Session, lorry_id: str, date: date) -> List[str]:
+def _get_expected_lorry_stock(db: Session, lorry_id: str, date: date) -> List[str]:
     """Get expected UIDs for a lorry based on admin stock transactions and deliveries"""
     # Use the new inventory service to get real-time stock
     inventory_service = LorryInventoryService(db)
@@ -591,7 +591,7 @@ async def _get_expected_lorry_stock(db: Session, lorry_id: str, date: date) -> L
     return expected_stock
 
 
-async def _handle_variance_driver_holds(
+def _handle_variance_driver_holds(
     db: Session, 
     assignment: LorryAssignment, 
     verification: LorryStockVerification,
@@ -804,9 +804,9 @@ class AssignmentStatusResponse(BaseModel):
 # Admin Stock Management Endpoints
 
 @router.post("/stock/{lorry_id}/load", response_model=dict)
-async def load_lorry_stock(
+def load_lorry_stock(
     lorry_id: str,
-    raw_request: Request,
+    body: dict = Depends(parse_json_request),
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
 ):
@@ -814,8 +814,6 @@ async def load_lorry_stock(
     logger.info(f"=== STOCK LOAD DEBUG START === lorry_id: {lorry_id}")
     
     try:
-        # Parse JSON with robust handling
-        body = await parse_json_request(raw_request)
         logger.info(f"DEBUG: Parsed request body: {body}")
         
         request = LoadStockRequest(**body)
@@ -857,15 +855,13 @@ async def load_lorry_stock(
 
 
 @router.post("/stock/{lorry_id}/unload", response_model=dict)
-async def unload_lorry_stock(
+def unload_lorry_stock(
     lorry_id: str,
-    raw_request: Request,
+    body: dict = Depends(parse_json_request),
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
 ):
     """Admin unloads UIDs from a lorry"""
-    # Parse JSON with robust handling
-    body = await parse_json_request(raw_request)
     request = UnloadStockRequest(**body)
     
     inventory_service = LorryInventoryService(db)
@@ -895,7 +891,7 @@ async def unload_lorry_stock(
 
 
 @router.get("/stock/{lorry_id}", response_model=dict)
-async def get_lorry_current_stock(
+def get_lorry_current_stock(
     lorry_id: str,
     as_of_date: Optional[str] = None,  # YYYY-MM-DD
     db: Session = Depends(get_session),
@@ -924,7 +920,7 @@ async def get_lorry_current_stock(
 
 
 @router.get("/stock/transactions", response_model=dict)
-async def get_stock_transactions(
+def get_stock_transactions(
     lorry_id: Optional[str] = None,
     start_date: Optional[str] = None,  # YYYY-MM-DD
     end_date: Optional[str] = None,    # YYYY-MM-DD
@@ -987,7 +983,7 @@ async def get_stock_transactions(
 
 
 @router.get("/stock/summary", response_model=dict)
-async def get_all_lorries_inventory_summary(
+def get_all_lorries_inventory_summary(
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
 ):
@@ -1019,14 +1015,12 @@ async def get_all_lorries_inventory_summary(
 # Lorry Management Endpoints
 
 @router.post("/lorries", response_model=dict)
-async def create_lorry(
-    raw_request: Request,
+def create_lorry(
+    body: dict = Depends(parse_json_request),
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
 ):
     """Create a new lorry"""
-    # Parse JSON with robust handling
-    body = await parse_json_request(raw_request)
     request = CreateLorryRequest(**body)
     
     assignment_service = LorryAssignmentService(db)
@@ -1058,7 +1052,7 @@ async def create_lorry(
 
 
 @router.get("/lorries", response_model=dict)
-async def get_all_lorries(
+def get_all_lorries(
     include_inactive: bool = False,
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
@@ -1074,15 +1068,13 @@ async def get_all_lorries(
 
 
 @router.patch("/drivers/{driver_id}/priority-lorry", response_model=dict)
-async def update_driver_priority_lorry(
+def update_driver_priority_lorry(
     driver_id: int,
-    raw_request: Request,
+    body: dict = Depends(parse_json_request),
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
 ):
     """Update driver's priority lorry"""
-    # Parse JSON with robust handling
-    body = await parse_json_request(raw_request)
     request = UpdateDriverPriorityRequest(**body)
     
     assignment_service = LorryAssignmentService(db)
@@ -1109,15 +1101,13 @@ async def update_driver_priority_lorry(
 
 
 @router.post("/auto-assign", response_model=dict)
-async def auto_assign_lorries(
-    raw_request: Request,
+def auto_assign_lorries(
+    body: dict = Depends(parse_json_request),
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
 ):
     """Automatically assign lorries to scheduled drivers"""
     try:
-        # Parse the request using our robust parser
-        body = await parse_json_request(raw_request)
         request = AutoAssignRequest(**body)
         
         assignment_date = datetime.strptime(request.assignment_date, "%Y-%m-%d").date()
@@ -1152,7 +1142,7 @@ async def auto_assign_lorries(
 
 
 @router.get("/assignment-status", response_model=dict)
-async def get_lorry_assignment_status(
+def get_lorry_assignment_status(
     date: Optional[str] = None,  # YYYY-MM-DD, defaults to today
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
@@ -1173,7 +1163,7 @@ async def get_lorry_assignment_status(
 
 
 @router.get("/drivers", response_model=dict)
-async def get_drivers_with_priority_lorries(
+def get_drivers_with_priority_lorries(
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
 ):
@@ -1200,7 +1190,7 @@ async def get_drivers_with_priority_lorries(
 
 
 @router.post("/test-validation")
-async def test_validation(
+def test_validation(
     request: CreateLorryRequest,
     current_user = Depends(require_roles(Role.ADMIN))
 ):
@@ -1213,7 +1203,7 @@ async def test_validation(
 
 
 @router.get("/status")
-async def get_status(
+def get_status(
     current_user = Depends(require_roles(Role.ADMIN)),
     db: Session = Depends(get_session)
 ):
@@ -1245,7 +1235,7 @@ async def get_status(
 
 
 @router.get("/debug/table-check")
-async def debug_table_check(
+def debug_table_check(
     current_user = Depends(require_roles(Role.ADMIN)),
     db: Session = Depends(get_session)
 ):
@@ -30,7 +30,8 @@ from ..services.ordersvc import (
     q2,
     ensure_plan_first_month_fee,
 )
-from ..reports.outstanding import compute_expected_for_order, calculate_plan_due, compute_balance
+from ..reports.outstanding import compute_expected_for_order, calculate_plan_due
+from ..services.order_balance import get_order_balances
 from ..services.status_updates import (
     apply_buyback,
     cancel_installment,
@@ -55,48 +56,22 @@ def kl_day_bounds(d: datetime | date_cls):
 
 
 def trigger_auto_assignment(db: Session, order_id: int):
-    """Trigger auto-assignment after order creation"""
+    """Schedule a coalesced auto-assignment pass after order creation"""
+    import logging
+
+    logger = logging.getLogger(__name__)
     try:
-        from ..services.assignment_service import AssignmentService
-        import logging
-        
-        logger = logging.getLogger(__name__)
-        logger.info(f"Triggering auto-assignment after order {order_id} creation")
-        
-        # Use the existing database session but ensure it's in a good state
-        # The session should be committed by now, so we can use it for queries
-        try:
-            service = AssignmentService(db)
-            result = service.auto_assign_all()
-            
-            logger.info(f"Auto-assignment result for order {order_id}: {result.get('message', 'Unknown result')}")
-            print(f"Auto-assignment triggered after order {order_id} creation: {result.get('message', 'Unknown result')}")
-            return result
-            
-        except Exception as session_error:
-            # If there's a session issue, try with a fresh session
-            logger.warning(f"Session issue, trying fresh session: {session_error}")
-            from ..db import get_session
-            
-            for fresh_db in get_session():
-                service = AssignmentService(fresh_db)
-                result = service.auto_assign_all()
-                
-                logger.info(f"Auto-assignment result (fresh session) for order {order_id}: {result.get('message', 'Unknown result')}")
-                print(f"Auto-assignment triggered (fresh session) after order {order_id} creation: {result.get('message', 'Unknown result')}")
-                return result
-            
+        from ..services.assignment_scheduler import request_auto_assign
+
+        result = request_auto_assign(db, reason=f"order:{order_id}")
+        db.commit()
+        logger.info(f"Auto-assignment scheduled after order {order_id} creation: job {result['job_id']}")
+        return result
     except Exception as e:
-        import logging
-        import traceback
-        
-        logger = logging.getLogger(__name__)
-        logger.error(f"Auto-assignment failed after order {order_id} creation: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        print(f"Auto-assignment failed after order {order_id} creation: {e}")
-        print(f"Traceback: {traceback.format_exc()}")
+        db.rollback()
+        logger.error(f"Auto-assignment scheduling failed after order {order_id} creation: {e}")
         # Don't fail order creation if assignment fails
-        return None
+        return {"success": False, "error": str(e)}
 
 
 def kl_month_bounds(year: int, month: int):
@@ -200,11 +175,13 @@ def list_orders(
         ))
     stmt = stmt.order_by(Order.created_at.desc()).limit(limit)
     rows = db.execute(stmt).all()
+    # Materialized outstanding balances; missing or expired ones are computed in one batch
+    balances = get_order_balances(db, [row[0].id for row in rows], date_cls.today())
     out: list[OrderListOut] = []
     for (order, customer_name, customer_address, trip, driver_name, commission) in rows:
         dto = OrderOut.model_validate(order).model_dump()
         # Replace static balance with dynamic outstanding calculation
-        dto["balance"] = float(compute_balance(order, date_cls.today()))
+        dto["balance"] = float(balances[order.id])
         dto["customer_name"] = customer_name
         dto["customer_address"] = customer_address
         if trip:
@@ -216,6 +193,7 @@ def list_orders(
                 "route_id": trip.route_id,
                 "pod_photo_url": trip.pod_photo_url,  # Kept for backward compatibility
                 "pod_photo_urls": trip.pod_photo_urls,
+                "pod_thumbnail_urls": trip.pod_thumbnail_urls,
             }
             if commission:
                 trip_dto["commission"] = {
@@ -290,23 +268,8 @@ def create_order(
         db.refresh(order)
         log_action(db, current_user, "order.create", f"order_id={order.id}")
         
-        # Trigger auto-assignment after order creation (use AssignmentService directly)
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"About to trigger auto-assignment for order {order.id}")
-        print(f"About to trigger auto-assignment for order {order.id}")
-        
-        try:
-            from ..services.assignment_service import AssignmentService
-            assignment_service = AssignmentService(db)
-            trigger_result = assignment_service.auto_assign_all()
-            logger.info(f"Auto-assignment completed for order {order.id}: {trigger_result}")
-            print(f"Auto-assignment completed for order {order.id}: {trigger_result}")
-        except Exception as e:
-            logger.error(f"Auto-assignment failed for order {order.id}: {e}")
-            print(f"Auto-assignment failed for order {order.id}: {e}")
-            # Don't fail order creation if assignment fails
-            trigger_result = {"success": False, "error": str(e)}
+        # Mark assignment dirty; the worker runs one debounced pass per burst
+        trigger_auto_assignment(db, order.id)
         
         return envelope(OrderOut.model_validate(order))
     except Exception as e:
@@ -995,23 +958,8 @@ def create_simple_order(
         
         log_action(db, current_user.id, "create_simple_order", f"Order #{order.id}")
         
-        # Trigger auto-assignment after order creation (use AssignmentService directly)
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"About to trigger auto-assignment for simple order {order.id}")
-        print(f"About to trigger auto-assignment for simple order {order.id}")
-        
-        try:
-            from ..services.assignment_service import AssignmentService
-            assignment_service = AssignmentService(db)
-            trigger_result = assignment_service.auto_assign_all()
-            logger.info(f"Auto-assignment completed for simple order {order.id}: {trigger_result}")
-            print(f"Auto-assignment completed for simple order {order.id}: {trigger_result}")
-        except Exception as e:
-            logger.error(f"Auto-assignment failed for simple order {order.id}: {e}")
-            print(f"Auto-assignment failed for simple order {order.id}: {e}")
-            # Don't fail order creation if assignment fails
-            trigger_result = {"success": False, "error": str(e)}
+        # Mark assignment dirty; the worker runs one debounced pass per burst
+        trigger_auto_assignment(db, order.id)
         
         return {
             "id": order.id,
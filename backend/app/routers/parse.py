@@ -99,6 +99,15 @@ def find_mother_order(body: AdvancedParseIn, db: Session = Depends(get_session))
         raise HTTPException(500, f"Order search failed: {str(e)}")
 
 
+@router.get("/cache-stats", response_model=dict)
+def parse_cache_stats():
+    """
+    Hit rates of the LLM parse cache in this process, per parsing stage
+    """
+    from ..services.parse_cache import parse_cache
+    return envelope(parse_cache.stats())
+
+
 @router.post("/quotation", response_model=dict)
 def parse_quotation_message(body: AdvancedParseIn):
     """
@@ -4,6 +4,8 @@ from sqlalchemy.orm import Session
 from ..db import get_session
 from ..models import Job, Role
 from ..auth.deps import require_roles
+from ..services.job_signal import notify_job_enqueued
+from ..services.assignment_scheduler import request_auto_assign
 
 router = APIRouter(
     prefix="/queue",
@@ -17,16 +19,17 @@ class EnqueueParseCreate(BaseModel):
 @router.post("/parse-create", response_model=dict)
 def enqueue_parse_create(body: EnqueueParseCreate, db: Session = Depends(get_session)):
     job = Job(kind="PARSE_CREATE", payload={"text": body.text}, status="queued")
-    db.add(job); db.commit(); db.refresh(job)
+    db.add(job); notify_job_enqueued(db, job.kind); db.commit(); db.refresh(job)
     return {"job_id": job.id}
 
 
 @router.post("/auto-assign", response_model=dict)  
 def enqueue_auto_assign(db: Session = Depends(get_session)):
     """Queue auto-assignment job for background processing"""
-    job = Job(kind="AUTO_ASSIGN", payload={}, status="queued")
-    db.add(job); db.commit(); db.refresh(job)
-    return {"job_id": job.id, "message": "Auto-assignment queued for background processing"}
+    # Runs immediately; coalesces with (and pulls forward) any pending debounced pass
+    result = request_auto_assign(db, reason="manual", delay_secs=0)
+    db.commit()
+    return {"job_id": result["job_id"], "message": "Auto-assignment queued for background processing"}
 
 
 @router.get("/jobs/{job_id}", response_model=dict)
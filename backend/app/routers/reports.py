@@ -1,15 +1,15 @@
-from datetime import date, datetime
+from datetime import date
 from decimal import Decimal
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy import and_
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 
 from ..auth.deps import require_roles
 from ..db import get_session
-from ..models import Order, Role, Trip
-from ..reports.outstanding import compute_expected_for_order, calculate_plan_due
-from ..services.ordersvc import _sum_posted_payments, q2
+from ..models import Role
+from ..reports.outstanding import outstanding_rows, outstanding_totals
+from ..services.ordersvc import q2
 
 router = APIRouter(
     prefix="/reports",
@@ -30,71 +30,44 @@ def outstanding(
     db: Session = Depends(get_session),
 ):
     as_of = as_of or date.today()
-    query = (
-        db.query(Order)
-        .join(Trip, Order.id == Trip.order_id)
-        .options(
-            selectinload(Order.customer),
-            selectinload(Order.items),
-            selectinload(Order.plan),
-            selectinload(Order.payments),
-            selectinload(Order.adjustments).selectinload(Order.payments),
-            selectinload(Order.trip),
-        )
-        .filter(Trip.status == "DELIVERED")
-        .filter(Trip.delivered_at != None)
-        .filter(Trip.delivered_at <= datetime.combine(as_of, datetime.max.time()))
-    )
-    if order_id:
-        query = query.filter(Order.id == order_id)
-    elif order_type and order_type != "ALL":
-        query = query.filter(Order.type == order_type)
-    if exclude_cleared:
-        query = query.filter(Order.status != "RETURNED")
-        query = query.filter(~and_(Order.status == "CANCELLED", (Order.penalty_fee == None) | (Order.penalty_fee <= 0)))
-    orders = query.order_by(Order.id).offset(offset).limit(limit).all()
+    rows = outstanding_rows(as_of, order_type=order_type, order_id=order_id, exclude_cleared=exclude_cleared)
+
+    # Filter, paginate and total on the SQL-computed balance, so pages are full
+    # and totals cover every matching order rather than the current page
+    page = select(rows).order_by(rows.c.id).offset(offset).limit(limit)
+    if not include_zero_balance:
+        page = page.where(rows.c.balance > 0)
+    summary = outstanding_totals(db, rows, include_zero_balance)
 
     items: list[dict] = []
-    totals = {"expected": Decimal("0"), "paid": Decimal("0"), "fees": Decimal("0"), "balance": Decimal("0")}
-    for order in orders:
-        # Get trip data from the joined query
-        trip = getattr(order, "trip", None)
-        trip_delivered_at = getattr(trip, "delivered_at", None) if trip else None
-        
-        expected = compute_expected_for_order(order, as_of, trip)
-        fees = q2((order.delivery_fee or 0) + (order.return_delivery_fee or 0) + (order.penalty_fee or 0))
-        paid = _sum_posted_payments(order) + sum(
-            (_sum_posted_payments(ch) for ch in getattr(order, "adjustments", []) or []), Decimal("0")
-        )
-        balance = q2(expected - paid)
-        if not include_zero_balance and balance <= 0:
-            continue
-        
-        # Add cashier-friendly fields like orderDue API
-        to_collect = q2(balance if balance > 0 else Decimal("0"))
-        to_refund = q2(-balance if balance < 0 else Decimal("0"))
-        accrued = calculate_plan_due(order.plan, as_of, trip_delivered_at)
-        
+    for row in db.execute(page).mappings():
+        expected = q2(row["expected"])
+        paid = q2(row["paid"])
+        balance = q2(row["balance"])
         items.append(
             {
-                "id": order.id,
-                "code": order.code,
-                "customer": {"name": order.customer.name if order.customer else None},
-                "type": order.type,
-                "status": order.status,
+                "id": row["id"],
+                "code": row["code"],
+                "customer": {"name": row["customer_name"]},
+                "type": row["type"],
+                "status": row["status"],
                 "expected": float(expected),
                 "paid": float(paid),
-                "fees": float(fees),
+                "fees": float(q2(row["fees"])),
                 "balance": float(balance),
-                "to_collect": float(to_collect),
-                "to_refund": float(to_refund),
-                "accrued": float(accrued),
+                # Cashier-friendly fields like orderDue API
+                "to_collect": float(balance if balance > 0 else Decimal("0")),
+                "to_refund": float(-balance if balance < 0 else Decimal("0")),
+                "accrued": float(q2(row["accrued"])),
             }
         )
-        totals["expected"] += expected
-        totals["paid"] += paid
-        totals["fees"] += fees
-        totals["balance"] += balance
 
-    totals = {k: float(q2(v)) for k, v in totals.items()}
-    return {"as_of": str(as_of), "items": items, "totals": totals}
+    totals = {k: float(summary[k]) for k in ("expected", "paid", "fees", "balance")}
+    return {
+        "as_of": str(as_of),
+        "items": items,
+        "totals": totals,
+        "total_count": summary["count"],
+        "limit": limit,
+        "offset": offset,
+    }
@@ -22,7 +22,7 @@ router = APIRouter(prefix="/drivers/shifts", tags=["shifts"])
 
 
 @router.get("/test")
-async def test_shifts_available():
+def test_shifts_available():
     """Test if shifts system is available"""
     return {"message": "Shifts API is available", "status": "ok"}
 
@@ -109,7 +109,7 @@ class ShiftSummaryResponse(BaseModel):
 
 
 @router.post("/clock-in", response_model=ShiftResponse)
-async def clock_in(
+def clock_in(
     request: ClockInRequest,
     current_driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
@@ -184,13 +184,13 @@ async def clock_in(
         # If assignment exists and not yet stock verified, and has scanned UIDs, do stock verification
         if assignment and not assignment.stock_verified and has_scanned_uids:
             print(f"DEBUG: Routing to stock verification clock-in")
-            return await _clock_in_with_stock_verification(
+            return _clock_in_with_stock_verification(
                 request, current_driver, assignment, db
             )
         else:
             # Regular clock in
             print(f"DEBUG: Routing to regular clock-in") 
-            return await _regular_clock_in(request, current_driver, db)
+            return _regular_clock_in(request, current_driver, db)
             
     except HTTPException:
         raise
@@ -232,7 +232,7 @@ async def clock_in(
 
 
 @router.post("/clock-out", response_model=ShiftResponse)
-async def clock_out(
+def clock_out(
     request: ClockOutRequest,
     current_driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
@@ -262,7 +262,7 @@ async def clock_out(
 
 
 @router.get("/active", response_model=Optional[ShiftResponse])
-async def get_active_shift(
+def get_active_shift(
     current_driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
 ):
@@ -273,7 +273,7 @@ async def get_active_shift(
 
 
 @router.get("/history", response_model=List[ShiftResponse])
-async def get_shift_history(
+def get_shift_history(
     limit: int = 10,
     include_active: bool = True,
     current_driver: Driver = Depends(driver_auth),
@@ -290,7 +290,7 @@ async def get_shift_history(
 
 
 @router.get("/{shift_id}/summary", response_model=ShiftSummaryResponse)
-async def get_shift_summary(
+def get_shift_summary(
     shift_id: int,
     current_driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
@@ -323,7 +323,7 @@ async def get_shift_summary(
 
 
 @router.get("/status")
-async def get_shift_status(
+def get_shift_status(
     current_driver: Driver = Depends(driver_auth),
     db: Session = Depends(get_session)
 ):
@@ -364,7 +364,7 @@ async def get_shift_status(
 
 # Helper functions for unified clock-in
 
-async def _regular_clock_in(
+def _regular_clock_in(
     request: ClockInRequest, 
     driver: Driver, 
     db: Session
@@ -380,7 +380,7 @@ async def _regular_clock_in(
     return ShiftResponse.from_model(shift)
 
 
-async def _clock_in_with_stock_verification(
+def _clock_in_with_stock_verification(
     request: ClockInRequest,
     driver: Driver, 
     assignment: LorryAssignment,
@@ -415,7 +415,7 @@ async def _clock_in_with_stock_verification(
     unexpected_uids = []
     
     # Get expected UIDs for this lorry from previous day's verification
-    expected_uids = await _get_expected_lorry_stock(db, assignment.lorry_id, today)
+    expected_uids = _get_expected_lorry_stock(db, assignment.lorry_id, today)
     
     # Detect variances
     scanned_set = set(scanned_uids)
@@ -489,7 +489,7 @@ async def _clock_in_with_stock_verification(
     return ShiftResponse.from_model(shift)
 
 
-async def _get_expected_lorry_stock(db: Session, lorry_id: str, today: date) -> list:
+def _get_expected_lorry_stock(db: Session, lorry_id: str, today: date) -> list:
     """Get expected stock for lorry from actual transaction records"""
     from app.services.lorry_inventory_service import LorryInventoryService
     
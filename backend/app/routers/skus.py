@@ -53,7 +53,7 @@ class SKUResponse(BaseModel):
 
 
 @router.get("", response_model=dict)
-async def get_all_skus(
+def get_all_skus(
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN, Role.CASHIER))
 ):
@@ -87,7 +87,7 @@ async def get_all_skus(
 
 
 @router.post("", response_model=dict)
-async def create_sku(
+def create_sku(
     request: SKUCreateRequest,
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
@@ -150,7 +150,7 @@ async def create_sku(
 
 
 @router.get("/{sku_id}", response_model=dict)
-async def get_sku(
+def get_sku(
     sku_id: int,
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN, Role.CASHIER))
@@ -181,7 +181,7 @@ async def get_sku(
 
 
 @router.put("/{sku_id}", response_model=dict)
-async def update_sku(
+def update_sku(
     sku_id: int,
     request: SKUUpdateRequest,
     db: Session = Depends(get_session),
@@ -253,7 +253,7 @@ async def update_sku(
 
 
 @router.delete("/{sku_id}", response_model=dict)
-async def delete_sku(
+def delete_sku(
     sku_id: int,
     db: Session = Depends(get_session),
     current_user = Depends(require_roles(Role.ADMIN))
@@ -131,6 +131,7 @@ class TripOut(BaseModel):
     route_id: int | None = None
     pod_photo_url: str | None = None  # Deprecated, kept for backward compatibility
     pod_photo_urls: list[str] = []
+    pod_thumbnail_urls: list[str] = []
     commission: CommissionOut | None = None
 
     class Config:
@@ -0,0 +1,110 @@
+# Run with: python -m app.scripts.benchmark_apply_assignments [--orders 500] [--drivers 25] [--rounds 3]
+#
+# Seeds --orders scratch orders (a third already with a trip) and --drivers
+# drivers, then applies one assignment per order twice from the same starting
+# point: the old way (get order, driver, route and trip per assignment through
+# the ORM) and AssignmentService._apply_assignments (preloads plus bulk
+# statements), printing wall time and SQL statement count for each. Runs
+# against DATABASE_URL inside one outer transaction that is rolled back at the
+# end, so nothing is left behind.
+import argparse
+import time
+import uuid
+from datetime import date
+
+from sqlalchemy import and_, insert
+from sqlalchemy.orm import Session
+
+from app.db import configure_engine, track_queries
+from app.models import Customer, Driver, DriverRoute, Order, Trip
+from app.services.assignment_service import AssignmentService
+
+
+def _timed(label, fn):
+    with track_queries() as stats:
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+    print(f"{label:<9} {elapsed:8.1f}ms statements={stats.statements}")
+    return result
+
+
+def seed(db: Session, n_orders: int, n_drivers: int):
+    tag = uuid.uuid4().hex[:8]
+    driver_ids = list(db.execute(
+        insert(Driver).returning(Driver.id),
+        [{"name": f"Bench {i}", "firebase_uid": f"bench-{tag}-{i}"} for i in range(n_drivers)],
+    ).scalars())
+    customer_id = db.execute(
+        insert(Customer).returning(Customer.id), [{"name": "Bench", "address": "Jalan Bench, Shah Alam"}]
+    ).scalar_one()
+    order_ids = list(db.execute(
+        insert(Order).returning(Order.id),
+        [{"code": f"BENCH-{tag}-{i}", "type": "OUTRIGHT", "status": "NEW", "customer_id": customer_id}
+         for i in range(n_orders)],
+    ).scalars())
+    # A third of the orders were assigned before and get re-assigned
+    db.execute(insert(Trip), [
+        {"order_id": order_id, "driver_id": driver_ids[0], "status": "ASSIGNED"}
+        for order_id in order_ids[::3]
+    ])
+    return [
+        {"order_id": order_id, "driver_id": driver_ids[i % n_drivers]}
+        for i, order_id in enumerate(order_ids)
+    ]
+
+
+def old_apply(db: Session, assignments):
+    """The per-assignment _apply_assignment loop auto_assign_all ran before."""
+    today = date.today()
+    for a in assignments:
+        order = db.get(Order, a["order_id"])
+        driver = db.get(Driver, a["driver_id"])
+        route = (
+            db.query(DriverRoute)
+            .filter(and_(DriverRoute.driver_id == driver.id, DriverRoute.route_date == today))
+            .first()
+        )
+        if not route:
+            route = DriverRoute(driver_id=driver.id, route_date=today, name=f"{driver.name} - {today:%b %d}")
+            db.add(route)
+            db.flush()
+        trip = db.query(Trip).filter(Trip.order_id == order.id).first()
+        if trip:
+            trip.driver_id, trip.route_id, trip.status = driver.id, route.id, "ASSIGNED"
+        else:
+            db.add(Trip(order_id=order.id, driver_id=driver.id, route_id=route.id, status="ASSIGNED"))
+    db.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--drivers", type=int, default=25)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = configure_engine("script")
+    with engine.connect() as conn:
+        outer = conn.begin()
+        db = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            assignments = seed(db, args.orders, args.drivers)
+            db.flush()
+            for i in range(args.rounds):
+                print(f"-- round {i + 1}: {args.orders} assignments over {args.drivers} drivers")
+                for label, apply in (
+                    ("per-order", lambda: old_apply(db, assignments)),
+                    ("bulk", lambda: AssignmentService(db)._apply_assignments(assignments)),
+                ):
+                    db.expunge_all()
+                    savepoint = db.begin_nested()
+                    _timed(label, apply)
+                    savepoint.rollback()
+        finally:
+            db.close()
+            outer.rollback()
+
+
+if __name__ == "__main__":
+    main()
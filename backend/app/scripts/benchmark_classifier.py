@@ -0,0 +1,87 @@
+# Run with: python -m app.scripts.benchmark_classifier [--llm]
+#
+# Measures the rule-based stage 1 classifier against a labelled corpus:
+# how many messages it settles locally, how accurate those answers are, and
+# the latency of each path. With --llm the escalated messages are sent to the
+# model as well (needs OPENAI_API_KEY, spends tokens).
+import argparse
+import time
+
+from app.services.message_classifier import classify_by_rules
+
+CORPUS = [
+    # Full delivery orders
+    ("DELIVERY", "WC2024 hantar kepada Ahmad 012-3456789 wheelchair RM2000 sewa 6 bulan"),
+    ("DELIVERY", "KP1234\nNama: Siti Aminah\nTel: 013-2233445\nAlamat: No 12 Jalan Mawar 3, Taman Sri Muda, 40400 Shah Alam\nKatil hospital 3 function sewa RM350/bulan\nDelivery RM80\nHantar 28/8"),
+    ("DELIVERY", "Order WC3001\nEn. Lim 016-778 9900\nLot 5, Lorong Damai, Kg Baru Subang 40150\nWheelchair aluminium beli RM890\nPasang + hantar FOC"),
+    ("DELIVERY", "Deliver 19/8 to Puan Rosnah 011-23456789, Jln Ampang Hilir, 55000 KL. Oxygen concentrator 5L rent RM450 monthly"),
+    ("DELIVERY", "HB5521 Hospital bed 2 crank RM259 x 6 bulan ansuran\nCustomer: Mr Tan 012 555 1234\nTmn Desa Jaya 52100 Kepong\nPenghantaran RM100"),
+    ("DELIVERY", "Nama Aisyah\n019-8765432\nNo 3 Jalan SS2/24 47300 PJ\nKerusi roda ringan beli RM650\nDelivery percuma"),
+    ("DELIVERY", "OC778 install oxygen concentrator at Kampung Jawa 41000 Klang, contact 017-3344556, sewa RM380"),
+    ("DELIVERY", "Hantar esok ke Bandar Baru Bangi 43650, Encik Razak 012-9988776, commode chair RM180"),
+    ("DELIVERY", "WC4410\nAhmad Faiz 0123456789\nPersiaran Gurney 10250 Penang\nWheelchair sewa RM150\nDeliver 2/9"),
+    ("DELIVERY", "Tilam angin beli RM320, hantar ke Taman Melawati 53100, 013-7766554 Kak Yati"),
+    # Returns, buybacks, cancellations
+    ("RETURN", "WC2024 buyback RM500"),
+    ("RETURN", "Cancel WC2024 dengan denda RM100"),
+    ("RETURN", "Ambil balik order Ahmad wheelchair"),
+    ("RETURN", "KP1234 tamat sewa, collect esok"),
+    ("RETURN", "Batal ansuran HB5521 penalty RM200 pickup fee RM50"),
+    ("RETURN", "WC3001 beli balik RM300 diskaun 10%"),
+    ("RETURN", "Refund customer Siti RM150 for OC778"),
+    ("RETURN", "Return rental wheelchair Dr Wong, customer hantar sendiri"),
+    ("RETURN", "Pembatalan order KP9988"),
+    ("RETURN", "Ambil semula katil hospital En. Lim"),
+    ("RETURN", "HB1200 buy back RM700 collect"),
+    ("RETURN", "OC556 cancel installment denda RM100"),
+    # Hard or unclear ones that should escalate
+    ("UNCLEAR", "Hello, how are you?"),
+    ("UNCLEAR", "Boss, tolong check"),
+    ("DELIVERY", "Wheelchair RM2000"),
+    ("RETURN", "WC2024 adjust RM50"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--llm", action="store_true", help="also classify escalated messages with the LLM")
+    parser.add_argument("--repeat", type=int, default=200, help="timing repetitions for the rules path")
+    args = parser.parse_args()
+
+    settled = correct = 0
+    escalated = []
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for _, text in CORPUS:
+            classify_by_rules(text)
+    rule_us = (time.perf_counter() - start) / (args.repeat * len(CORPUS)) * 1e6
+
+    for label, text in CORPUS:
+        result = classify_by_rules(text)
+        if result is None:
+            escalated.append((label, text))
+            continue
+        settled += 1
+        ok = result["message_type"] == label
+        correct += ok
+        if not ok:
+            print(f"MISS rules  expected={label} got={result['message_type']} :: {text[:60]!r}")
+
+    total = len(CORPUS)
+    print(f"corpus={total} settled_by_rules={settled} ({settled / total:.0%}) escalated={len(escalated)}")
+    print(f"rules accuracy={correct}/{settled} ({(correct / settled if settled else 0):.0%}) latency={rule_us:.1f}us/message")
+
+    if args.llm and escalated:
+        from app.services.multi_stage_parser import multi_stage_parser
+
+        llm_correct = 0
+        start = time.perf_counter()
+        for label, text in escalated:
+            result = multi_stage_parser._classify_message(text)
+            llm_correct += result.get("message_type") == label
+        llm_ms = (time.perf_counter() - start) / len(escalated) * 1000
+        print(f"llm accuracy={llm_correct}/{len(escalated)} latency={llm_ms:.0f}ms/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Run with: python -m app.scripts.benchmark_concurrency --base-url http://localhost:8000 \
+#     --path /driver/shifts/status --token <driver id token> --concurrency 50
+#
+# Fires parallel "driver traffic" at --path while a probe requests /healthz at a
+# steady rate, then prints latency percentiles for both. When a handler blocks
+# the event loop the probe's p99 climbs with --concurrency; with every sync
+# handler offloaded to the threadpool it stays flat.
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+def _percentiles(samples):
+    if not samples:
+        return "n=0"
+    ordered = sorted(samples)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    return f"n={len(ordered)} p50={pick(0.50):.1f}ms p95={pick(0.95):.1f}ms p99={pick(0.99):.1f}ms max={ordered[-1] * 1000:.1f}ms"
+
+
+async def _load(client, path, total, concurrency, latencies, errors):
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                resp = await client.get(path)
+                if resp.status_code >= 500:
+                    errors.append(resp.status_code)
+            except httpx.HTTPError as e:
+                errors.append(type(e).__name__)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def _probe(client, stop, latencies, interval):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get("/healthz")
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(interval)
+
+
+async def run(args):
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, limits=limits, timeout=60) as client:
+        load_latencies, probe_latencies, errors = [], [], []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(client, stop, probe_latencies, args.probe_interval))
+        start = time.perf_counter()
+        await _load(client, args.path, args.requests, args.concurrency, load_latencies, errors)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe
+
+    print(f"load  {args.path} concurrency={args.concurrency} rps={len(load_latencies) / elapsed:.0f} errors={len(errors)}")
+    print(f"load  {_percentiles(load_latencies)}")
+    print(f"probe /healthz {_percentiles(probe_latencies)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency under parallel driver traffic")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/driver/shifts/status")
+    parser.add_argument("--token", default="")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
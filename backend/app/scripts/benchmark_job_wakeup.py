@@ -0,0 +1,110 @@
+# Run with: python -m app.scripts.benchmark_job_wakeup [--rounds 20] [--poll-secs 1.0]
+#
+# Measures how long a queued job waits before a worker claims it. Each round
+# commits one BENCH_NOOP job (with notify_job_enqueued, like every producer)
+# at a random point of the poll cycle and records commit-to-claim latency for
+# two claim loops: woken by app.worker's JobListener on NOTIFY, as the worker
+# runs now, and the previous fixed --poll-secs polling. Needs Postgres
+# (LISTEN/NOTIFY). Only BENCH_NOOP jobs are claimed and they are deleted at the
+# end; stop live workers first, or they may claim the benchmark jobs.
+import argparse
+import random
+import statistics
+import threading
+import time
+
+from sqlalchemy import delete, text
+from sqlalchemy.orm import Session
+
+from app import worker
+from app.db import configure_engine
+from app.models import Job
+from app.services.job_signal import notify_job_enqueued
+
+BENCH_KIND = "BENCH_NOOP"
+
+CLAIM = text(
+    """
+    UPDATE jobs SET status = 'done', updated_at = now()
+     WHERE kind = :kind AND status = 'queued'
+    RETURNING id
+"""
+)
+
+
+def enqueue(engine):
+    """Commit one benchmark job; returns (job id, commit time)."""
+    with Session(engine) as db:
+        job = Job(kind=BENCH_KIND, status="queued", payload={})
+        db.add(job)
+        db.flush()
+        job_id = job.id
+        notify_job_enqueued(db, BENCH_KIND)
+        db.commit()
+        return job_id, time.perf_counter()
+
+
+def claimer(engine, wait, stop: threading.Event, claimed: dict):
+    """Claim loop: ``wait()`` for the next pass, then claim every BENCH_NOOP job."""
+    while not stop.is_set():
+        wait()
+        with engine.begin() as conn:
+            for (job_id,) in conn.execute(CLAIM, {"kind": BENCH_KIND}):
+                claimed[job_id] = time.perf_counter()
+
+
+def run_mode(label, engine, wait, rounds: int, poll_secs: float, rng: random.Random):
+    stop = threading.Event()
+    claimed: dict = {}
+    thread = threading.Thread(target=claimer, args=(engine, wait, stop, claimed), daemon=True)
+    thread.start()
+    latencies = []
+    for _ in range(rounds):
+        time.sleep(rng.uniform(0, poll_secs))
+        job_id, committed = enqueue(engine)
+        while job_id not in claimed:
+            time.sleep(0.001)
+        latencies.append((claimed[job_id] - committed) * 1000)
+    stop.set()
+    worker.wake_event.set()
+    thread.join()
+    p95 = statistics.quantiles(latencies, n=20, method="inclusive")[-1] if len(latencies) > 1 else latencies[0]
+    print(
+        f"{label:<7} median={statistics.median(latencies):7.1f}ms p95={p95:7.1f}ms "
+        f"max={max(latencies):7.1f}ms rounds={rounds}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--poll-secs", type=float, default=1.0, help="interval of the old polling loop")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    engine = configure_engine("script")
+    listener = worker.start_listener()
+    if listener is None:
+        print("LISTEN/NOTIFY needs a Postgres DATABASE_URL")
+        return
+    if not listener.connected.wait(10):
+        print("listener did not connect")
+        return
+    rng = random.Random(args.seed)
+
+    def notify_wait():
+        worker.wake_event.wait(args.poll_secs * 30)
+        worker.wake_event.clear()
+
+    try:
+        run_mode("notify", engine, notify_wait, args.rounds, args.poll_secs, rng)
+        run_mode("poll", engine, lambda: time.sleep(args.poll_secs), args.rounds, args.poll_secs, rng)
+    finally:
+        worker.stop_event.set()
+        with Session(engine) as db:
+            db.execute(delete(Job).where(Job.kind == BENCH_KIND))
+            db.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Run with: python -m app.scripts.benchmark_lorry_stock [--uids 1000] [--rounds 3]
+#
+# Loads --uids fresh UIDs into a scratch lorry, delivers a tenth of them and
+# unloads the rest, printing wall time and SQL statement count per step. Runs
+# against DATABASE_URL inside one outer transaction that is rolled back at the
+# end (service commits become savepoints), so nothing is left behind.
+import argparse
+import time
+import uuid
+
+from sqlalchemy.orm import Session
+
+from app.db import configure_engine, track_queries
+from app.services.lorry_inventory_service import LorryInventoryService
+
+
+def _timed(label, fn):
+    with track_queries() as stats:
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+    print(f"{label:<10} {elapsed:8.1f}ms statements={stats.statements}")
+    return result
+
+
+def run_round(db: Session, n: int):
+    lorry_id = f"BENCH-{uuid.uuid4().hex[:8]}"
+    uids = [f"BENCH-{uuid.uuid4().hex[:12]}" for _ in range(n)]
+    service = LorryInventoryService(db)
+
+    loaded = _timed("load", lambda: service.load_uids(lorry_id, uids, admin_user_id=None, notes="benchmark"))
+    assert loaded["loaded_count"] == n, loaded["errors"][:3]
+
+    delivered = uids[: n // 10]
+    _timed("deliver", lambda: service.process_delivery_actions(
+        lorry_id, order_id=None, driver_id=None,
+        uid_actions=[{"action": "DELIVER", "uid": uid} for uid in delivered],
+    ))
+    stock = _timed("stock", lambda: service.get_current_stock(lorry_id))
+    assert len(stock) == n - len(delivered)
+
+    unloaded = _timed("unload", lambda: service.unload_uids(lorry_id, stock, admin_user_id=None, notes="benchmark"))
+    assert unloaded["unloaded_count"] == len(stock), unloaded["errors"][:3]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uids", type=int, default=1000, help="UIDs per load")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = configure_engine("script")
+    with engine.connect() as conn:
+        outer = conn.begin()
+        db = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            for i in range(args.rounds):
+                print(f"-- round {i + 1}: {args.uids} UIDs")
+                run_round(db, args.uids)
+        finally:
+            db.close()
+            outer.rollback()
+
+
+if __name__ == "__main__":
+    main()
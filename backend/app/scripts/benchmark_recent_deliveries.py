@@ -0,0 +1,107 @@
+# Run with: python -m app.scripts.benchmark_recent_deliveries [--drivers 50] [--trips 20] [--rounds 3]
+#
+# Seeds --drivers scratch drivers with --trips delivered trips each and loads
+# their recent delivery locations twice: the old way (one Trip query with
+# joinedload per driver) and AssignmentService._get_recent_delivery_locations
+# (one ROW_NUMBER() query for all drivers), printing wall time and SQL
+# statement count for each. Runs against DATABASE_URL inside one outer
+# transaction that is rolled back at the end, so nothing is left behind.
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, insert, select
+from sqlalchemy.orm import Session, joinedload
+
+from app.db import configure_engine, track_queries
+from app.models import Customer, Driver, Order, Trip
+from app.services.assignment_service import AssignmentService
+
+
+def _timed(label, fn):
+    with track_queries() as stats:
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+    print(f"{label:<9} {elapsed:8.1f}ms statements={stats.statements}")
+    return result
+
+
+def seed(db: Session, n_drivers: int, trips_per_driver: int):
+    tag = uuid.uuid4().hex[:8]
+    now = datetime.now(timezone.utc)
+    driver_ids = list(db.execute(
+        insert(Driver).returning(Driver.id),
+        [{"name": f"Bench {i}", "firebase_uid": f"bench-{tag}-{i}"} for i in range(n_drivers)],
+    ).scalars())
+    customer_ids = list(db.execute(
+        insert(Customer).returning(Customer.id),
+        [{"name": f"Bench {i}", "address": f"No {i}, Jalan Bench, Shah Alam", "lat": 3.07, "lng": 101.52}
+         for i in range(trips_per_driver)],
+    ).scalars())
+    order_ids = list(db.execute(
+        insert(Order).returning(Order.id),
+        [{"code": f"BENCH-{tag}-{i}", "type": "OUTRIGHT", "status": "DELIVERED", "customer_id": customer_ids[i % len(customer_ids)]}
+         for i in range(n_drivers * trips_per_driver)],
+    ).scalars())
+    db.execute(insert(Trip), [
+        {
+            "order_id": order_id,
+            "driver_id": driver_ids[i // trips_per_driver],
+            "status": "DELIVERED",
+            "delivered_at": now - timedelta(hours=i % 500),
+        }
+        for i, order_id in enumerate(order_ids)
+    ])
+    return driver_ids
+
+
+def old_recent_locations(db: Session, driver_ids):
+    """The per-driver query _get_available_drivers ran before the windowed one."""
+    thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
+    result = {}
+    for driver_id in driver_ids:
+        trips = (
+            db.query(Trip)
+            .options(joinedload(Trip.order).joinedload(Order.customer))
+            .filter(and_(Trip.driver_id == driver_id, Trip.status == "DELIVERED", Trip.delivered_at >= thirty_days_ago))
+            .limit(10)
+            .all()
+        )
+        result[driver_id] = [
+            {"order_id": t.order_id, "address": t.order.customer.address}
+            for t in trips
+            if t.order and t.order.customer and t.order.customer.address
+        ]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--drivers", type=int, default=50)
+    parser.add_argument("--trips", type=int, default=20, help="delivered trips per driver")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = configure_engine("script")
+    with engine.connect() as conn:
+        outer = conn.begin()
+        db = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            driver_ids = seed(db, args.drivers, args.trips)
+            db.flush()
+            service = AssignmentService(db)
+            for i in range(args.rounds):
+                print(f"-- round {i + 1}: {args.drivers} drivers x {args.trips} trips")
+                db.expunge_all()
+                old = _timed("n+1", lambda: old_recent_locations(db, driver_ids))
+                new = _timed("windowed", lambda: service._get_recent_delivery_locations(driver_ids))
+                assert {d: len(v) for d, v in old.items() if v} == {d: len(v) for d, v in new.items()}
+        finally:
+            db.close()
+            outer.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Run with: python -m app.scripts.benchmark_route_solver [--orders 150] [--drivers 12] [--seed 7]
+#
+# Builds one synthetic service day (orders around the Klang Valley and Kota
+# Kinabalu, a few not geocoded yet, drivers at both depots with some stops
+# already on their routes) and runs both assignment engines on it: the local
+# cheapest-insertion solver and, when OPENAI_API_KEY is set, the previous LLM
+# engine. Prints latency, orders assigned and total route km, costed the same
+# way for both (route_solver.assignment_route_km). Needs no database.
+import argparse
+import random
+import statistics
+import time
+
+from app.core.config import settings
+from app.services.assignment_service import AssignmentService
+from app.services.route_solver import DEPOTS, assignment_route_km, solve_assignments
+
+PENINSULAR_AREAS = ["Shah Alam", "Petaling Jaya", "Cheras", "Kepong", "Klang", "Ampang", "Rawang", "Bangi"]
+SABAH_AREAS = ["Kota Kinabalu", "Penampang", "Putatan", "Papar"]
+
+
+def _near(rng: random.Random, center, spread: float):
+    return round(center[0] + rng.uniform(-spread, spread), 6), round(center[1] + rng.uniform(-spread, spread), 6)
+
+
+def build_fixture(n_orders: int, n_drivers: int, seed: int):
+    rng = random.Random(seed)
+    orders = []
+    for i in range(1, n_orders + 1):
+        sabah = rng.random() < 0.15
+        area = rng.choice(SABAH_AREAS if sabah else PENINSULAR_AREAS)
+        center = DEPOTS["KOTA_KINABALU" if sabah else "BATU_CAVES"]
+        lat, lng = _near(rng, center, 0.25 if sabah else 0.35)
+        if rng.random() < 0.05:
+            lat = lng = None
+        orders.append({
+            "order_id": i,
+            "order_code": f"BM{i:04d}",
+            "customer_name": f"Customer {i}",
+            "address": f"No {i}, Jalan {i % 40}, {area}",
+            "total": float(rng.randint(100, 3000)),
+            "lat": lat,
+            "lng": lng,
+        })
+
+    drivers = []
+    n_sabah = max(1, n_drivers // 6)
+    for d in range(1, n_drivers + 1):
+        depot = "KOTA_KINABALU" if d <= n_sabah else "BATU_CAVES"
+        existing = []
+        for k in range(rng.randint(0, 3)):
+            lat, lng = _near(rng, DEPOTS[depot], 0.3)
+            existing.append({"order_id": 10000 + d * 10 + k, "address": "", "status": "ASSIGNED", "lat": lat, "lng": lng})
+        clocked_in = rng.random() < 0.6
+        drivers.append({
+            "driver_id": d,
+            "driver_name": f"Driver {d}",
+            "base_warehouse": depot,
+            "is_clocked_in": clocked_in,
+            "is_scheduled": True,
+            "priority": 1 if clocked_in else 2,
+            "active_trips": len(existing),
+            "existing_trip_locations": existing,
+            "lat": DEPOTS[depot][0],
+            "lng": DEPOTS[depot][1],
+        })
+    return orders, drivers
+
+
+def _report(label, timings_ms, assignments, orders, drivers):
+    km = assignment_route_km(assignments, orders, drivers)
+    print(
+        f"{label:<6} median={statistics.median(timings_ms):9.1f}ms runs={len(timings_ms)} "
+        f"assigned={len(assignments)}/{len(orders)} route_km={km:10.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=150)
+    parser.add_argument("--drivers", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=20, help="timing repetitions for the local solver")
+    args = parser.parse_args()
+
+    orders, drivers = build_fixture(args.orders, args.drivers, args.seed)
+    print(f"-- {len(orders)} orders, {len(drivers)} drivers, seed {args.seed}")
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        local = solve_assignments(orders, drivers, max_orders_per_driver=settings.ASSIGNMENT_MAX_ORDERS_PER_DRIVER)
+        timings.append((time.perf_counter() - start) * 1000)
+    _report("local", timings, local, orders, drivers)
+
+    service = AssignmentService(db=None)
+    if service.openai_client is None:
+        print("llm    skipped (OPENAI_API_KEY not set)")
+        return
+    start = time.perf_counter()
+    try:
+        llm = service._openai_assignments(orders, drivers) or []
+    except Exception as e:
+        print(f"llm    failed after {(time.perf_counter() - start) * 1000:.0f}ms: {e}")
+        return
+    _report("llm", [(time.perf_counter() - start) * 1000], llm, orders, drivers)
+
+
+if __name__ == "__main__":
+    main()
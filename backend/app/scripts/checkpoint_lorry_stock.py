@@ -0,0 +1,19 @@
+# Run with: python -m app.scripts.checkpoint_lorry_stock
+# Daily (after 01:00 KL): records each lorry's end-of-day stock for the last
+# settled day, so as-of stock reads replay at most a day or two of transactions.
+from app.db import SessionLocal, configure_engine
+from app.services.lorry_stock_state import settled_day, write_checkpoints
+
+def main():
+    configure_engine("script")
+    db = SessionLocal()
+    try:
+        day = settled_day()
+        written = write_checkpoints(db, day)
+        db.commit()
+        print(f"[checkpoint_lorry_stock] day={day} lorries={written}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 # Run with: python -m app.scripts.close_stale_shifts_3am
 from datetime import datetime, timedelta, timezone
 from sqlalchemy import select
-from app.db import SessionLocal
+from app.db import SessionLocal, configure_engine
 from app.models.driver_shift import DriverShift
 
 KL = timezone(timedelta(hours=8))
@@ -14,6 +14,7 @@ def next_cutoff_utc(start_utc):
     return cut_kl.astimezone(timezone.utc)
 
 def main():
+    configure_engine("script")
     db = SessionLocal()
     now = datetime.now(timezone.utc)
     closed = 0
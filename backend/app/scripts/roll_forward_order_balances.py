@@ -0,0 +1,17 @@
+# Run with: python -m app.scripts.roll_forward_order_balances
+# Daily (after midnight KL): refreshes order balance snapshots whose monthly
+# accrual stepped since they were computed, so list pages don't pay for it.
+from app.db import SessionLocal, configure_engine
+from app.services.order_balance import roll_forward_order_balances
+
+def main():
+    configure_engine("script")
+    db = SessionLocal()
+    try:
+        refreshed = roll_forward_order_balances(db)
+        print(f"[roll_forward_order_balances] refreshed={refreshed}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
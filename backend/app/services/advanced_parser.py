@@ -63,42 +63,16 @@ class AdvancedParserService:
             order_data = parse_whatsapp_text(text)
             order = create_from_parsed(db, order_data)
             
-            # Trigger auto-assignment after order creation
+            # Mark assignment dirty; the worker runs one debounced pass per burst
             import logging
             logger = logging.getLogger(__name__)
-            logger.info(f"Parser: About to trigger auto-assignment for order {order.id} ({order.code})")
-            print(f"Parser: About to trigger auto-assignment for order {order.id} ({order.code})")
-            
-            assignment_result = None
             try:
-                print(f"🚀 PARSER: Starting auto-assignment for order {order.id} ({order.code})")
-                logger.info(f"🚀 PARSER: Starting auto-assignment for order {order.id} ({order.code})")
-                
-                from ..services.assignment_service import AssignmentService
-                assignment_service = AssignmentService(db)
-                
-                print(f"🔍 PARSER: Assignment service created, calling auto_assign_all()")
-                logger.info(f"🔍 PARSER: Assignment service created, calling auto_assign_all()")
-                
-                assignment_result = assignment_service.auto_assign_all()
-                
-                print(f"✅ PARSER: Auto-assignment completed for order {order.id}: {assignment_result}")
-                logger.info(f"✅ PARSER: Auto-assignment completed for order {order.id}: {assignment_result}")
-                
-                if assignment_result.get('success'):
-                    assigned_count = assignment_result.get('total', 0)
-                    print(f"🎯 PARSER: Successfully assigned {assigned_count} orders including {order.id}")
-                    logger.info(f"🎯 PARSER: Successfully assigned {assigned_count} orders including {order.id}")
-                else:
-                    print(f"⚠️ PARSER: Assignment completed but no orders assigned: {assignment_result}")
-                    logger.warning(f"⚠️ PARSER: Assignment completed but no orders assigned: {assignment_result}")
-                    
+                from ..services.assignment_scheduler import request_auto_assign
+                assignment_result = request_auto_assign(db, reason=f"order:{order.id}")
+                db.commit()
             except Exception as e:
-                print(f"❌ PARSER: Auto-assignment FAILED for order {order.id}: {type(e).__name__}: {e}")
-                logger.error(f"❌ PARSER: Auto-assignment FAILED for order {order.id}: {type(e).__name__}: {e}")
-                import traceback
-                print(f"🔥 PARSER: Full traceback: {traceback.format_exc()}")
-                logger.error(f"🔥 PARSER: Full traceback: {traceback.format_exc()}")
+                db.rollback()
+                logger.error(f"Auto-assignment scheduling failed for order {order.id}: {type(e).__name__}: {e}")
                 assignment_result = {"success": False, "error": str(e)}
             
             return {
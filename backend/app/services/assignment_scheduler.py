@@ -0,0 +1,72 @@
+"""Coalesced scheduling of AUTO_ASSIGN passes
+
+Order creation used to run ``AssignmentService.auto_assign_all()`` inline, so a
+burst of 40 WhatsApp orders meant 40 full assignment passes. Callers now mark
+assignment as dirty with ``request_auto_assign``: it upserts the single queued
+AUTO_ASSIGN job (enforced by the ``uq_jobs_auto_assign_queued`` partial index)
+and sets its ``run_at`` to the end of the debounce window. Every request that
+lands in the window coalesces into that one job, which the worker runs once.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from .job_signal import notify_job_enqueued
+
+logger = logging.getLogger(__name__)
+
+AUTO_ASSIGN_KIND = "AUTO_ASSIGN"
+
+
+def request_auto_assign(
+    db: Session, reason: str = "", delay_secs: Optional[float] = None
+) -> Dict[str, Any]:
+    """Ensure an AUTO_ASSIGN pass runs within ``delay_secs``.
+
+    The job row is written in the caller's transaction; the caller commits.
+    A pending pass is never pushed later, only pulled earlier, so a steady
+    trickle of orders cannot starve assignment.
+    """
+    if delay_secs is None:
+        delay_secs = settings.AUTO_ASSIGN_DEBOUNCE_SECS
+    stmt = text(
+        """
+        INSERT INTO jobs (kind, payload, status, attempts, run_at)
+        VALUES (:kind, CAST(:payload AS JSONB), 'queued', 0,
+                now() + make_interval(secs => :delay))
+        ON CONFLICT (kind) WHERE kind = 'AUTO_ASSIGN' AND status = 'queued'
+        DO UPDATE SET run_at = LEAST(jobs.run_at, EXCLUDED.run_at)
+        RETURNING id, run_at, (xmax = 0) AS created
+    """
+    )
+    row = db.execute(
+        stmt,
+        {
+            "kind": AUTO_ASSIGN_KIND,
+            "payload": json.dumps({"reason": reason}),
+            "delay": max(0.0, float(delay_secs)),
+        },
+    ).mappings().one()
+    notify_job_enqueued(db, AUTO_ASSIGN_KIND)
+    logger.info(
+        "auto_assign_requested job_id=%s created=%s run_at=%s reason=%s",
+        row["id"],
+        row["created"],
+        row["run_at"],
+        reason,
+    )
+    return {
+        "success": True,
+        "scheduled": True,
+        "job_id": row["id"],
+        "coalesced": not row["created"],
+        "run_at": row["run_at"].isoformat() if row["run_at"] else None,
+        "message": "Auto-assignment scheduled",
+    }
@@ -3,10 +3,11 @@
 import os
 import json
 import logging
+import time
 from datetime import date, datetime, timezone, timedelta
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, func, insert, or_, select, update
 
 from app.models.order import Order
 from app.models.driver import Driver
@@ -15,6 +16,16 @@ from app.models.driver_route import DriverRoute
 from app.models.driver_shift import DriverShift
 from app.models.driver_schedule import DriverSchedule
 from app.models.customer import Customer
+from app.models.assignment_event import AssignmentEvent
+from app.services.geocoding import GeocodingService
+from app.services.route_solver import DEFAULT_DEPOT, DEPOTS, order_depot, solve_assignments
+from app.services.assignment_state import (
+    DRIVER_CHANGED,
+    AssignmentState,
+    get_assignment_state,
+    prune_assignment_events,
+    record_driver_changes,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -27,21 +38,61 @@ class AssignmentService:
     def __init__(self, db: Session):
         self.db = db
         self.openai_client = None
+        # DRIVER_CHANGED events logged by the last _apply_assignments
+        self.recorded_event_ids: List[int] = []
+        # Customers of candidate orders left without coordinates this pass
+        self.ungeocoded_customer_ids: set = set()
         
         from ..core.config import settings
         if settings.OPENAI_API_KEY:
             self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
 
     def auto_assign_all(self) -> Dict[str, Any]:
-        """Auto-assign all eligible orders to drivers"""
+        """Auto-assign eligible orders to drivers, re-solving only what changed"""
         print(f"🔍 ASSIGNMENT: Starting auto-assignment")
         logger.info("🔍 ASSIGNMENT: Starting auto-assignment")
         
-        # Get orders to assign
-        print(f"🔍 ASSIGNMENT: Getting orders to assign...")
-        orders = self._get_orders_to_assign()
-        print(f"🔍 ASSIGNMENT: Found {len(orders)} orders to assign")
-        logger.info(f"🔍 ASSIGNMENT: Found {len(orders)} orders to assign")
+        state = get_assignment_state(date.today())
+        with state.lock:
+            try:
+                result = self._auto_assign_with_state(state)
+            except Exception:
+                # Events may have been consumed without solving; rebuild next time
+                state.built_at = None
+                raise
+        self._geocode_missing(state)
+        return result
+    
+    def _geocode_missing(self, state: AssignmentState) -> None:
+        """Provider lookups for customers the pass found without coordinates.
+        
+        Runs after the pass, one short transaction per address, so no network
+        call happens inside the assignment transaction. Leftover orders of
+        resolved customers get the coordinates for later passes.
+        """
+        if not self.ungeocoded_customer_ids:
+            return
+        try:
+            found = GeocodingService(self.db).lookup_customers(self.ungeocoded_customer_ids)
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"Geocoding after assignment failed: {e}")
+            return
+        if not found:
+            return
+        with state.lock:
+            for order in state.orders.values():
+                point = found.get(order.get("customer_id"))
+                if point is not None:
+                    order["lat"], order["lng"] = point
+    
+    def _auto_assign_with_state(self, state: AssignmentState) -> Dict[str, Any]:
+        # Get orders to (re-)solve and current drivers
+        print(f"🔍 ASSIGNMENT: Refreshing assignment state...")
+        mode, orders = self._refresh_state(state)
+        drivers = state.drivers
+        print(f"🔍 ASSIGNMENT: {mode} refresh - {len(orders)} orders to assign, {len(drivers)} available drivers")
+        logger.info(f"🔍 ASSIGNMENT: {mode} refresh - {len(orders)} orders to assign, {len(drivers)} available drivers")
         
         if not orders:
             print(f"⚠️ ASSIGNMENT: No orders to assign")
@@ -49,51 +100,45 @@ class AssignmentService:
                 "success": True,
                 "message": "No orders to assign",
                 "assigned": [],
-                "total": 0
+                "total": 0,
+                "mode": mode
             }
         
-        # Get available drivers
-        print(f"🔍 ASSIGNMENT: Getting available drivers...")
-        drivers = self._get_available_drivers()
-        print(f"🔍 ASSIGNMENT: Found {len(drivers)} available drivers")
-        logger.info(f"🔍 ASSIGNMENT: Found {len(drivers)} available drivers")
-        
         if not drivers:
             print(f"❌ ASSIGNMENT: No available drivers")
             return {
                 "success": False,
                 "message": "No available drivers",
                 "assigned": [],
-                "total": 0
+                "total": 0,
+                "mode": mode
             }
         
-        # Get assignments from OpenAI or simple logic
-        print(f"🔍 ASSIGNMENT: Getting optimal assignments from OpenAI...")
+        # Get assignments from the configured engine
+        print(f"🔍 ASSIGNMENT: Computing assignments...")
         try:
             assignments = self._get_assignments(orders, drivers)
-            print(f"🔍 ASSIGNMENT: OpenAI returned {len(assignments)} assignments")
-            logger.info(f"🔍 ASSIGNMENT: OpenAI returned {len(assignments)} assignments")
+            print(f"🔍 ASSIGNMENT: Engine returned {len(assignments)} assignments")
+            logger.info(f"🔍 ASSIGNMENT: Engine returned {len(assignments)} assignments")
         except Exception as e:
-            print(f"❌ ASSIGNMENT: OpenAI assignment failed: {e}")
-            logger.error(f"❌ ASSIGNMENT: OpenAI assignment failed: {e}")
+            print(f"❌ ASSIGNMENT: Assignment engine failed: {e}")
+            logger.error(f"❌ ASSIGNMENT: Assignment engine failed: {e}")
             raise
         
-        # Apply assignments
+        # Apply assignments in bulk
         print(f"🔍 ASSIGNMENT: Applying {len(assignments)} assignments...")
-        assigned = []
-        for i, assignment in enumerate(assignments):
-            try:
-                print(f"🔍 ASSIGNMENT: Applying assignment {i+1}/{len(assignments)}: Order {assignment['order_id']} -> Driver {assignment['driver_id']}")
-                result = self._apply_assignment(assignment["order_id"], assignment["driver_id"])
-                assigned.append(result)
-                print(f"✅ ASSIGNMENT: Successfully assigned Order {assignment['order_id']} to Driver {assignment['driver_id']}")
-            except Exception as e:
-                print(f"❌ ASSIGNMENT: Failed to assign order {assignment['order_id']}: {e}")
-                logger.error(f"❌ ASSIGNMENT: Failed to assign order {assignment['order_id']}: {e}")
+        assigned, failed = self._apply_assignments(assignments)
+        for failure in failed:
+            logger.error(f"❌ ASSIGNMENT: Failed to assign order {failure['order_id']}: {failure['error']}")
+        
+        # Pushes are queued with the assignments, so they go out only once durable
+        self._notify_assigned(assigned)
         
         print(f"🔍 ASSIGNMENT: Committing database changes...")
         self.db.commit()
         
+        state.mark_assigned(assigned, self.recorded_event_ids)
+        
         print(f"✅ ASSIGNMENT: Auto-assignment completed - assigned {len(assigned)} orders")
         logger.info(f"✅ ASSIGNMENT: Auto-assignment completed - assigned {len(assigned)} orders")
         
@@ -101,13 +146,87 @@ class AssignmentService:
             "success": True,
             "message": f"Assigned {len(assigned)} orders",
             "assigned": assigned,
-            "total": len(assigned)
+            "total": len(assigned),
+            "mode": mode
         }
     
-    def _get_orders_to_assign(self) -> List[Dict[str, Any]]:
-        """Get orders that need assignment - using SAME logic as orders API"""
+    def _refresh_state(self, state: AssignmentState) -> tuple[str, List[Dict[str, Any]]]:
+        """Bring ``state`` up to date and return (mode, orders to solve).
+        
+        Full rebuild when cold or older than ASSIGNMENT_STATE_MAX_AGE_SECS,
+        otherwise apply assignment_events since the last pass.
+        """
+        from ..core.config import settings
+        
+        recent = AssignmentEvent.created_at >= datetime.now(timezone.utc) - timedelta(
+            seconds=settings.ASSIGNMENT_EVENT_LOOKBACK_SECS
+        )
+        if state.is_stale(settings.ASSIGNMENT_STATE_MAX_AGE_SECS):
+            # Read the high-water mark first so events racing the rebuild are replayed
+            state.last_event_id = self.db.execute(select(func.max(AssignmentEvent.id))).scalar() or 0
+            state.seen_event_ids = set(
+                self.db.execute(
+                    select(AssignmentEvent.id).where(recent, AssignmentEvent.id <= state.last_event_id)
+                ).scalars()
+            )
+            state.orders = {o["order_id"]: o for o in self._get_orders_to_assign()}
+            state.drivers = self._get_available_drivers()
+            state.own_event_ids.clear()
+            state.built_at = time.monotonic()
+            prune_assignment_events(self.db)
+            return "full", list(state.orders.values())
+        
+        # Ids are assigned at insert, not commit: re-read the lookback window
+        # too so a late commit below the watermark is not skipped
+        events = self.db.execute(
+            select(AssignmentEvent.id, AssignmentEvent.kind, AssignmentEvent.order_id, AssignmentEvent.driver_id)
+            .where(or_(AssignmentEvent.id > state.last_event_id, recent))
+            .order_by(AssignmentEvent.id)
+        ).all()
+        read_ids = {e.id for e in events}
+        events = [e for e in events if e.id not in state.seen_event_ids]
+        state.seen_event_ids = read_ids
+        if not events:
+            return "incremental", []
+        state.last_event_id = max(state.last_event_id, events[-1].id)
+        # Load from our own assignments is already on state.drivers
+        events = [e for e in events if e.id not in state.own_event_ids]
+        state.own_event_ids -= read_ids
+        
+        changed_orders = {e.order_id for e in events if e.order_id is not None}
+        changed_drivers = {e.driver_id for e in events if e.kind == DRIVER_CHANGED}
+        
+        solve_ids = set(changed_orders)
+        if changed_drivers:
+            before = {d["driver_id"]: d for d in state.drivers}
+            state.drivers = self._get_available_drivers()
+            after = {d["driver_id"]: d for d in state.drivers}
+            # Capacity or availability moved: the leftover orders of those depots are in play
+            if None in changed_drivers:
+                depots = set(DEPOTS)
+            else:
+                depots = {
+                    d["base_warehouse"] if d["base_warehouse"] in DEPOTS else DEFAULT_DEPOT
+                    for driver_id in changed_drivers
+                    for d in (before.get(driver_id), after.get(driver_id))
+                    if d is not None
+                }
+            solve_ids |= {oid for oid, o in state.orders.items() if order_depot(o) in depots}
+        
+        # Re-check the solve set against the DB; this also drops orders that
+        # were assigned, cancelled or delivered elsewhere
+        fresh = {o["order_id"]: o for o in self._get_orders_to_assign(order_ids=solve_ids)} if solve_ids else {}
+        for order_id in solve_ids:
+            state.orders.pop(order_id, None)
+        state.orders.update(fresh)
+        return "incremental", list(fresh.values())
+    
+    def _get_orders_to_assign(self, order_ids: Optional[set] = None) -> List[Dict[str, Any]]:
+        """Get orders that need assignment - using SAME logic as orders API
+        
+        ``order_ids`` restricts the check to those orders (incremental passes).
+        """
         from app.routers.orders import kl_day_bounds
-        from sqlalchemy import select
         
         today = date.today()
         start_utc, end_utc = kl_day_bounds(today)
@@ -135,18 +254,35 @@ class AssignmentService:
             )
         )
         
+        if order_ids is not None:
+            stmt = stmt.where(Order.id.in_(order_ids))
+        
         orders = self.db.execute(stmt).scalars().unique().all()
         
+        # Resolve missing customer coordinates from map_url / cache only; provider
+        # calls run after the pass (_geocode_missing)
+        customers = [o.customer for o in orders if o.customer is not None]
+        try:
+            with self.db.begin_nested():
+                GeocodingService(self.db).geocode_customers(customers, max_lookups=0)
+        except Exception as e:
+            logger.warning(f"Geocoding before assignment failed: {e}")
+        self.ungeocoded_customer_ids.update(c.id for c in customers if c.lat is None or c.lng is None)
+        
         result = []
         for order in orders:
+            customer = order.customer
+            has_coords = customer is not None and customer.lat is not None and customer.lng is not None
             result.append({
                 "order_id": order.id,
                 "order_code": order.code,
-                "customer_name": order.customer.name if order.customer else "Unknown",
-                "address": order.customer.address if order.customer else "No address",
+                "customer_id": order.customer_id,
+                "customer_name": customer.name if customer else "Unknown",
+                "address": customer.address if customer else "No address",
                 "total": float(order.total) if order.total else 0,
-                "lat": 3.1390,  # KL center - replace with proper geocoding later
-                "lng": 101.6869
+                # None when not geocoded yet; the solver falls back to address keywords
+                "lat": float(customer.lat) if has_coords else None,
+                "lng": float(customer.lng) if has_coords else None,
             })
         
         logger.debug(f"Found {len(result)} orders to assign")
@@ -160,29 +296,30 @@ class AssignmentService:
         # Get scheduled drivers for today ONLY
         # Get scheduled drivers for TODAY ONLY - no date range
         # DEBUGGING: This should only return drivers 2 and 3 for 2025-09-01
-        scheduled_drivers = (
-            self.db.query(DriverSchedule)
-            .filter(
-                and_(
-                    DriverSchedule.schedule_date == today,
-                    DriverSchedule.is_scheduled == True
+        scheduled_ids = set(
+            self.db.execute(
+                select(DriverSchedule.driver_id).where(
+                    and_(
+                        DriverSchedule.schedule_date == today,
+                        DriverSchedule.is_scheduled == True
+                    )
                 )
-            )
-            .all()
+            ).scalars()
         )
         
-        if not scheduled_drivers:
+        if not scheduled_ids:
             logger.debug("No scheduled drivers for today")
             return []
         
-        scheduled_ids = {schedule.driver_id for schedule in scheduled_drivers}
-        
         # Get clocked-in drivers
-        clocked_in_shifts = self.db.query(DriverShift).filter(DriverShift.status == "ACTIVE").all()
-        clocked_in_ids = {shift.driver_id for shift in clocked_in_shifts}
-        
-        # OPTIMIZED: Get drivers with active trips in single query
-        from sqlalchemy import func
+        clocked_in_ids = set(
+            self.db.execute(
+                select(DriverShift.driver_id).where(
+                    DriverShift.status == "ACTIVE",
+                    DriverShift.driver_id.in_(scheduled_ids),
+                )
+            ).scalars()
+        )
         
         # Get active trips count per driver in one query
         active_trips_subquery = (
@@ -208,51 +345,31 @@ class AssignmentService:
             .all()
         )
         
+        # Last 10 deliveries per driver (30 days) for area familiarity, all drivers in one query
+        recent_by_driver = self._get_recent_delivery_locations([d.id for d, _ in drivers])
+        
         result = []
         for driver, active_count in drivers:
             is_clocked_in = driver.id in clocked_in_ids
             active_trips_count = active_count or 0
-            
-            # Get recent delivery history for area familiarity (last 30 days)
-            thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
-            
-            recent_trips = (
-                self.db.query(Trip)
-                .options(joinedload(Trip.order).joinedload(Order.customer))
-                .filter(
-                    and_(
-                        Trip.driver_id == driver.id,
-                        Trip.status == "DELIVERED",
-                        Trip.delivered_at >= thirty_days_ago
-                    )
-                )
-                .limit(10)  # Last 10 deliveries for area pattern
-                .all()
-            )
-            
-            existing_trip_locations = []
-            for trip in recent_trips:
-                if trip.order and trip.order.customer and trip.order.customer.address:
-                    existing_trip_locations.append({
-                        "order_id": trip.order_id,
-                        "address": trip.order.customer.address,
-                        "status": "DELIVERED"
-                    })
+            existing_trip_locations = recent_by_driver.get(driver.id, [])
             
             # Priority: 1=Scheduled+Clocked, 2=Scheduled only
             priority = 1 if is_clocked_in else 2
+            base_warehouse = getattr(driver, 'base_warehouse', None) or DEFAULT_DEPOT
+            depot_lat, depot_lng = DEPOTS.get(base_warehouse, DEPOTS[DEFAULT_DEPOT])
             
             result.append({
                 "driver_id": driver.id,
                 "driver_name": driver.name or f"Driver {driver.id}",
-                "base_warehouse": getattr(driver, 'base_warehouse', 'BATU_CAVES'),
+                "base_warehouse": base_warehouse,
                 "is_clocked_in": is_clocked_in,
                 "is_scheduled": True,  # All are scheduled
                 "priority": priority,
                 "active_trips": active_trips_count,
                 "existing_trip_locations": existing_trip_locations,
-                "lat": 3.1390,  # KL center - not used for location tracking
-                "lng": 101.6869
+                "lat": depot_lat,  # Drivers start from their base warehouse
+                "lng": depot_lng
             })
         
         # Sort: Scheduled+Clocked first (priority 1), then Scheduled only (priority 2), then by workload
@@ -261,17 +378,78 @@ class AssignmentService:
         logger.debug(f"Found {len(result)} scheduled drivers")
         return result
     
+    def _get_recent_delivery_locations(
+        self, driver_ids: List[int], per_driver: int = 10, days: int = 30
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        """Most recent delivered locations per driver, via one ROW_NUMBER() query."""
+        if not driver_ids:
+            return {}
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        rn = (
+            func.row_number()
+            .over(partition_by=Trip.driver_id, order_by=Trip.delivered_at.desc())
+            .label("rn")
+        )
+        recent = (
+            select(
+                Trip.driver_id,
+                Trip.order_id,
+                Customer.address,
+                Customer.lat,
+                Customer.lng,
+                rn,
+            )
+            .join(Order, Order.id == Trip.order_id)
+            .join(Customer, Customer.id == Order.customer_id)
+            .where(
+                and_(
+                    Trip.driver_id.in_(driver_ids),
+                    Trip.status == "DELIVERED",
+                    Trip.delivered_at >= since,
+                    Customer.address.isnot(None),
+                )
+            )
+            .subquery()
+        )
+        rows = self.db.execute(
+            select(recent)
+            .where(recent.c.rn <= per_driver)
+            .order_by(recent.c.driver_id, recent.c.rn)
+        ).all()
+        
+        result: Dict[int, List[Dict[str, Any]]] = {}
+        for row in rows:
+            result.setdefault(row.driver_id, []).append({
+                "order_id": row.order_id,
+                "address": row.address,
+                "status": "DELIVERED",
+                "lat": float(row.lat) if row.lat is not None else None,
+                "lng": float(row.lng) if row.lng is not None else None,
+            })
+        return result
+    
     def _get_assignments(self, orders: List[Dict], drivers: List[Dict]) -> List[Dict[str, Any]]:
-        """Get optimal assignments using OpenAI with fallback to simple logic"""
+        """Get assignments from the configured engine (ASSIGNMENT_ENGINE).
+
+        "local" runs the in-process solver. "llm" asks OpenAI and falls back to
+        the local solver when no API key is set or the call fails.
+        """
+        from ..core.config import settings
         
         if len(orders) == 0 or len(drivers) == 0:
             return []
         
-        # ONLY use OpenAI - no manual fallback logic
-        if not self.openai_client:
-            raise ValueError("OpenAI API key required for PhD-level route optimization. Manual assignment disabled.")
+        if settings.ASSIGNMENT_ENGINE == "llm" and self.openai_client:
+            try:
+                assignments = self._openai_assignments(orders, drivers)
+                if assignments is not None:
+                    return assignments
+            except Exception as e:
+                logger.warning(f"LLM assignment failed, using local solver: {e}")
         
-        return self._openai_assignments(orders, drivers)
+        return solve_assignments(
+            orders, drivers, max_orders_per_driver=settings.ASSIGNMENT_MAX_ORDERS_PER_DRIVER
+        )
     
     def _openai_assignments(self, orders: List[Dict], drivers: List[Dict]) -> List[Dict[str, Any]]:
         """Use OpenAI for optimal assignments with proximity consideration"""
@@ -399,61 +577,131 @@ Always return pure JSON - no explanations needed."""
             # No fallback - force OpenAI-only optimization
             raise ValueError(f"PhD-level optimization failed: {e}. Check OpenAI API configuration.")
     
-    # 🚀 PURE AI OPTIMIZATION - All manual logic removed
-    # Let OpenAI's PhD-level expertise handle everything!
-    
     def _apply_assignment(self, order_id: int, driver_id: int) -> Dict[str, Any]:
         """Apply a single assignment - create trip and route if needed"""
-        order = self.db.get(Order, order_id)
-        driver = self.db.get(Driver, driver_id)
+        assigned, failed = self._apply_assignments([{"order_id": order_id, "driver_id": driver_id}])
+        if failed:
+            raise ValueError(failed[0]["error"])
+        return assigned[0]
+    
+    def _apply_assignments(self, assignments: List[Dict[str, Any]]) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Apply many assignments with a fixed number of queries.
         
-        if not order or not driver:
-            raise ValueError(f"Order {order_id} or Driver {driver_id} not found")
+        Orders, drivers, today's routes and existing trips are preloaded with
+        IN-queries, missing routes are created with one INSERT .. RETURNING
+        and trips are upserted with one executemany UPDATE and one INSERT.
+        Returns (assigned, failed); nothing is committed.
+        """
+        if not assignments:
+            return [], []
         
-        # Get or create today's route for driver
         today = date.today()
-        route = (
-            self.db.query(DriverRoute)
-            .filter(
-                and_(
-                    DriverRoute.driver_id == driver_id,
-                    DriverRoute.route_date == today
-                )
-            )
-            .first()
-        )
+        order_ids = {a["order_id"] for a in assignments}
+        driver_ids = {a["driver_id"] for a in assignments}
         
-        if not route:
-            route = DriverRoute(
-                driver_id=driver_id,
-                route_date=today,
-                name=f"{driver.name or 'Driver'} - {today.strftime('%b %d')}",
-                notes=f"Auto-created for {driver.name or f'Driver {driver_id}'}"
-            )
-            self.db.add(route)
-            self.db.flush()
-        
-        # Create or update trip
-        trip = self.db.query(Trip).filter(Trip.order_id == order_id).first()
-        if trip:
-            if trip.status in {"DELIVERED", "SUCCESS"}:
-                raise ValueError(f"Order {order_id} already delivered")
-            trip.driver_id = driver_id
-            trip.route_id = route.id
-            trip.status = "ASSIGNED"
-        else:
-            trip = Trip(
-                order_id=order_id,
-                driver_id=driver_id,
-                route_id=route.id,
-                status="ASSIGNED"
-            )
-            self.db.add(trip)
+        orders = {
+            o.id: o for o in self.db.execute(select(Order).where(Order.id.in_(order_ids))).scalars()
+        }
+        drivers = {
+            d.id: d for d in self.db.execute(select(Driver).where(Driver.id.in_(driver_ids))).scalars()
+        }
+        routes: Dict[int, DriverRoute] = {}
+        for route in self.db.execute(
+            select(DriverRoute)
+            .where(and_(DriverRoute.driver_id.in_(driver_ids), DriverRoute.route_date == today))
+            .order_by(DriverRoute.id)
+        ).scalars():
+            routes.setdefault(route.driver_id, route)
+        trips = {
+            t.order_id: t for t in self.db.execute(select(Trip).where(Trip.order_id.in_(order_ids))).scalars()
+        }
         
-        return {
-            "order_id": order_id,
-            "order_code": order.code,
-            "driver_id": driver_id,
-            "driver_name": driver.name,
-            "route_id": route.id
-        }
\ No newline at end of file
+        valid: List[Dict[str, Any]] = []
+        failed: List[Dict[str, Any]] = []
+        seen_orders = set()
+        for a in assignments:
+            order_id, driver_id = a["order_id"], a["driver_id"]
+            if order_id not in orders or driver_id not in drivers:
+                failed.append({**a, "error": f"Order {order_id} or Driver {driver_id} not found"})
+            elif order_id in seen_orders:
+                failed.append({**a, "error": f"Order {order_id} assigned more than once"})
+            elif order_id in trips and trips[order_id].status in {"DELIVERED", "SUCCESS"}:
+                failed.append({**a, "error": f"Order {order_id} already delivered"})
+            else:
+                seen_orders.add(order_id)
+                valid.append(a)
+        
+        # Create today's route for every driver that lacks one, in one statement
+        new_routes = []
+        for driver_id in sorted({a["driver_id"] for a in valid} - routes.keys()):
+            driver = drivers[driver_id]
+            new_routes.append({
+                "driver_id": driver_id,
+                "route_date": today,
+                "name": f"{driver.name or 'Driver'} - {today.strftime('%b %d')}",
+                "notes": f"Auto-created for {driver.name or f'Driver {driver_id}'}",
+            })
+        route_ids: Dict[int, int] = {d: r.id for d, r in routes.items()}
+        if new_routes:
+            for row in self.db.execute(
+                insert(DriverRoute).returning(DriverRoute.id, DriverRoute.driver_id),
+                new_routes,
+            ):
+                route_ids[row.driver_id] = row.id
+        
+        # Upsert trips: one executemany UPDATE, one executemany INSERT
+        now = datetime.now(timezone.utc)
+        trip_updates = []
+        trip_inserts = []
+        for a in valid:
+            order_id, driver_id = a["order_id"], a["driver_id"]
+            values = {"driver_id": driver_id, "route_id": route_ids[driver_id], "status": "ASSIGNED"}
+            trip = trips.get(order_id)
+            if trip:
+                trip_updates.append({"id": trip.id, **values, "updated_at": now})
+            else:
+                trip_inserts.append({"order_id": order_id, **values})
+        if trip_updates:
+            self.db.execute(update(Trip), trip_updates)
+        if trip_inserts:
+            self.db.execute(insert(Trip), trip_inserts)
+        # Bulk statements don't touch the identity map: reload what they changed on next access
+        for a in valid:
+            trip = trips.get(a["order_id"])
+            if trip is not None:
+                self.db.expire(trip)
+            else:
+                self.db.expire(orders[a["order_id"]], ["trip"])
+        for route in routes.values():
+            self.db.expire(route, ["trips"])
+        # Bulk statements skip the flush hook; other processes' states need to see the new load
+        self.recorded_event_ids = record_driver_changes(self.db, {a["driver_id"] for a in valid})
+        
+        assigned = [
+            {
+                "order_id": a["order_id"],
+                "order_code": orders[a["order_id"]].code,
+                "driver_id": a["driver_id"],
+                "driver_name": drivers[a["driver_id"]].name,
+                "route_id": route_ids[a["driver_id"]]
+            }
+            for a in valid
+        ]
+        return assigned, failed
+    
+    def _notify_assigned(self, assigned: List[Dict[str, Any]]) -> None:
+        """Queue the same FCM push as manual /orders/{id}/assign for each assignment.
+
+        Written to the outbox in the assignment transaction; app.worker sends them.
+        """
+        if not assigned:
+            return
+        from .fcm import enqueue_order_assigned
+        
+        orders = {
+            o.id: o
+            for o in self.db.execute(
+                select(Order).where(Order.id.in_({a["order_id"] for a in assigned}))
+            ).scalars()
+        }
+        enqueue_order_assigned(self.db, [(a["driver_id"], orders[a["order_id"]]) for a in assigned])
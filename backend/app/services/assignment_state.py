@@ -0,0 +1,197 @@
+"""Incremental assignment state per service day
+
+Each process keeps one ``AssignmentState`` for today: the unassigned candidate
+orders and the available drivers with their current load. Instead of
+rebuilding both on every ``auto_assign_all`` call, the state reads the
+``assignment_events`` log written since its last pass and re-solves only the
+delta:
+
+- ORDER_CHANGED: re-check just those orders and solve the ones still unassigned.
+- DRIVER_CHANGED: reload drivers (a fixed handful of queries) and re-solve the
+  leftover orders of the changed drivers' depots, since capacity or clock-in
+  status moved there. Trip writes log it only when they move a driver's
+  active-trip count.
+
+The DRIVER_CHANGED events a pass logs for its own assignments are skipped by
+the same process, since ``mark_assigned`` already applied that load.
+
+Event ids come from a sequence at insert time, not in commit order, so a
+transaction can commit an id below one already read. Each refresh therefore
+re-reads the last ASSIGNMENT_EVENT_LOOKBACK_SECS of events as well and skips
+the ids it has already seen.
+
+Events are recorded by a ``after_flush`` hook on every Session, so order
+creation, trip status changes, shift clock-in/out and schedule edits are
+captured wherever they happen. A full rebuild still runs on a cold start, on a
+new day and every ASSIGNMENT_STATE_MAX_AGE_SECS as a safety net.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import delete, event, insert, inspect
+from sqlalchemy.orm import Session
+
+from ..models import AssignmentEvent, DriverSchedule, DriverShift, Order, Trip
+
+logger = logging.getLogger(__name__)
+
+ORDER_CHANGED = "ORDER_CHANGED"
+DRIVER_CHANGED = "DRIVER_CHANGED"
+
+# Attributes whose change can move an order in or out of the candidate set
+_ORDER_ATTRS = ("status", "type", "parent_id", "delivery_date", "customer_id")
+_TRIP_ATTRS = ("status", "driver_id", "route_id")
+# Trips counted as a driver's current load
+ACTIVE_TRIP_STATUSES = ("ASSIGNED", "STARTED")
+_SHIFT_ATTRS = ("status",)
+_SCHEDULE_ATTRS = ("is_scheduled", "schedule_date", "driver_id", "status")
+
+
+def _changed(obj, attrs) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+
+def _previous(obj, attr):
+    deleted = inspect(obj).attrs[attr].history.deleted
+    return deleted[0] if deleted else getattr(obj, attr)
+
+
+def _load_moves(old_driver, old_status, new_driver, new_status) -> List[int]:
+    """Drivers whose active-trip count changes when a trip goes from old to new."""
+    was_active = old_status in ACTIVE_TRIP_STATUSES and old_driver is not None
+    is_active = new_status in ACTIVE_TRIP_STATUSES and new_driver is not None
+    if was_active and is_active and old_driver == new_driver:
+        return []
+    return [d for d, active in ((old_driver, was_active), (new_driver, is_active)) if active]
+
+
+@event.listens_for(Session, "after_flush")
+def _record_assignment_events(session: Session, flush_context) -> None:
+    rows: List[Dict[str, Any]] = []
+
+    def add(kind: str, order_id: Optional[int] = None, driver_id: Optional[int] = None):
+        rows.append({"kind": kind, "order_id": order_id, "driver_id": driver_id})
+
+    for obj in session.new:
+        if isinstance(obj, Order):
+            add(ORDER_CHANGED, order_id=obj.id)
+        elif isinstance(obj, Trip):
+            add(ORDER_CHANGED, order_id=obj.order_id)
+            for driver_id in _load_moves(None, None, obj.driver_id, obj.status):
+                add(DRIVER_CHANGED, driver_id=driver_id)
+        elif isinstance(obj, (DriverShift, DriverSchedule)):
+            add(DRIVER_CHANGED, driver_id=obj.driver_id)
+
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            if _changed(obj, _ORDER_ATTRS):
+                add(ORDER_CHANGED, order_id=obj.id)
+        elif isinstance(obj, Trip):
+            if _changed(obj, _TRIP_ATTRS):
+                add(ORDER_CHANGED, order_id=obj.order_id)
+                moves = _load_moves(
+                    _previous(obj, "driver_id"), _previous(obj, "status"), obj.driver_id, obj.status
+                )
+                for driver_id in moves:
+                    add(DRIVER_CHANGED, driver_id=driver_id)
+        elif isinstance(obj, DriverShift):
+            if _changed(obj, _SHIFT_ATTRS):
+                add(DRIVER_CHANGED, driver_id=obj.driver_id)
+        elif isinstance(obj, DriverSchedule):
+            if _changed(obj, _SCHEDULE_ATTRS):
+                add(DRIVER_CHANGED, driver_id=obj.driver_id)
+
+    for obj in session.deleted:
+        if isinstance(obj, Trip):
+            add(ORDER_CHANGED, order_id=obj.order_id)
+            for driver_id in _load_moves(obj.driver_id, obj.status, None, None):
+                add(DRIVER_CHANGED, driver_id=driver_id)
+        elif isinstance(obj, DriverSchedule):
+            add(DRIVER_CHANGED, driver_id=obj.driver_id)
+
+    if rows:
+        session.connection().execute(AssignmentEvent.__table__.insert(), rows)
+
+
+def record_driver_changes(db: Session, driver_ids) -> List[int]:
+    """Log DRIVER_CHANGED for writes that bypass the flush hook (bulk statements).
+
+    Returns the new event ids.
+    """
+    rows = [{"kind": DRIVER_CHANGED, "order_id": None, "driver_id": d} for d in sorted(set(driver_ids))]
+    if not rows:
+        return []
+    tbl = AssignmentEvent.__table__
+    return list(db.execute(insert(tbl).returning(tbl.c.id), rows).scalars())
+
+
+class AssignmentState:
+    def __init__(self, service_date: date):
+        self.service_date = service_date
+        self.lock = threading.Lock()
+        self.orders: Dict[int, Dict[str, Any]] = {}
+        self.drivers: List[Dict[str, Any]] = []
+        self.last_event_id = 0
+        # Ids read by the last refresh, so the lookback window isn't replayed
+        self.seen_event_ids: Set[int] = set()
+        # Events this process logged for load mark_assigned already applied
+        self.own_event_ids: Set[int] = set()
+        self.built_at: Optional[float] = None
+
+    def is_stale(self, max_age_secs: float) -> bool:
+        return self.built_at is None or time.monotonic() - self.built_at > max_age_secs
+
+    def driver(self, driver_id: int) -> Optional[Dict[str, Any]]:
+        for d in self.drivers:
+            if d["driver_id"] == driver_id:
+                return d
+        return None
+
+    def mark_assigned(self, assigned: List[Dict[str, Any]], event_ids: List[int] = ()) -> None:
+        """Move assigned orders out of the candidate set and onto driver load.
+
+        ``event_ids`` are the DRIVER_CHANGED events logged for these
+        assignments; the next refresh skips them.
+        """
+        self.own_event_ids.update(event_ids)
+        for a in assigned:
+            order = self.orders.pop(a["order_id"], None)
+            driver = self.driver(a["driver_id"])
+            if driver is None:
+                continue
+            driver["active_trips"] = driver.get("active_trips", 0) + 1
+            if order is not None:
+                # Today's stops anchor clustering for the next delta
+                driver.setdefault("existing_trip_locations", []).append({
+                    "order_id": order["order_id"],
+                    "address": order.get("address"),
+                    "status": "ASSIGNED",
+                    "lat": order.get("lat"),
+                    "lng": order.get("lng"),
+                })
+
+
+_states: Dict[date, AssignmentState] = {}
+_states_lock = threading.Lock()
+
+
+def get_assignment_state(service_date: date) -> AssignmentState:
+    """Process-wide state for ``service_date``; other days are dropped."""
+    with _states_lock:
+        state = _states.get(service_date)
+        if state is None:
+            _states.clear()
+            state = _states[service_date] = AssignmentState(service_date)
+        return state
+
+
+def prune_assignment_events(db: Session, keep_days: int = 2) -> None:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=keep_days)
+    db.execute(delete(AssignmentEvent).where(AssignmentEvent.created_at < cutoff))
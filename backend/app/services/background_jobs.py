@@ -61,12 +61,14 @@ class BackgroundJobService:
         # Create corresponding worker job for actual processing
         try:
             from ..models import Job
+            from .job_signal import notify_job_enqueued
             worker_job = Job(
                 kind="PARSE_CREATE",
                 status="queued", 
                 payload={"text": text, "background_job_id": job.id}
             )
             db.add(worker_job)
+            notify_job_enqueued(db, worker_job.kind)
             db.commit()
             print(f"✅ Created worker job {worker_job.id} for background job {job.id}")
         except Exception as e:
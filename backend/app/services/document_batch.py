@@ -0,0 +1,207 @@
+"""Batch invoice/receipt rendering for month-end runs
+
+ReportLab is CPU-bound and holds the GIL, so rendering hundreds of documents
+in request threads (or worker threads) runs them one at a time. A batch is
+queued as a ``RENDER_DOCUMENTS`` job instead; app.worker splits it into
+chunks of order ids and renders them in a shared ``ProcessPoolExecutor`` that
+spans every core. Each child process loads its chunk through its own
+NullPool session, so only ids and PDF bytes cross process boundaries.
+
+Progress is written to the linked ``BackgroundJob`` (``GET /jobs/{id}``), and
+the finished ZIP or merged PDF is uploaded to storage for
+``GET /documents/batch/{id}/download``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+from .. import db as db_module
+from ..core.config import settings
+from ..models import Job, Order
+from .background_jobs import BackgroundJob, job_service
+from .job_signal import notify_job_enqueued
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_KINDS = ("invoice", "receipt")
+OUTPUTS = {"zip": "application/zip", "pdf": "application/pdf"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def select_order_ids(
+    db: Session,
+    order_ids: Optional[List[int]] = None,
+    status: Optional[str] = None,
+    order_type: Optional[str] = None,
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+) -> List[int]:
+    """Order ids for a batch: an explicit list, a filter, or both combined."""
+    stmt = select(Order.id).order_by(Order.id)
+    if order_ids:
+        stmt = stmt.where(Order.id.in_(order_ids))
+    if status:
+        stmt = stmt.where(Order.status == status)
+    if order_type:
+        stmt = stmt.where(Order.type == order_type)
+    if created_from:
+        stmt = stmt.where(Order.created_at >= datetime.combine(created_from, time.min))
+    if created_to:
+        stmt = stmt.where(Order.created_at <= datetime.combine(created_to, time.max))
+    return list(db.execute(stmt).scalars())
+
+
+def create_batch_job(db: Session, kind: str, order_ids: List[int], output: str) -> BackgroundJob:
+    """Queue a RENDER_DOCUMENTS job tracked by a BackgroundJob."""
+    job = BackgroundJob(
+        job_type="render_documents",
+        input_data=json.dumps({"kind": kind, "output": output, "count": len(order_ids)}),
+        progress_message="Queued for rendering...",
+    )
+    db.add(job)
+    db.flush()
+    worker_job = Job(
+        kind="RENDER_DOCUMENTS",
+        status="queued",
+        payload={"kind": kind, "output": output, "order_ids": order_ids, "background_job_id": job.id},
+    )
+    db.add(worker_job)
+    notify_job_enqueued(db, worker_job.kind)
+    db.commit()
+    return job
+
+
+# ---------------------------------------------------------------------------
+# Child processes
+# ---------------------------------------------------------------------------
+
+def _init_render_process():
+    # Fresh interpreter (spawn): connect per chunk, keep nothing idle
+    db_module.configure_engine("script")
+
+
+def _render_chunk(kind: str, order_ids: List[int]) -> List[Tuple[str, Optional[bytes], Optional[str]]]:
+    """Render one chunk; returns (file name, pdf bytes or None, error) per document."""
+    from .documents import invoice_pdf, receipt_pdf
+
+    out = []
+    db = db_module.SessionLocal()
+    try:
+        orders = db.execute(
+            select(Order)
+            .where(Order.id.in_(order_ids))
+            .order_by(Order.id)
+            .options(selectinload(Order.items), selectinload(Order.customer), selectinload(Order.payments))
+        ).scalars().all()
+        for order in orders:
+            if kind == "invoice":
+                jobs = [(f"invoice_{order.code}.pdf", lambda o=order: invoice_pdf(o))]
+            else:
+                jobs = [
+                    (f"receipt_{order.code}_{p.id}.pdf", lambda o=order, p=p: receipt_pdf(o, p))
+                    for p in sorted(order.payments, key=lambda p: p.id)
+                    if p.status == "POSTED"
+                ]
+            for name, render in jobs:
+                try:
+                    out.append((name, render(), None))
+                except Exception as e:
+                    out.append((name, None, str(e)))
+    finally:
+        db.close()
+    return out
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.DOCUMENT_RENDER_PROCESSES or os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_render_process,
+            )
+        return _pool
+
+
+# ---------------------------------------------------------------------------
+# Job body (app.worker)
+# ---------------------------------------------------------------------------
+
+def _merge_pdfs(parts: List[bytes], out) -> None:
+    try:
+        from pypdf import PdfWriter
+    except ImportError as exc:
+        raise RuntimeError("pypdf is required for merged PDF output. Install it with 'pip install pypdf'.") from exc
+    from io import BytesIO
+
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(BytesIO(part))
+    writer.write(out)
+
+
+def run_document_batch(db: Session, job_id: int, payload: dict) -> dict:
+    """RENDER_DOCUMENTS job body: render, package, upload and report progress."""
+    from ..utils.storage import upload_export
+
+    kind = payload["kind"]
+    output = payload.get("output", "zip")
+    order_ids = payload["order_ids"]
+    background_job_id = payload.get("background_job_id")
+
+    def progress(pct: int, message: str):
+        if background_job_id:
+            job_service.update_job_progress(db, background_job_id, pct, message)
+
+    size = settings.DOCUMENT_BATCH_CHUNK
+    chunks = [order_ids[i:i + size] for i in range(0, len(order_ids), size)]
+    progress(0, f"Rendering {kind}s for {len(order_ids)} orders")
+
+    rendered: Dict[int, List[Tuple[str, Optional[bytes], Optional[str]]]] = {}
+    pool = _get_pool()
+    futures = {pool.submit(_render_chunk, kind, chunk): i for i, chunk in enumerate(chunks)}
+    done_orders = 0
+    for future in as_completed(futures):
+        i = futures[future]
+        rendered[i] = future.result()
+        done_orders += len(chunks[i])
+        # Leave the last few percent for packaging and upload
+        progress(max(1, int(done_orders / len(order_ids) * 90)), f"Rendered {done_orders}/{len(order_ids)} orders")
+
+    documents = [doc for i in range(len(chunks)) for doc in rendered[i]]
+    failed = [{"file": name, "error": error} for name, data, error in documents if data is None]
+    parts = [(name, data) for name, data, _ in documents if data is not None]
+    if not parts:
+        raise RuntimeError(f"No {kind}s rendered for {len(order_ids)} orders")
+
+    progress(92, "Packaging documents")
+    filename = f"{kind}s_{date.today().isoformat()}_{job_id}.{output}"
+    with tempfile.TemporaryFile() as f:
+        if output == "pdf":
+            _merge_pdfs([data for _, data in parts], f)
+        else:
+            # PDFs are already compressed
+            with zipfile.ZipFile(f, "w", zipfile.ZIP_STORED) as zf:
+                for name, data in parts:
+                    zf.writestr(name, data)
+        f.seek(0)
+        path = upload_export(f, f"documents/{job_id}/{filename}", OUTPUTS[output])
+
+    logger.info("document_batch_done job_id=%s kind=%s documents=%s failed=%s", job_id, kind, len(parts), len(failed))
+    return {"path": path, "filename": filename, "documents": len(parts), "failed": failed}
@@ -9,9 +9,16 @@ Fixes:
 - Improved color scheme and typography
 """
 
+from collections import OrderedDict
 from io import BytesIO
+import hashlib
+import json
 import os
 import logging
+import threading
+import time
+
+from sqlalchemy import inspect as sa_inspect
 
 # Project settings and models
 from ..core.config import settings
@@ -27,17 +34,25 @@ logger = logging.getLogger(__name__)
 
 def invoice_pdf(order: Order) -> bytes:
     """Render an invoice (or credit note when total < 0) as a PDF using ReportLab."""
-    return _reportlab_invoice_pdf(order)
+    state = [_row_state(order), [_row_state(i) for i in order.items or []], _row_state(order.customer)]
+    return _cached_render("invoice", state, lambda: _reportlab_invoice_pdf(order))
 
 
 def quotation_pdf(quotation_data: dict) -> bytes:
     """Render a quotation as a PDF using ReportLab with the same enhanced template as invoices."""
-    return _reportlab_quotation_pdf(quotation_data)
+    return _cached_render("quotation", quotation_data, lambda: _reportlab_quotation_pdf(quotation_data))
 
 
 def receipt_pdf(order: Order, payment: Payment = None) -> bytes:
     """Render a receipt as a PDF using ReportLab with the same enhanced template as invoices."""
-    return _reportlab_receipt_pdf(order, payment)
+    state = [_row_state(order), _row_state(order.customer), _row_state(payment)]
+    return _cached_render("receipt", state, lambda: _reportlab_payment_receipt_pdf(order, payment))
+
+
+def installment_agreement_pdf(order: Order, plan: Plan) -> bytes:
+    """Render the installment agreement for ``order``'s plan."""
+    state = [_row_state(order), _row_state(order.customer), _row_state(plan)]
+    return _cached_render("installment", state, lambda: _reportlab_installment_agreement_pdf(order, plan))
 
 
 # ---------------------------------------------------------------------------
@@ -53,6 +68,113 @@ DEFAULT_LOGO_URL = "https://static.wixstatic.com/media/20c5f7_20e21e26b3d34e9e8b
 DEFAULT_QR_URL = "https://static.wixstatic.com/media/20c5f7_98a9fa77aba04052833d15b05fadbe30~mv2.png"
 
 
+# ---------------------------------------------------------------------------
+# Process-wide asset and document caches
+# ---------------------------------------------------------------------------
+
+# Bump when a template change should invalidate already rendered documents
+TEMPLATE_VERSION = 1
+
+FONT_PATHS = {
+    "Inter": "/app/static/fonts/Inter-Regular.ttf",
+    "Inter-Bold": "/app/static/fonts/Inter-Bold.ttf",
+}
+
+_asset_lock = threading.Lock()
+_fonts = None  # (base, bold) once registration has been attempted
+_image_bytes: dict = {}  # local path or URL -> raw image bytes
+_image_failures: dict = {}  # URL -> monotonic time of the last failed download
+
+
+def _register_fonts():
+    """Register the Inter TTFs once per process; (base, bold) font names."""
+    global _fonts
+    with _asset_lock:
+        if _fonts is None:
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFont
+
+            try:
+                for name, path in FONT_PATHS.items():
+                    pdfmetrics.registerFont(TTFont(name, path))
+                _fonts = ("Inter", "Inter-Bold")
+                logger.info("Successfully loaded Inter fonts")
+            except Exception as e:
+                logger.warning(f"Failed to load Inter fonts: {str(e)}, using fallback")
+                _fonts = ("Helvetica", "Helvetica-Bold")
+        return _fonts
+
+
+class _DocumentCache:
+    """Rendered PDFs keyed by a hash of everything the template reads, LRU by size."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        max_bytes = settings.DOCUMENT_CACHE_MAX_MB * 1024 * 1024
+        if len(data) > max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "hits": self.hits, "misses": self.misses}
+
+
+document_cache = _DocumentCache()
+
+
+def _row_state(obj):
+    """Column values of a mapped row (None for None), for content hashing."""
+    if obj is None:
+        return None
+    return {attr.key: getattr(obj, attr.key) for attr in sa_inspect(obj).mapper.column_attrs}
+
+
+def _template_settings() -> dict:
+    return {
+        k: v
+        for k, v in settings.model_dump().items()
+        if k.startswith(("COMPANY_", "PAYMENT_", "CURRENCY_", "TAX_"))
+    }
+
+
+def _cached_render(kind: str, state, render) -> bytes:
+    """Return ``render()`` for ``state``, reusing an identical earlier render."""
+    if settings.DOCUMENT_CACHE_MAX_MB <= 0:
+        return render()
+    blob = json.dumps([kind, TEMPLATE_VERSION, _template_settings(), state], sort_keys=True, default=str)
+    key = hashlib.sha256(blob.encode("utf-8")).hexdigest()
+    data = document_cache.get(key)
+    if data is None:
+        data = render()
+        document_cache.put(key, data)
+    return data
+
+
 # ---------------------------------------------------------------------------
 # Enhanced Helpers
 # ---------------------------------------------------------------------------
@@ -73,7 +195,7 @@ def _file_exists(path: str | None) -> bool:
         return False
 
 
-def _fetch_image_bytes(url: str, timeout: float = 10.0):
+def _download_image_bytes(url: str, timeout: float = 10.0):
     """Fetch a remote image and return raw bytes; None on failure."""
     try:
         import urllib.request
@@ -99,6 +221,44 @@ def _fetch_image_bytes(url: str, timeout: float = 10.0):
         return None
 
 
+def _fetch_image_bytes(url: str, timeout: float = 10.0):
+    """Remote image bytes, downloaded once per process; None on failure.
+
+    A failed download is not retried for DOCUMENT_ASSET_RETRY_SECS so an
+    unreachable host does not add its timeout to every document.
+    """
+    with _asset_lock:
+        if url in _image_bytes:
+            return _image_bytes[url]
+        failed_at = _image_failures.get(url)
+        if failed_at is not None and time.monotonic() - failed_at < settings.DOCUMENT_ASSET_RETRY_SECS:
+            return None
+    data = _download_image_bytes(url, timeout=timeout)
+    with _asset_lock:
+        if data:
+            _image_bytes[url] = data
+            _image_failures.pop(url, None)
+        else:
+            _image_failures[url] = time.monotonic()
+    return data
+
+
+def _read_image_file(path: str):
+    """Local image bytes, read once per process; None on failure."""
+    with _asset_lock:
+        if path in _image_bytes:
+            return _image_bytes[path]
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        logger.warning(f"Failed to read local image {path}: {str(e)}")
+        return None
+    with _asset_lock:
+        _image_bytes[path] = data
+    return data
+
+
 def _image_reader(local_path: str | None, url: str | None, timeout: float = 10.0):
     """Return a ReportLab ImageReader from a local path or remote URL bytes."""
     try:
@@ -109,18 +269,18 @@ def _image_reader(local_path: str | None, url: str | None, timeout: float = 10.0
     
     # Prefer local
     if _file_exists(local_path):
-        try:
-            logger.info(f"Using local image: {local_path}")
-            return ImageReader(local_path)
-        except Exception as e:
-            logger.warning(f"Failed to load local image {local_path}: {str(e)}")
+        data = _read_image_file(local_path)
+        if data:
+            try:
+                return ImageReader(BytesIO(data))
+            except Exception as e:
+                logger.warning(f"Failed to load local image {local_path}: {str(e)}")
     
     # Fallback to remote
     if url:
         data = _fetch_image_bytes(url, timeout=timeout)
         if data:
             try:
-                logger.info(f"Using remote image: {url}")
                 return ImageReader(BytesIO(data))
             except Exception as e:
                 logger.warning(f"Failed to process remote image {url}: {str(e)}")
@@ -151,8 +311,6 @@ def _reportlab_invoice_pdf(order: Order) -> bytes:
         )
         from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
         from reportlab.lib.enums import TA_RIGHT, TA_CENTER
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
         from reportlab.lib.colors import HexColor
     except ImportError as exc:
         raise RuntimeError(
@@ -160,15 +318,7 @@ def _reportlab_invoice_pdf(order: Order) -> bytes:
         ) from exc
 
     # --- Enhanced theme & helpers -----------------------------------------------------
-    try:
-        # Try to register custom fonts
-        pdfmetrics.registerFont(TTFont("Inter", "/app/static/fonts/Inter-Regular.ttf"))
-        pdfmetrics.registerFont(TTFont("Inter-Bold", "/app/static/fonts/Inter-Bold.ttf"))
-        BASE_FONT, BASE_BOLD = "Inter", "Inter-Bold"
-        logger.info("Successfully loaded Inter fonts")
-    except Exception as e:
-        logger.warning(f"Failed to load Inter fonts: {str(e)}, using fallback")
-        BASE_FONT, BASE_BOLD = "Helvetica", "Helvetica-Bold"
+    BASE_FONT, BASE_BOLD = _register_fonts()
 
     # Enhanced color scheme
     BRAND_COLOR = getattr(getattr(order, "company", None), "brand_color", "#1E293B") or "#1E293B"
@@ -678,9 +828,11 @@ def _reportlab_invoice_pdf(order: Order) -> bytes:
                 logger.info("QR code loaded from base64 data")
                 break
             elif source_type == "local":
-                qr_image_flowable = Image(source_data, width=50 * mm, height=50 * mm)
-                logger.info(f"QR code loaded from local file: {source_data}")
-                break
+                qr_bytes = _read_image_file(source_data)
+                if qr_bytes:
+                    qr_image_flowable = Image(BytesIO(qr_bytes), width=50 * mm, height=50 * mm)
+                    logger.info(f"QR code loaded from local file: {source_data}")
+                    break
             elif source_type == "remote":
                 qr_bytes = _fetch_image_bytes(source_data)
                 if qr_bytes:
@@ -859,7 +1011,7 @@ def _reportlab_invoice_pdf(order: Order) -> bytes:
 # Enhanced Receipt Generation
 # ---------------------------------------------------------------------------
 
-def receipt_pdf(order: Order, payment: Payment = None) -> bytes:
+def _reportlab_payment_receipt_pdf(order: Order, payment: Payment = None) -> bytes:
     """Generate an enhanced receipt PDF using the same styling as invoices."""
     try:
         from reportlab.lib.pagesizes import A4
@@ -876,8 +1028,6 @@ def receipt_pdf(order: Order, payment: Payment = None) -> bytes:
         )
         from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
         from reportlab.lib.enums import TA_RIGHT, TA_CENTER
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
         from reportlab.lib.colors import HexColor
     except ImportError as exc:
         raise RuntimeError(
@@ -885,14 +1035,7 @@ def receipt_pdf(order: Order, payment: Payment = None) -> bytes:
         ) from exc
 
     # --- Same enhanced theme & helpers as invoice -----------------------------
-    try:
-        pdfmetrics.registerFont(TTFont("Inter", "/app/static/fonts/Inter-Regular.ttf"))
-        pdfmetrics.registerFont(TTFont("Inter-Bold", "/app/static/fonts/Inter-Bold.ttf"))
-        BASE_FONT, BASE_BOLD = "Inter", "Inter-Bold"
-        logger.info("Successfully loaded Inter fonts for receipt")
-    except Exception as e:
-        logger.warning(f"Failed to load Inter fonts for receipt: {str(e)}, using fallback")
-        BASE_FONT, BASE_BOLD = "Helvetica", "Helvetica-Bold"
+    BASE_FONT, BASE_BOLD = _register_fonts()
 
     # Enhanced color scheme (same as invoice)
     BRAND_COLOR = getattr(getattr(order, "company", None), "brand_color", "#1E293B") or "#1E293B"
@@ -1249,7 +1392,7 @@ def receipt_pdf(order: Order, payment: Payment = None) -> bytes:
 # Enhanced Installment Agreement
 # ---------------------------------------------------------------------------
 
-def installment_agreement_pdf(order: Order, plan: Plan) -> bytes:
+def _reportlab_installment_agreement_pdf(order: Order, plan: Plan) -> bytes:
     """Generate an enhanced installment agreement PDF."""
     try:
         from reportlab.lib.pagesizes import A4
@@ -1257,8 +1400,6 @@ def installment_agreement_pdf(order: Order, plan: Plan) -> bytes:
         from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
         from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
         from reportlab.lib.enums import TA_CENTER
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
         from reportlab.lib.colors import HexColor
     except ImportError as exc:
         raise RuntimeError(
@@ -1266,12 +1407,7 @@ def installment_agreement_pdf(order: Order, plan: Plan) -> bytes:
         ) from exc
 
     # Font setup
-    try:
-        pdfmetrics.registerFont(TTFont("Inter", "/app/static/fonts/Inter-Regular.ttf"))
-        pdfmetrics.registerFont(TTFont("Inter-Bold", "/app/static/fonts/Inter-Bold.ttf"))
-        BASE_FONT, BASE_BOLD = "Inter", "Inter-Bold"
-    except Exception:
-        BASE_FONT, BASE_BOLD = "Helvetica", "Helvetica-Bold"
+    BASE_FONT, BASE_BOLD = _register_fonts()
 
     # Enhanced styles
     styles = getSampleStyleSheet()
@@ -1394,8 +1530,6 @@ def _reportlab_quotation_pdf(quotation_data: dict) -> bytes:
         )
         from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
         from reportlab.lib.enums import TA_RIGHT, TA_CENTER
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
         from reportlab.lib.colors import HexColor
     except ImportError as exc:
         raise RuntimeError(
@@ -1403,14 +1537,7 @@ def _reportlab_quotation_pdf(quotation_data: dict) -> bytes:
         ) from exc
 
     # --- Same enhanced theme & helpers as invoice -----------------------------
-    try:
-        pdfmetrics.registerFont(TTFont("Inter", "/app/static/fonts/Inter-Regular.ttf"))
-        pdfmetrics.registerFont(TTFont("Inter-Bold", "/app/static/fonts/Inter-Bold.ttf"))
-        BASE_FONT, BASE_BOLD = "Inter", "Inter-Bold"
-        logger.info("Successfully loaded Inter fonts for quotation")
-    except Exception as e:
-        logger.warning(f"Failed to load Inter fonts for quotation: {str(e)}, using fallback")
-        BASE_FONT, BASE_BOLD = "Helvetica", "Helvetica-Bold"
+    BASE_FONT, BASE_BOLD = _register_fonts()
 
     # Enhanced color scheme (same as invoice)
     BRAND_COLOR = "#1E293B"
@@ -1861,8 +1988,6 @@ def _reportlab_quotation_pdf(quotation_data: dict) -> bytes:
         )
         from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
         from reportlab.lib.enums import TA_RIGHT, TA_CENTER
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
         from reportlab.lib.colors import HexColor
     except ImportError as exc:
         raise RuntimeError(
@@ -1870,14 +1995,7 @@ def _reportlab_quotation_pdf(quotation_data: dict) -> bytes:
         ) from exc
 
     # Copy exact same setup from invoice template
-    try:
-        pdfmetrics.registerFont(TTFont("Inter", "/app/static/fonts/Inter-Regular.ttf"))
-        pdfmetrics.registerFont(TTFont("Inter-Bold", "/app/static/fonts/Inter-Bold.ttf"))
-        BASE_FONT, BASE_BOLD = "Inter", "Inter-Bold"
-        logger.info("Successfully loaded Inter fonts")
-    except Exception as e:
-        logger.warning(f"Failed to load Inter fonts: {str(e)}, using fallback")
-        BASE_FONT, BASE_BOLD = "Helvetica", "Helvetica-Bold"
+    BASE_FONT, BASE_BOLD = _register_fonts()
 
     # Enhanced color scheme (same as invoice)
     BRAND_COLOR = "#1E293B"
@@ -2103,8 +2221,6 @@ def _reportlab_receipt_pdf(order: Order) -> bytes:
         )
         from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
         from reportlab.lib.enums import TA_RIGHT, TA_CENTER
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
         from reportlab.lib.colors import HexColor
     except ImportError as exc:
         raise RuntimeError(
@@ -2112,14 +2228,7 @@ def _reportlab_receipt_pdf(order: Order) -> bytes:
         ) from exc
 
     # Copy exact same setup from invoice template
-    try:
-        pdfmetrics.registerFont(TTFont("Inter", "/app/static/fonts/Inter-Regular.ttf"))
-        pdfmetrics.registerFont(TTFont("Inter-Bold", "/app/static/fonts/Inter-Bold.ttf"))
-        BASE_FONT, BASE_BOLD = "Inter", "Inter-Bold"
-        logger.info("Successfully loaded Inter fonts")
-    except Exception as e:
-        logger.warning(f"Failed to load Inter fonts: {str(e)}, using fallback")
-        BASE_FONT, BASE_BOLD = "Helvetica", "Helvetica-Bold"
+    BASE_FONT, BASE_BOLD = _register_fonts()
 
     # Enhanced color scheme (same as invoice)
     BRAND_COLOR = getattr(getattr(order, "company", None), "brand_color", "#1E293B") or "#1E293B"
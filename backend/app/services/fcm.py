@@ -1,48 +1,92 @@
+"""FCM push delivery
+
+- The OAuth access token is cached until ``FCM_TOKEN_REFRESH_MARGIN_SECS``
+  before it expires instead of being refreshed for every message.
+- One HTTP/2 client is kept per process, so sends reuse a connection.
+- Assignment pushes go through an outbox: ``enqueue_order_assigned`` writes
+  a ``PUSH_NOTIFY`` row to the ``jobs`` table in the caller's transaction and
+  app.worker delivers it (``deliver_push_job``), so an assignment request
+  never waits on Google. Set ``FCM_OUTBOX_ENABLED=false`` to send inline.
+- A job resolves every recipient's devices in one query and sends to them
+  concurrently; tokens FCM reports as unregistered are deleted from
+  ``driver_devices``.
+- Sends that fail otherwise (5xx, timeouts, network down) are queued again as
+  a follow-up PUSH_NOTIFY job for just those devices, deferred with backoff
+  (``FCM_RETRY_BACKOFF_SECS``), up to ``FCM_RETRY_MAX_ATTEMPTS`` deliveries.
+"""
+
 import json
 import os
 import logging
-from typing import Any, Dict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Tuple
 
 import httpx
 from google.auth.transport.requests import Request
 from google.oauth2 import service_account
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 
+from ..core.config import settings
 from ..core.push import PUSH_ANDROID_CHANNEL_ID
-from ..models import Driver, Order
+from ..models import DriverDevice, Job, Order
+from .job_signal import notify_job_enqueued
+
+logger = logging.getLogger(__name__)
 
 _SCOPES = ["https://www.googleapis.com/auth/firebase.messaging"]
 _credentials = None
 _project_id = None
+_token_lock = threading.Lock()
+_client = None
+_client_lock = threading.Lock()
+
+PUSH_KIND = "PUSH_NOTIFY"
+
+# FCM v1 error codes meaning the registration token will never work again
+_DEAD_TOKEN_CODES = {"UNREGISTERED"}
 
 
 def _get_access_token() -> tuple[str, str]:
     global _credentials, _project_id
-    if _credentials is None:
-        raw = os.environ.get("FIREBASE_SERVICE_ACCOUNT_JSON")
-        if not raw:
-            raise RuntimeError("FIREBASE_SERVICE_ACCOUNT_JSON not set")
-        info = json.loads(raw)
-        _project_id = info.get("project_id")
-        _credentials = service_account.Credentials.from_service_account_info(
-            info, scopes=_SCOPES
+    with _token_lock:
+        if _credentials is None:
+            raw = os.environ.get("FIREBASE_SERVICE_ACCOUNT_JSON")
+            if not raw:
+                raise RuntimeError("FIREBASE_SERVICE_ACCOUNT_JSON not set")
+            info = json.loads(raw)
+            _project_id = info.get("project_id")
+            _credentials = service_account.Credentials.from_service_account_info(
+                info, scopes=_SCOPES
+            )
+        expiry = _credentials.expiry  # naive UTC
+        remaining = (
+            (expiry - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds()
+            if expiry
+            else 0
         )
-    request = Request()
-    token = _credentials.with_scopes(_SCOPES)
-    token.refresh(request)
-    return token.token, _project_id
+        if not _credentials.token or remaining < settings.FCM_TOKEN_REFRESH_MARGIN_SECS:
+            _credentials.refresh(Request())
+        return _credentials.token, _project_id
 
 
-def send_to_token(
-    token: str,
-    title: str,
-    body: str,
-    data: Dict[str, Any],
-    channel_id: str | None = None,
-) -> tuple[int, str]:
-    access_token, project_id = _get_access_token()
-    url = f"https://fcm.googleapis.com/v1/projects/{project_id}/messages:send"
-    message = {
+def _get_client() -> httpx.Client:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                http2=True,
+                timeout=10,
+                limits=httpx.Limits(max_connections=settings.FCM_CONCURRENCY),
+            )
+        return _client
+
+
+def _build_message(token: str, title: str, body: str, data: Dict[str, Any], channel_id: str | None) -> dict:
+    return {
         "message": {
             "token": token,
             "notification": {"title": title, "body": body},
@@ -55,11 +99,45 @@ def send_to_token(
             },
         }
     }
+
+
+def _error_code(resp: httpx.Response) -> str | None:
+    try:
+        error = resp.json().get("error", {})
+    except ValueError:
+        return None
+    for detail in error.get("details", []):
+        if detail.get("errorCode"):
+            return detail["errorCode"]
+    return error.get("status")
+
+
+def send_to_token(
+    token: str,
+    title: str,
+    body: str,
+    data: Dict[str, Any],
+    channel_id: str | None = None,
+) -> tuple[int, str]:
+    access_token, project_id = _get_access_token()
+    url = f"https://fcm.googleapis.com/v1/projects/{project_id}/messages:send"
+    message = _build_message(token, title, body, data, channel_id)
     hdrs = {"Authorization": f"Bearer {access_token}"}
-    resp = httpx.post(url, headers=hdrs, json=message, timeout=10)
+    resp = _get_client().post(url, headers=hdrs, json=message)
+    if resp.status_code in (429, 500, 502, 503):
+        # One retry for throttling and transient server errors
+        try:
+            delay = float(resp.headers.get("Retry-After") or 1)
+        except ValueError:
+            delay = 1.0
+        time.sleep(min(delay, 5.0))
+        resp = _get_client().post(url, headers=hdrs, json=message)
     try:
         resp.raise_for_status()
     except Exception:
+        if resp.status_code == 404:
+            # Unregistered token; callers prune it
+            raise
         logging.exception(
             "FCM send failed",
             extra={
@@ -71,26 +149,133 @@ def send_to_token(
     return resp.status_code, resp.text
 
 
-def notify_order_assigned(db: Session, driver_id: int, order: Order) -> None:
-    driver = db.get(Driver, driver_id)
-    if not driver:
-        return
-    title = "New Order Assigned"
-    body = f"Order #{getattr(order, 'code', '')}"
-    data = {
-        "type": "job_assigned",
-        "jobId": str(getattr(order, 'id', '')),
-        "order_id": str(getattr(order, 'id', '')),
-        "code": getattr(order, "code", ""),
-        "pickup_address": getattr(order, "pickup_address", ""),
-        "dropoff_address": getattr(order, "dropoff_address", ""),
-        "delivery_window": getattr(order, "delivery_window", ""),
+def _send_one(token: str, title: str, body: str, data: Dict[str, Any]) -> str:
+    """'sent', 'dead' (token should be pruned) or 'failed'."""
+    try:
+        send_to_token(token, title, body, data)
+        return "sent"
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404 or _error_code(e.response) in _DEAD_TOKEN_CODES:
+            return "dead"
+        return "failed"
+    except Exception:
+        return "failed"
+
+
+def _assignment_notification(driver_id: int, order: Order) -> dict:
+    return {
+        "driver_id": driver_id,
+        "title": "New Order Assigned",
+        "body": f"Order #{getattr(order, 'code', '')}",
+        "data": {
+            "type": "job_assigned",
+            "jobId": str(getattr(order, 'id', '')),
+            "order_id": str(getattr(order, 'id', '')),
+            "code": getattr(order, "code", ""),
+            "pickup_address": getattr(order, "pickup_address", ""),
+            "dropoff_address": getattr(order, "dropoff_address", ""),
+            "delivery_window": getattr(order, "delivery_window", ""),
+        },
     }
-    for device in driver.devices:
-        try:
-            send_to_token(device.token, title, body, data)
-        except Exception:
-            logging.exception(
-                "notify_order_assigned push failed",
-                extra={"driver_id": driver_id, "token": device.token},
-            )
+
+
+def deliver_notifications(db: Session, notifications: List[dict]) -> Dict[str, int]:
+    """Send each notification to all of its driver's devices, concurrently.
+
+    Unregistered tokens are deleted; the caller commits.
+    """
+    return _deliver(db, notifications)[0]
+
+
+def _deliver(db: Session, notifications: List[dict]) -> Tuple[Dict[str, int], List[dict]]:
+    """``deliver_notifications``, also returning the failed sends as notifications
+    restricted (``tokens``) to the devices that should be retried."""
+    driver_ids = {n["driver_id"] for n in notifications}
+    tokens: Dict[int, List[str]] = {}
+    for driver_id, token in db.execute(
+        select(DriverDevice.driver_id, DriverDevice.token).where(DriverDevice.driver_id.in_(driver_ids))
+    ):
+        tokens.setdefault(driver_id, []).append(token)
+
+    # A retried notification only goes to the devices that failed last time
+    sends: List[Tuple[str, dict]] = [
+        (token, n)
+        for n in notifications
+        for token in tokens.get(n["driver_id"], [])
+        if "tokens" not in n or token in n["tokens"]
+    ]
+    counts = {"sent": 0, "failed": 0, "dead": 0, "no_device": 0}
+    counts["no_device"] = sum(1 for n in notifications if n["driver_id"] not in tokens)
+    if not sends:
+        return counts, []
+
+    # Fetch the token once up front rather than racing on the first refresh
+    _get_access_token()
+    workers = min(settings.FCM_CONCURRENCY, len(sends))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fcm") as pool:
+        outcomes = list(pool.map(lambda s: _send_one(s[0], s[1]["title"], s[1]["body"], s[1]["data"]), sends))
+
+    dead = set()
+    failed: Dict[int, dict] = {}
+    for (token, n), outcome in zip(sends, outcomes):
+        counts[outcome] += 1
+        if outcome == "dead":
+            dead.add(token)
+        elif outcome == "failed":
+            logger.warning("push_failed driver_id=%s order_id=%s", n["driver_id"], n["data"].get("order_id"))
+            retry = failed.setdefault(id(n), {k: v for k, v in n.items() if k != "tokens"})
+            retry.setdefault("tokens", []).append(token)
+    if dead:
+        db.execute(delete(DriverDevice).where(DriverDevice.token.in_(dead)))
+        logger.info("push_pruned_tokens count=%s", len(dead))
+    return counts, list(failed.values())
+
+
+def enqueue_order_assigned(db: Session, assignments: Iterable[Tuple[int, Order]]) -> None:
+    """Queue one push per (driver_id, order); the caller commits."""
+    notifications = [_assignment_notification(driver_id, order) for driver_id, order in assignments]
+    if not notifications:
+        return
+    if not settings.FCM_OUTBOX_ENABLED:
+        deliver_notifications(db, notifications)
+        return
+    db.add(Job(kind=PUSH_KIND, status="queued", payload={"notifications": notifications}))
+    notify_job_enqueued(db, PUSH_KIND)
+
+
+def notify_order_assigned(db: Session, driver_id: int, order: Order) -> None:
+    """Queue the assignment push for ``driver_id`` and commit it."""
+    try:
+        enqueue_order_assigned(db, [(driver_id, order)])
+        db.commit()
+    except Exception:
+        db.rollback()
+        logging.exception(
+            "notify_order_assigned push failed",
+            extra={"driver_id": driver_id, "order_id": getattr(order, "id", None)},
+        )
+
+
+def deliver_push_job(db: Session, payload: dict) -> dict:
+    """PUSH_NOTIFY job body for app.worker.
+
+    Failed sends are queued as a deferred follow-up job rather than failing
+    this one, since the worker does not retry PUSH_NOTIFY jobs.
+    """
+    counts, failed = _deliver(db, payload.get("notifications", []))
+    attempt = payload.get("attempt", 1)
+    if failed and attempt < settings.FCM_RETRY_MAX_ATTEMPTS:
+        delay = settings.FCM_RETRY_BACKOFF_SECS * 2 ** (attempt - 1)
+        db.add(Job(
+            kind=PUSH_KIND,
+            status="queued",
+            payload={"notifications": failed, "attempt": attempt + 1},
+            run_at=datetime.now(timezone.utc) + timedelta(seconds=delay),
+        ))
+        notify_job_enqueued(db, PUSH_KIND)
+        counts["retry_queued"] = len(failed)
+        logger.warning("push_retry_queued notifications=%s attempt=%s delay_secs=%.0f", len(failed), attempt + 1, delay)
+    elif failed:
+        logger.error("push_dropped notifications=%s attempts=%s", len(failed), attempt)
+    db.commit()
+    return counts
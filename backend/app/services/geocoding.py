@@ -0,0 +1,375 @@
+"""Geocoding for customer addresses
+
+Coordinates are resolved in this order, cheapest first:
+
+1. Coordinates embedded in the customer's Google Maps ``map_url``.
+2. The persistent ``geocode_cache`` table, keyed on the normalised address.
+3. The configured geocoder (``GEOCODER`` setting), whose answer - including
+   "not found" - is upserted into the cache, so replicas geocoding the same
+   address at once do not collide.
+
+``lookup_customers`` runs provider calls for a batch with no transaction held
+open across them; the assignment pass uses it after committing.
+
+Geocoders are pluggable: ``StaticGeocoder`` resolves from an in-memory mapping
+for local runs and tests, ``NullGeocoder`` (the default) never calls out.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote
+
+import httpx
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models import Customer, GeocodeCache
+
+logger = logging.getLogger(__name__)
+
+LatLng = Tuple[float, float]
+
+# Generous Malaysia bounding box; anything outside is a bad parse
+_MY_LAT = (0.5, 7.5)
+_MY_LNG = (99.5, 119.5)
+
+_COORD = r"(-?\d{1,2}\.\d+)\s*,\s*(-?\d{1,3}\.\d+)"
+_MAP_URL_PATTERNS = [
+    re.compile(r"!3d(-?\d{1,2}\.\d+)!4d(-?\d{1,3}\.\d+)"),  # place pin (most precise)
+    re.compile(r"[?&](?:q|query|ll|destination|daddr|center)=(?:loc:)?" + _COORD),
+    re.compile(r"@" + _COORD),  # viewport centre
+    re.compile(r"/place/" + _COORD),
+    re.compile(r"^\s*" + _COORD + r"\s*$"),  # bare "lat,lng"
+]
+
+_ABBREVIATIONS = {
+    "jln": "jalan",
+    "tmn": "taman",
+    "lrg": "lorong",
+    "kg": "kampung",
+    "kpg": "kampung",
+    "bdr": "bandar",
+    "bt": "batu",
+    "sg": "sungai",
+    "pjs": "petaling jaya selatan",
+    "kl": "kuala lumpur",
+    "wp": "wilayah persekutuan",
+    "no": "",
+}
+
+
+def _in_malaysia(lat: float, lng: float) -> bool:
+    return _MY_LAT[0] <= lat <= _MY_LAT[1] and _MY_LNG[0] <= lng <= _MY_LNG[1]
+
+
+def parse_map_url(url: Optional[str]) -> Optional[LatLng]:
+    """Extract coordinates from a Google Maps URL, or None.
+
+    Short links (maps.app.goo.gl) carry no coordinates and are not resolved.
+    """
+    if not url:
+        return None
+    text = unquote(url)
+    for pattern in _MAP_URL_PATTERNS:
+        m = pattern.search(text)
+        if m:
+            lat, lng = float(m.group(1)), float(m.group(2))
+            if _in_malaysia(lat, lng):
+                return lat, lng
+    return None
+
+
+def normalize_address(address: Optional[str]) -> str:
+    """Lowercase, strip punctuation and expand common Malay abbreviations."""
+    if not address:
+        return ""
+    text = address.lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    words = [_ABBREVIATIONS.get(w, w) for w in text.split()]
+    return " ".join(w for w in words if w)
+
+
+def address_key(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class Geocoder:
+    """Resolves a free-text address to (lat, lng), or None when not found."""
+
+    name = "base"
+
+    def geocode(self, address: str) -> Optional[LatLng]:
+        raise NotImplementedError
+
+
+class NullGeocoder(Geocoder):
+    """Never resolves anything; only map_url coordinates and the cache are used."""
+
+    name = "none"
+
+    def geocode(self, address: str) -> Optional[LatLng]:
+        return None
+
+
+class StaticGeocoder(Geocoder):
+    """Resolves from a fixed mapping of normalised address -> (lat, lng)."""
+
+    name = "static"
+
+    def __init__(self, mapping: Optional[Dict[str, LatLng]] = None):
+        self.mapping = {normalize_address(k): v for k, v in (mapping or {}).items()}
+
+    def geocode(self, address: str) -> Optional[LatLng]:
+        return self.mapping.get(normalize_address(address))
+
+
+class NominatimGeocoder(Geocoder):
+    """OpenStreetMap Nominatim, restricted to Malaysia."""
+
+    name = "nominatim"
+    url = "https://nominatim.openstreetmap.org/search"
+
+    def geocode(self, address: str) -> Optional[LatLng]:
+        resp = httpx.get(
+            self.url,
+            params={"q": address, "format": "json", "limit": 1, "countrycodes": "my"},
+            headers={"User-Agent": f"{settings.COMPANY_NAME} OrderOps"},
+            timeout=10,
+        )
+        resp.raise_for_status()
+        results = resp.json()
+        if not results:
+            return None
+        return float(results[0]["lat"]), float(results[0]["lon"])
+
+
+class GoogleGeocoder(Geocoder):
+    """Google Geocoding API (requires GOOGLE_MAPS_API_KEY)."""
+
+    name = "google"
+    url = "https://maps.googleapis.com/maps/api/geocode/json"
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+
+    def geocode(self, address: str) -> Optional[LatLng]:
+        resp = httpx.get(
+            self.url,
+            params={"address": address, "region": "my", "key": self.api_key},
+            timeout=10,
+        )
+        resp.raise_for_status()
+        results = resp.json().get("results") or []
+        if not results:
+            return None
+        loc = results[0]["geometry"]["location"]
+        return float(loc["lat"]), float(loc["lng"])
+
+
+_geocoder: Optional[Geocoder] = None
+
+
+def get_geocoder() -> Geocoder:
+    """Process-wide geocoder selected by the GEOCODER setting."""
+    global _geocoder
+    if _geocoder is None:
+        kind = (settings.GEOCODER or "none").lower()
+        if kind == "google" and settings.GOOGLE_MAPS_API_KEY:
+            _geocoder = GoogleGeocoder(settings.GOOGLE_MAPS_API_KEY)
+        elif kind == "nominatim":
+            _geocoder = NominatimGeocoder()
+        else:
+            _geocoder = NullGeocoder()
+    return _geocoder
+
+
+def set_geocoder(geocoder: Optional[Geocoder]) -> None:
+    """Swap the process-wide geocoder (e.g. a StaticGeocoder for local runs)."""
+    global _geocoder
+    _geocoder = geocoder
+
+
+def apply_map_url_coordinates(customer: Customer) -> bool:
+    """Set customer coordinates from its map_url if it has any. No I/O."""
+    point = parse_map_url(customer.map_url)
+    if point is None:
+        return False
+    customer.lat, customer.lng = point
+    customer.geocode_source = "map_url"
+    return True
+
+
+class GeocodingService:
+    def __init__(self, db: Session, geocoder: Optional[Geocoder] = None):
+        self.db = db
+        self.geocoder = geocoder or get_geocoder()
+        self.lookups = 0
+        self.stored = 0
+
+    def _cached(self, key: str) -> Tuple[bool, Optional[LatLng]]:
+        """(hit, point) from the cache; a negative answer inside its TTL is a hit."""
+        now = datetime.now(timezone.utc)
+        row = self.db.execute(
+            select(GeocodeCache).where(GeocodeCache.address_key == key)
+        ).scalar_one_or_none()
+        if row is None:
+            return False, None
+        if row.lat is not None:
+            row.hits = (row.hits or 0) + 1
+            row.last_used_at = now
+            return True, (float(row.lat), float(row.lng))
+        retry_after = row.created_at + timedelta(days=settings.GEOCODE_NEGATIVE_TTL_DAYS)
+        if retry_after.tzinfo is None:
+            retry_after = retry_after.replace(tzinfo=timezone.utc)
+        return now < retry_after, None
+
+    def _lookup(self, address: str) -> Tuple[bool, Optional[LatLng]]:
+        """(answered, point) from the provider; no database access."""
+        self.lookups += 1
+        try:
+            point = self.geocoder.geocode(address)
+        except Exception as e:
+            # Transient provider failure: don't cache, try again next pass
+            logger.warning("geocode_failed provider=%s error=%s", self.geocoder.name, e)
+            return False, None
+        if point is not None and not _in_malaysia(*point):
+            point = None
+        return True, point
+
+    def _store(self, key: str, normalized: str, point: Optional[LatLng]) -> None:
+        now = datetime.now(timezone.utc)
+        lat, lng = point if point else (None, None)
+        insert_fn = sqlite_insert if self.db.get_bind().dialect.name == "sqlite" else pg_insert
+        stmt = insert_fn(GeocodeCache).values(
+            address_key=key,
+            normalized_address=normalized,
+            provider=self.geocoder.name,
+            lat=lat,
+            lng=lng,
+            hits=0,
+            created_at=now,
+            last_used_at=now,
+        )
+        # Another replica may have stored the same address meanwhile
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["address_key"],
+            set_={"provider": self.geocoder.name, "lat": lat, "lng": lng, "created_at": now, "last_used_at": now},
+        )
+        self.db.execute(stmt)
+        self.stored += 1
+
+    def resolve(self, address: Optional[str], allow_lookup: bool = True) -> Optional[LatLng]:
+        """Coordinates for an address via the cache, falling back to the geocoder."""
+        normalized = normalize_address(address)
+        if not normalized:
+            return None
+        key = address_key(normalized)
+        hit, point = self._cached(key)
+        if hit:
+            return point
+        if not allow_lookup or isinstance(self.geocoder, NullGeocoder):
+            return None
+        answered, point = self._lookup(address)
+        if answered:
+            self._store(key, normalized, point)
+        return point
+
+    def geocode_customer(self, customer: Customer, allow_lookup: bool = True) -> bool:
+        """Fill in customer.lat/lng if missing. Returns True when coordinates are set."""
+        if customer.lat is not None and customer.lng is not None:
+            return True
+        if apply_map_url_coordinates(customer):
+            return True
+        point = self.resolve(customer.address, allow_lookup=allow_lookup)
+        if point is None:
+            return False
+        customer.lat, customer.lng = point
+        customer.geocode_source = self.geocoder.name
+        return True
+
+    def geocode_customers(self, customers: Iterable[Customer], max_lookups: Optional[int] = None) -> int:
+        """Geocode a batch, calling the provider at most ``max_lookups`` times.
+
+        Cache hits and map_url parses are not limited. Returns how many
+        customers ended up with coordinates.
+        """
+        if max_lookups is None:
+            max_lookups = settings.GEOCODE_MAX_LOOKUPS_PER_PASS
+        resolved = 0
+        for customer in customers:
+            if self.geocode_customer(customer, allow_lookup=self.lookups < max_lookups):
+                resolved += 1
+        if self.stored:
+            self.evict()
+        return resolved
+
+    def lookup_customers(self, customer_ids: Iterable[int], max_lookups: Optional[int] = None) -> Dict[int, LatLng]:
+        """Geocode customers still missing coordinates, at most ``max_lookups`` provider calls.
+
+        Commits ``db``: each address is checked against the cache and written
+        back in its own short transaction, with none open during the provider
+        call. Returns the coordinates found per customer id.
+        """
+        if max_lookups is None:
+            max_lookups = settings.GEOCODE_MAX_LOOKUPS_PER_PASS
+        customer_ids: List[int] = list(customer_ids)
+        if not customer_ids or isinstance(self.geocoder, NullGeocoder):
+            return {}
+        rows = self.db.execute(
+            select(Customer.id, Customer.address).where(Customer.id.in_(customer_ids), Customer.lat.is_(None))
+        ).all()
+        self.db.commit()
+
+        found: Dict[int, LatLng] = {}
+        for customer_id, address in rows:
+            normalized = normalize_address(address)
+            if not normalized:
+                continue
+            key = address_key(normalized)
+            hit, point = self._cached(key)
+            self.db.commit()
+            if not hit:
+                if self.lookups >= max_lookups:
+                    continue
+                answered, point = self._lookup(address)
+                if not answered:
+                    continue
+                self._store(key, normalized, point)
+            if point is not None:
+                self.db.execute(
+                    update(Customer)
+                    .where(Customer.id == customer_id, Customer.lat.is_(None))
+                    .values(lat=point[0], lng=point[1], geocode_source=self.geocoder.name)
+                )
+                found[customer_id] = point
+            self.db.commit()
+        if self.stored:
+            self.evict()
+            self.db.commit()
+        return found
+
+    def evict(self, max_rows: Optional[int] = None) -> int:
+        """Drop least recently used cache rows beyond ``max_rows``."""
+        if max_rows is None:
+            max_rows = settings.GEOCODE_CACHE_MAX_ROWS
+        total = self.db.execute(select(func.count(GeocodeCache.id))).scalar() or 0
+        excess = total - max_rows
+        if excess <= 0:
+            return 0
+        stale_ids = (
+            select(GeocodeCache.id)
+            .order_by(GeocodeCache.last_used_at.asc())
+            .limit(excess)
+            .scalar_subquery()
+        )
+        self.db.execute(delete(GeocodeCache).where(GeocodeCache.id.in_(stale_ids)))
+        logger.info("geocode_cache_evicted rows=%s", excess)
+        return excess
@@ -1,12 +1,13 @@
 from datetime import datetime, date
 from typing import List, Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
-import rapidfuzz.fuzz as fuzz
+from sqlalchemy import func, insert, or_, select
 
-from ..models import SKU, Item, OrderItemUID, LorryStock, SKUAlias, Driver, Order
+from ..models import SKU, Item, OrderItemUID, LorryStock, LorryStockState, SKUAlias, Driver, Order
 from ..models.item import ItemType, ItemStatus
 from ..models.order_item_uid import UIDAction
+from .sku_index import get_index
+from .uid_sequence import allocate, driver_owner, format_uid, uid_prefix
 
 
 class InventoryService:
@@ -15,29 +16,47 @@ class InventoryService:
 
     def generate_uid(self, sku_id: int, driver_id: int, scan_date: date, item_type: ItemType = ItemType.RENTAL) -> str:
         """Generate UID in format: SKU001-DRV123-20240306-001"""
-        sku = self.session.query(SKU).filter(SKU.id == sku_id).first()
-        driver = self.session.query(Driver).filter(Driver.id == driver_id).first()
+        sku = self.session.get(SKU, sku_id)
+        driver = self.session.get(Driver, driver_id)
         
         if not sku or not driver:
             raise ValueError("Invalid SKU or Driver ID")
         
-        # Create short codes
-        sku_code = f"SKU{sku.id:03d}"
-        driver_code = f"DRV{driver.id:03d}"
-        date_str = scan_date.strftime("%Y%m%d")
-        
-        # Find next sequence number for this date
-        existing_count = self.session.query(Item).filter(
-            Item.uid.like(f"{sku_code}-{driver_code}-{date_str}-%")
-        ).count()
-        
-        sequence = f"{existing_count + 1:03d}"
-        
-        # For NEW items, we need to generate 2 UIDs (copy 1 and copy 2)
-        if item_type == ItemType.NEW:
-            return f"{sku_code}-{driver_code}-{date_str}-{sequence}"
-        else:
-            return f"{sku_code}-{driver_code}-{date_str}-{sequence}"
+        # Next sequence number for this SKU, driver and date (NEW items add -C1/-C2 per copy)
+        prefix = uid_prefix(sku.id, driver_owner(driver.id), scan_date)
+        return format_uid(prefix, allocate(self.session, prefix, 1)[0])
+
+    def generate_items(
+        self,
+        sku_id: int,
+        owner: str,
+        generation_date: date,
+        item_type: ItemType,
+        quantity: int,
+        serial_number: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Reserve ``quantity`` sequence numbers in one block and insert their Item rows together.
+
+        ``owner`` is ``driver_owner(driver_id)`` or ``ADMIN_OWNER``. NEW items get
+        two rows (copy 1 and copy 2) sharing a sequence number. The caller commits.
+        """
+        prefix = uid_prefix(sku_id, owner, generation_date)
+        copies = (1, 2) if item_type == ItemType.NEW else (None,)
+        rows = []
+        for seq in allocate(self.session, prefix, quantity):
+            base_uid = format_uid(prefix, seq)
+            for copy_num in copies:
+                rows.append({
+                    "uid": f"{base_uid}-C{copy_num}" if copy_num else base_uid,
+                    "sku_id": sku_id,
+                    "item_type": item_type,
+                    "copy_number": copy_num,
+                    "oem_serial": serial_number,
+                    "status": ItemStatus.WAREHOUSE,
+                    "current_driver_id": None,
+                })
+        self.session.execute(insert(Item), rows)
+        return rows
 
     def generate_item_copies(self, sku_id: int, driver_id: int, scan_date: date, item_type: ItemType, serial_number: Optional[str] = None) -> List[Item]:
         """Generate item copies based on type (NEW=2 copies, RENTAL=1 copy)"""
@@ -379,98 +398,88 @@ class InventoryService:
             "total_items": len(items)
         }
 
-    def resolve_sku_name(self, query: str, threshold: float = 0.8) -> List[Dict[str, Any]]:
-        """Resolve SKU name with exact, alias, and fuzzy matching"""
-        if not query or not query.strip():
-            return []
+    def search_items(self, query: str, limit: int, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Items whose UID or serial contains ``query``, ordered by UID, with their current location.
 
-        query = query.strip().lower()
-        matches = []
+        One statement: the page of matches (``uid > after``; the ILIKEs use the
+        search indexes on ``item``) joined to each UID's latest
+        ``lorry_stock_state`` row across lorries.
+        """
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = f"%{escaped}%"
+        # SQLite's LIKE is already case-insensitive; ILIKE would wrap both sides in lower()
+        if self.session.get_bind().dialect.name == "sqlite":
+            contains = lambda column: column.like(pattern, escape="\\")
+        else:
+            contains = lambda column: column.ilike(pattern, escape="\\")
+        page_q = (
+            select(Item.uid, Item.oem_serial, Item.status, Item.created_at, Item.sku_id)
+            .where(or_(contains(Item.uid), contains(Item.oem_serial)))
+            .order_by(Item.uid)
+            .limit(limit)
+        )
+        if after:
+            page_q = page_q.where(Item.uid > after)
+        page = page_q.subquery()
 
-        # 1. Exact name match (case insensitive)
-        exact_match = self.session.query(SKU).filter(
-            func.lower(SKU.name) == query
-        ).first()
-        
-        if exact_match:
-            matches.append({
-                "sku_id": exact_match.id,
-                "sku_name": exact_match.name,
-                "match_type": "exact",
-                "confidence": 1.0
-            })
+        # Latest state row per UID across lorries; items never on a lorry keep one NULL row
+        s = LorryStockState
+        rn = func.row_number().over(
+            partition_by=page.c.uid,
+            order_by=(s.transaction_date.desc(), s.transaction_id.desc())
+        ).label("rn")
+        located = (
+            select(page, s.lorry_id, s.action, rn)
+            .outerjoin(s, s.uid == page.c.uid)
+        ).subquery()
 
-        # 2. Alias match (case insensitive)
-        alias_matches = self.session.query(SKUAlias).filter(
-            func.lower(SKUAlias.alias) == query
+        rows = self.session.execute(
+            select(located, SKU.code, SKU.name)
+            .join(SKU, SKU.id == located.c.sku_id)
+            .where(located.c.rn == 1)
+            .order_by(located.c.uid)
         ).all()
-        
-        for alias in alias_matches:
-            matches.append({
-                "sku_id": alias.sku_id,
-                "sku_name": alias.sku.name,
-                "match_type": "alias",
-                "confidence": 1.0
-            })
-
-        # 3. Fuzzy matching
-        all_skus = self.session.query(SKU).all()
-        fuzzy_matches = []
-        
-        for sku in all_skus:
-            # Skip if already matched exactly
-            if any(m["sku_id"] == sku.id and m["confidence"] == 1.0 for m in matches):
-                continue
-                
-            # Calculate similarity
-            similarity = fuzz.ratio(query, sku.name.lower()) / 100.0
-            
-            if similarity >= threshold:
-                fuzzy_matches.append({
-                    "sku_id": sku.id,
-                    "sku_name": sku.name,
-                    "match_type": "fuzzy",
-                    "confidence": similarity
-                })
 
-        # Sort fuzzy matches by confidence
-        fuzzy_matches.sort(key=lambda x: x["confidence"], reverse=True)
-        matches.extend(fuzzy_matches)
+        results = []
+        for row in rows:
+            current_location = "Unknown"
+            if row.action in ("LOAD", "COLLECTION"):
+                current_location = f"Lorry {row.lorry_id}"
+            elif row.action == "UNLOAD":
+                current_location = "Warehouse"
+            elif row.action == "DELIVERY":
+                current_location = "Delivered"
+            results.append({
+                "uid": row.uid,
+                "serial": row.oem_serial,
+                "sku_code": row.code,
+                "sku_name": row.name,
+                "status": row.status.value,
+                "current_location": current_location,
+                "created_at": row.created_at.isoformat()
+            })
+        return results
 
-        # Sort all matches by confidence (exact and alias first, then fuzzy)
-        matches.sort(key=lambda x: x["confidence"], reverse=True)
-        
-        return matches
+    def resolve_sku_name(self, query: str, threshold: float = 0.8) -> List[Dict[str, Any]]:
+        """Resolve SKU name with exact, alias, and fuzzy matching"""
+        return get_index(self.session).match(query, threshold)
 
     def get_sku_suggestions(self, query: str, limit: int = 5) -> List[str]:
         """Get SKU name suggestions for partial matches"""
-        if not query or not query.strip():
-            return []
-
-        query = query.strip().lower()
-        
-        # Get SKUs that contain the query string
-        skus = self.session.query(SKU).filter(
-            func.lower(SKU.name).contains(query)
-        ).limit(limit * 2).all()  # Get more to filter better matches
-        
-        suggestions = []
-        for sku in skus:
-            suggestions.append(sku.name)
-        
-        return suggestions[:limit]
+        return get_index(self.session).suggest(query, limit)
 
     def add_sku_alias(self, sku_id: int, alias: str) -> Dict[str, Any]:
         """Add alias for SKU"""
         # Check if alias already exists
+        alias = alias.strip().lower()
         existing = self.session.query(SKUAlias).filter(
-            func.lower(SKUAlias.alias) == alias.lower()
+            func.lower(SKUAlias.alias_text) == alias
         ).first()
         
         if existing:
             raise ValueError("Alias already exists")
 
-        sku_alias = SKUAlias(sku_id=sku_id, alias=alias)
+        sku_alias = SKUAlias(sku_id=sku_id, alias_text=alias)
         self.session.add(sku_alias)
         self.session.commit()
 
@@ -0,0 +1,39 @@
+"""Wake-up signalling between job producers and app.worker
+
+Producers call ``notify_job_enqueued`` in the same transaction that inserts the
+``jobs`` row. Postgres only delivers a NOTIFY when that transaction commits, so
+a worker is never woken for a row it cannot see yet. On databases without
+LISTEN/NOTIFY (SQLite in local dev) this is a no-op and the worker falls back to
+polling.
+"""
+
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+JOBS_CHANNEL = "orderops_jobs"
+
+
+def supports_notify(db: Session) -> bool:
+    bind = db.get_bind()
+    return bind is not None and bind.dialect.name == "postgresql"
+
+
+def notify_job_enqueued(db: Session, kind: str) -> None:
+    """Queue a NOTIFY on ``JOBS_CHANNEL``; it is sent when ``db`` commits."""
+    if not supports_notify(db):
+        return
+    try:
+        with db.begin_nested():
+            db.execute(
+                text("SELECT pg_notify(:channel, :kind)"),
+                {"channel": JOBS_CHANNEL, "kind": kind},
+            )
+    except Exception as e:
+        # The worker's safety-net poll still picks the job up
+        logger.warning("job_notify_failed kind=%s error=%s", kind, e)
@@ -1,32 +1,30 @@
 """Lorry Inventory Service for real-time stock tracking"""
 
-from datetime import datetime, date, timedelta, timezone
-from typing import List, Dict, Optional, Tuple, Any, Set
+from datetime import datetime, date, timezone
+from typing import List, Dict, Optional, Any, Set
 from sqlalchemy.orm import Session
-from sqlalchemy import select, and_, desc, func, literal_column
+from sqlalchemy import select, desc, func, insert, literal_column
 import json
 import logging
 
 from ..models import (
     LorryStockTransaction, 
+    LorryStockState,
     LorryAssignment, 
     LorryStockVerification,
     SKU,
     User
 )
+from .lorry_stock_state import (
+    KL_TZ,
+    apply_transactions,
+    current_stock,
+    stock_by_lorry,
+)
 
 
 logger = logging.getLogger(__name__)
 
-IN_ACTIONS = ("LOAD", "COLLECTION")
-OUT_ACTIONS = ("UNLOAD", "DELIVERY")
-
-def _kl_day_bounds(d: date) -> Tuple[datetime, datetime]:
-    # Asia/Kuala_Lumpur is UTC+8 with no DST; compute [start, end) and convert to UTC for DB timestamps
-    start_local = datetime(d.year, d.month, d.day, 0, 0, 0, tzinfo=timezone(timedelta(hours=8)))
-    end_local = start_local + timedelta(days=1)
-    return (start_local.astimezone(timezone.utc), end_local.astimezone(timezone.utc))
-
 class LorryInventoryService:
     """Service for managing lorry stock in real-time"""
     
@@ -35,44 +33,52 @@ class LorryInventoryService:
     
     def get_current_stock(self, lorry_id: str, as_of_date: Optional[date] = None) -> List[str]:
         """
-        UID state as-of end of 'as_of_date' business day (KL). Uses latest action per (lorry, uid).
+        UID state as-of end of 'as_of_date' business day (KL). Uses latest action per (lorry, uid),
+        read from lorry_stock_state / checkpoints (see services/lorry_stock_state.py).
         """
-        target_date = as_of_date or date.today()
-        start_utc, end_utc = _kl_day_bounds(target_date)
-
-        t = LorryStockTransaction
-
-        # row_number() over (lorry_id, uid) by transaction_date desc, id desc
-        rn = func.row_number().over(
-            partition_by=(t.lorry_id, t.uid),
-            order_by=(t.transaction_date.desc(), t.id.desc())
-        ).label("rn")
-
-        subq = (
-            select(t.lorry_id, t.uid, t.action, rn)
-            .where(
-                and_(
-                    t.lorry_id == lorry_id,
-                    t.transaction_date < end_utc  # half-open: include all events strictly before next day 00:00 KL
-                )
-            )
-        ).subquery()
-
-        rows = self.db.execute(
-            select(subq.c.uid, subq.c.action).where(subq.c.rn == 1)
-        ).all()
-
-        return [uid for (uid, action) in rows if action in IN_ACTIONS]
+        return current_stock(self.db, lorry_id, as_of_date or datetime.now(KL_TZ).date())
     
     def has_transaction_history(self, lorry_id: str) -> bool:
         """Check if a lorry has any transaction history"""
-        transaction_count = self.db.execute(
-            select(func.count(LorryStockTransaction.id))
-            .where(LorryStockTransaction.lorry_id == lorry_id)
-        ).scalar()
-        
-        return transaction_count > 0
+        return self.db.execute(
+            select(LorryStockState.uid).where(LorryStockState.lorry_id == lorry_id).limit(1)
+        ).first() is not None
     
+    def record_movements(self, movements: List[Dict[str, Any]]) -> List[int]:
+        """Insert stock transactions with one multi-row INSERT ... RETURNING. The caller commits.
+
+        Each movement needs lorry_id, action, uid and transaction_date; order_id,
+        driver_id, admin_user_id and notes are optional. The ORM flush hook does
+        not see bulk inserts, so lorry_stock_state is updated here.
+        """
+        if not movements:
+            return []
+        t = LorryStockTransaction
+        rows = [
+            {
+                "lorry_id": m["lorry_id"],
+                "action": m["action"],
+                "uid": m["uid"],
+                "order_id": m.get("order_id"),
+                "driver_id": m.get("driver_id"),
+                "admin_user_id": m.get("admin_user_id"),
+                "notes": m.get("notes"),
+                "transaction_date": m["transaction_date"],
+            }
+            for m in movements
+        ]
+        inserted = self.db.execute(
+            insert(t).returning(t.id, t.lorry_id, t.uid, t.action, t.transaction_date),
+            rows,
+        ).all()
+        apply_transactions(self.db.connection(), [row._mapping for row in inserted])
+        return [row.id for row in inserted]
+
+    def _commit_movements(self, movements: List[Dict[str, Any]]) -> int:
+        self.record_movements(movements)
+        self.db.commit()
+        return len(movements)
+
     def load_uids(
         self, 
         lorry_id: str, 
@@ -81,73 +87,29 @@ class LorryInventoryService:
         notes: Optional[str] = None
     ) -> Dict[str, any]:
         """Admin loads UIDs into a lorry"""
-        logger.info(f"=== LORRY INVENTORY SERVICE load_uids DEBUG START ===")
-        logger.info(f"DEBUG: lorry_id={lorry_id}, uids_count={len(uids)}, admin_user_id={admin_user_id}, notes={notes}")
-        
         now = datetime.now()
-        transactions_added = []
         errors = []
         
-        # Get current stock ONCE at the beginning to avoid performance issues
+        # Validate the whole batch against current stock as sets
         existing_stock = set(self.get_current_stock(lorry_id))
-        logger.info(f"DEBUG: Current stock contains {len(existing_stock)} UIDs")
-        
-        # Keep track of UIDs being added in this batch to prevent duplicates within the batch
-        uids_being_added = set()
-        
-        logger.info(f"DEBUG: Processing {len(uids)} UIDs: {uids[:5]}{'...' if len(uids) > 5 else ''}")
-        
-        for i, uid in enumerate(uids):
-            logger.info(f"DEBUG: Processing UID {i+1}/{len(uids)}: {uid}")
-            try:
-                # Check if UID already exists in current stock
-                if uid in existing_stock:
-                    logger.warning(f"DEBUG: UID {uid} already exists in lorry {lorry_id}")
-                    errors.append(f"UID {uid} already exists in lorry {lorry_id}")
-                    continue
-                
-                # Check if UID is being added in this same batch
-                if uid in uids_being_added:
-                    logger.warning(f"DEBUG: UID {uid} is duplicate within this batch for lorry {lorry_id}")
-                    errors.append(f"UID {uid} is duplicate within this batch")
-                    continue
-                
-                # Create load transaction
-                logger.info(f"DEBUG: Creating LorryStockTransaction for UID {uid}")
-                transaction = LorryStockTransaction(
-                    lorry_id=lorry_id,
-                    action="LOAD",
-                    uid=uid,
-                    admin_user_id=admin_user_id,
-                    notes=notes,
-                    transaction_date=now
-                )
-                logger.info(f"DEBUG: LorryStockTransaction created - {transaction}")
-                
-                self.db.add(transaction)
-                logger.info(f"DEBUG: Transaction added to session")
-                transactions_added.append(transaction)
-                uids_being_added.add(uid)  # Track this UID as being added
-                logger.info(f"DEBUG: Transaction appended to list - total added: {len(transactions_added)}")
-                
-            except Exception as e:
-                errors.append(f"Failed to load UID {uid}: {str(e)}")
-                logger.error(f"Error loading UID {uid}: {e}")
+        to_load: List[str] = []
+        seen: Set[str] = set()
+        for uid in uids:
+            if uid in existing_stock:
+                errors.append(f"UID {uid} already exists in lorry {lorry_id}")
+            elif uid in seen:
+                errors.append(f"UID {uid} is duplicate within this batch")
+            else:
+                seen.add(uid)
+                to_load.append(uid)
         
-        # Commit all successful transactions
-        logger.info(f"DEBUG: About to commit {len(transactions_added)} transactions")
         try:
-            self.db.commit()
-            logger.info(f"DEBUG: Database commit successful")
-            
-            for i, transaction in enumerate(transactions_added):
-                logger.info(f"DEBUG: Refreshing transaction {i+1}/{len(transactions_added)}")
-                self.db.refresh(transaction)
-                logger.info(f"DEBUG: Transaction {i+1} refreshed - ID: {transaction.id}")
-                
+            loaded = self._commit_movements([
+                {"lorry_id": lorry_id, "action": "LOAD", "uid": uid, "admin_user_id": admin_user_id,
+                 "notes": notes, "transaction_date": now}
+                for uid in to_load
+            ])
         except Exception as e:
-            logger.error(f"DEBUG: Database commit failed: {e}")
-            logger.error(f"DEBUG: Exception type: {type(e)}")
             self.db.rollback()
             logger.error(f"Failed to commit load transactions: {e}")
             return {
@@ -157,20 +119,14 @@ class LorryInventoryService:
                 "errors": errors + [str(e)]
             }
         
-        # Legacy sync removed - using unified LorryStockTransaction system only
-        logger.info("Using unified transaction system - legacy sync disabled")
-        
-        logger.info(f"Loaded {len(transactions_added)} UIDs into lorry {lorry_id}")
+        logger.info(f"Loaded {loaded} UIDs into lorry {lorry_id} ({len(errors)} rejected)")
         
-        result = {
+        return {
             "success": True,
-            "message": f"Successfully loaded {len(transactions_added)} UIDs into lorry {lorry_id}",
-            "loaded_count": len(transactions_added),
+            "message": f"Successfully loaded {loaded} UIDs into lorry {lorry_id}",
+            "loaded_count": loaded,
             "errors": errors
         }
-        
-        logger.info(f"=== LORRY INVENTORY SERVICE load_uids DEBUG END === returning: {result}")
-        return result
     
     def unload_uids(
         self, 
@@ -181,41 +137,27 @@ class LorryInventoryService:
     ) -> Dict[str, any]:
         """Admin unloads UIDs from a lorry"""
         now = datetime.now()
-        transactions_added = []
         errors = []
         
         # Get current stock to validate unload requests
         current_stock = set(self.get_current_stock(lorry_id))
-        
+        to_unload: List[str] = []
+        seen: Set[str] = set()
         for uid in uids:
-            try:
-                # Check if UID exists in lorry
-                if uid not in current_stock:
-                    errors.append(f"UID {uid} not found in lorry {lorry_id}")
-                    continue
-                
-                # Create unload transaction
-                transaction = LorryStockTransaction(
-                    lorry_id=lorry_id,
-                    action="UNLOAD",
-                    uid=uid,
-                    admin_user_id=admin_user_id,
-                    notes=notes,
-                    transaction_date=now
-                )
-                
-                self.db.add(transaction)
-                transactions_added.append(transaction)
-                
-            except Exception as e:
-                errors.append(f"Failed to unload UID {uid}: {str(e)}")
-                logger.error(f"Error unloading UID {uid}: {e}")
+            if uid not in current_stock:
+                errors.append(f"UID {uid} not found in lorry {lorry_id}")
+            elif uid in seen:
+                errors.append(f"UID {uid} is duplicate within this batch")
+            else:
+                seen.add(uid)
+                to_unload.append(uid)
         
-        # Commit all successful transactions
         try:
-            self.db.commit()
-            for transaction in transactions_added:
-                self.db.refresh(transaction)
+            unloaded = self._commit_movements([
+                {"lorry_id": lorry_id, "action": "UNLOAD", "uid": uid, "admin_user_id": admin_user_id,
+                 "notes": notes, "transaction_date": now}
+                for uid in to_unload
+            ])
         except Exception as e:
             self.db.rollback()
             logger.error(f"Failed to commit unload transactions: {e}")
@@ -226,15 +168,12 @@ class LorryInventoryService:
                 "errors": errors + [str(e)]
             }
         
-        # Legacy sync removed - using unified LorryStockTransaction system only
-        logger.info("Using unified transaction system - legacy sync disabled")
-        
-        logger.info(f"Unloaded {len(transactions_added)} UIDs from lorry {lorry_id}")
+        logger.info(f"Unloaded {unloaded} UIDs from lorry {lorry_id} ({len(errors)} rejected)")
         
         return {
             "success": True,
-            "message": f"Successfully unloaded {len(transactions_added)} UIDs from lorry {lorry_id}",
-            "unloaded_count": len(transactions_added),
+            "message": f"Successfully unloaded {unloaded} UIDs from lorry {lorry_id}",
+            "unloaded_count": unloaded,
             "errors": errors
         }
     
@@ -250,67 +189,62 @@ class LorryInventoryService:
         """Process UID actions and update lorry inventory atomically"""
         now = datetime.now(timezone.utc)
         errors: List[str] = []
-        transactions_added: List[LorryStockTransaction] = []
+        movements: List[Dict[str, Any]] = []
 
         # Preload current state once for quick membership checks
-        current_stock: Set[str] = set(self.get_current_stock(lorry_id, now.date()))
+        current_stock: Set[str] = set(self.get_current_stock(lorry_id))
 
         def _add_tx(action: str, uid: str, notes: str):
-            tx = LorryStockTransaction(
-                lorry_id=lorry_id,
-                action=action,
-                uid=uid,
-                order_id=order_id,
-                driver_id=driver_id,
-                admin_user_id=admin_user_id,
-                notes=notes,
-                transaction_date=now
-            )
-            self.db.add(tx)
-            transactions_added.append(tx)
-
-        try:
-            for action_data in uid_actions:
-                action = action_data.get("action")
-                uid = action_data.get("uid")
-                notes = action_data.get("notes", f"Order {order_id} - {action}")
+            movements.append({
+                "lorry_id": lorry_id,
+                "action": action,
+                "uid": uid,
+                "order_id": order_id,
+                "driver_id": driver_id,
+                "admin_user_id": admin_user_id,
+                "notes": notes,
+                "transaction_date": now,
+            })
 
-                if not uid or not action:
-                    errors.append("Missing action or uid")
-                    continue
+        for action_data in uid_actions:
+            action = action_data.get("action")
+            uid = action_data.get("uid")
+            notes = action_data.get("notes", f"Order {order_id} - {action}")
 
-                if action == "DELIVER":
-                    if ensure_in_lorry and uid not in current_stock:
-                        errors.append(f"UID not in lorry: {uid}")
-                        continue
-                    _add_tx("DELIVERY", uid, notes)
-                    current_stock.discard(uid)
+            if not uid or not action:
+                errors.append("Missing action or uid")
+                continue
 
-                elif action in ("COLLECT", "REPAIR"):
-                    _add_tx("COLLECTION", uid, notes)
-                    current_stock.add(uid)
+            if action == "DELIVER":
+                if ensure_in_lorry and uid not in current_stock:
+                    errors.append(f"UID not in lorry: {uid}")
+                    continue
+                _add_tx("DELIVERY", uid, notes)
+                current_stock.discard(uid)
 
-                elif action == "SWAP":
-                    deliver_uid = action_data.get("deliver_uid") or uid
-                    collect_uid = action_data.get("collect_uid")
-                    if not deliver_uid or not collect_uid:
-                        errors.append("SWAP requires deliver_uid and collect_uid")
-                        continue
-                    if ensure_in_lorry and deliver_uid not in current_stock:
-                        errors.append(f"SWAP deliver UID not in lorry: {deliver_uid}")
-                        continue
-                    _add_tx("DELIVERY", deliver_uid, f"SWAP OUT - {notes}")
-                    current_stock.discard(deliver_uid)
-                    _add_tx("COLLECTION", collect_uid, f"SWAP IN - {notes}")
-                    current_stock.add(collect_uid)
+            elif action in ("COLLECT", "REPAIR"):
+                _add_tx("COLLECTION", uid, notes)
+                current_stock.add(uid)
 
-                else:
-                    errors.append(f"Unknown action: {action}")
+            elif action == "SWAP":
+                deliver_uid = action_data.get("deliver_uid") or uid
+                collect_uid = action_data.get("collect_uid")
+                if not deliver_uid or not collect_uid:
+                    errors.append("SWAP requires deliver_uid and collect_uid")
+                    continue
+                if ensure_in_lorry and deliver_uid not in current_stock:
+                    errors.append(f"SWAP deliver UID not in lorry: {deliver_uid}")
+                    continue
+                _add_tx("DELIVERY", deliver_uid, f"SWAP OUT - {notes}")
+                current_stock.discard(deliver_uid)
+                _add_tx("COLLECTION", collect_uid, f"SWAP IN - {notes}")
+                current_stock.add(collect_uid)
 
-            self.db.commit()
-            for tx in transactions_added:
-                self.db.refresh(tx)
+            else:
+                errors.append(f"Unknown action: {action}")
 
+        try:
+            processed = self._commit_movements(movements)
         except Exception as e:
             self.db.rollback()
             return {
@@ -322,8 +256,8 @@ class LorryInventoryService:
 
         return {
             "success": len(errors) == 0,
-            "message": f"Successfully processed {len(transactions_added)} action(s)",
-            "processed_count": len(transactions_added),
+            "message": f"Successfully processed {processed} action(s)",
+            "processed_count": processed,
             "errors": errors
         }
     
@@ -402,22 +336,13 @@ class LorryInventoryService:
     
     def get_lorry_inventory_summary(self) -> Dict[str, any]:
         """Get summary of all lorry inventories"""
-        # Get all unique lorries that have transactions
-        lorries = self.db.execute(
-            select(LorryStockTransaction.lorry_id)
-            .distinct()
-            .order_by(LorryStockTransaction.lorry_id)
-        ).scalars().all()
-        
         summary = []
-        for lorry_id in lorries:
-            current_stock = self.get_current_stock(lorry_id)
-            
+        for lorry_id, stock in stock_by_lorry(self.db).items():
             summary.append({
                 "lorry_id": lorry_id,
-                "current_stock_count": len(current_stock),
-                "current_uids": current_stock[:10],  # First 10 for preview
-                "has_more": len(current_stock) > 10
+                "current_stock_count": len(stock),
+                "current_uids": stock[:10],  # First 10 for preview
+                "has_more": len(stock) > 10
             })
         
         return {
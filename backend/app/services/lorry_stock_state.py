@@ -0,0 +1,291 @@
+"""Materialized lorry stock
+
+Stock on a lorry is the set of UIDs whose latest transaction is LOAD or
+COLLECTION. ``get_current_stock`` used to find that with a row_number() window
+over every transaction the lorry ever had, so each read grew with history.
+Two tables replace the replay:
+
+- ``lorry_stock_state``: the latest transaction per (lorry, uid), upserted by
+  the ``after_flush`` hook below whenever LorryStockTransaction rows are
+  written. Current stock reads only that lorry's state rows.
+- ``lorry_stock_checkpoints``: the UIDs on each lorry at the end of a KL
+  business day, written daily by ``python -m app.scripts.checkpoint_lorry_stock``.
+  Stock as of a past day starts from the nearest checkpoint and replays only
+  the transactions after it.
+
+A back-dated transaction deletes its lorry's checkpoints from that day on;
+updating or deleting transaction rows rebuilds the affected state rows from
+history. Bulk inserts that bypass the ORM call ``apply_transactions``
+themselves.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import and_, delete, event, func, inspect, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from ..models import LorryStockCheckpoint, LorryStockState, LorryStockTransaction
+
+IN_ACTIONS = ("LOAD", "COLLECTION")
+OUT_ACTIONS = ("UNLOAD", "DELIVERY")
+
+KL_TZ = timezone(timedelta(hours=8))
+# A day is checkpointed only once writes that straddled its midnight have committed
+CHECKPOINT_SETTLE = timedelta(hours=1)
+
+_STATE_ATTRS = ("lorry_id", "uid", "action", "transaction_date")
+
+
+def _kl_day_bounds(d: date) -> Tuple[datetime, datetime]:
+    # Asia/Kuala_Lumpur is UTC+8 with no DST; compute [start, end) and convert to UTC for DB timestamps
+    start_local = datetime(d.year, d.month, d.day, 0, 0, 0, tzinfo=KL_TZ)
+    end_local = start_local + timedelta(days=1)
+    return (start_local.astimezone(timezone.utc), end_local.astimezone(timezone.utc))
+
+
+def _utc(dt: datetime) -> datetime:
+    # Naive transaction dates are stored as UTC
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def _kl_date(dt: datetime) -> date:
+    return _utc(dt).astimezone(KL_TZ).date()
+
+
+def _insert_for(conn: Connection):
+    return sqlite_insert if conn.dialect.name == "sqlite" else pg_insert
+
+
+def apply_transactions(conn: Connection, rows: Iterable[dict]) -> None:
+    """Fold new transactions (id, lorry_id, uid, action, transaction_date) into the state."""
+    latest: Dict[Tuple[str, str], dict] = {}
+    for row in rows:
+        key = (row["lorry_id"], row["uid"])
+        current = latest.get(key)
+        if current is None or (_utc(row["transaction_date"]), row["id"]) > (
+            _utc(current["transaction_date"]), current["id"]
+        ):
+            latest[key] = row
+    if not latest:
+        return
+
+    tbl = LorryStockState.__table__
+    stmt = _insert_for(conn)(tbl)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["lorry_id", "uid"],
+        set_={
+            "action": stmt.excluded.action,
+            "transaction_id": stmt.excluded.transaction_id,
+            "transaction_date": stmt.excluded.transaction_date,
+        },
+        # Only a newer transaction replaces the state (back-dated rows exist)
+        where=or_(
+            tbl.c.transaction_date < stmt.excluded.transaction_date,
+            and_(
+                tbl.c.transaction_date == stmt.excluded.transaction_date,
+                tbl.c.transaction_id < stmt.excluded.transaction_id,
+            ),
+        ),
+    )
+    conn.execute(
+        stmt,
+        [
+            {
+                "lorry_id": r["lorry_id"],
+                "uid": r["uid"],
+                "action": r["action"],
+                "transaction_id": r["id"],
+                "transaction_date": r["transaction_date"],
+            }
+            for r in latest.values()
+        ],
+    )
+
+    # Checkpoints only exist for settled days, so same-day writes skip this
+    today = datetime.now(KL_TZ).date()
+    earliest: Dict[str, date] = {}
+    for row in latest.values():
+        day = _kl_date(row["transaction_date"])
+        if day < today and day < earliest.get(row["lorry_id"], today):
+            earliest[row["lorry_id"]] = day
+    if earliest:
+        cp = LorryStockCheckpoint.__table__
+        conn.execute(
+            delete(cp).where(
+                or_(*(and_(cp.c.lorry_id == lorry_id, cp.c.as_of_date >= day) for lorry_id, day in earliest.items()))
+            )
+        )
+
+
+def rebuild_state(conn: Connection, keys: Set[Tuple[str, str]]) -> None:
+    """Recompute the state rows for (lorry, uid) ``keys`` from history."""
+    by_lorry: Dict[str, Set[str]] = defaultdict(set)
+    for lorry_id, uid in keys:
+        by_lorry[lorry_id].add(uid)
+
+    state = LorryStockState.__table__
+    cp = LorryStockCheckpoint.__table__
+    t = LorryStockTransaction.__table__
+    for lorry_id, uids in by_lorry.items():
+        conn.execute(delete(state).where(state.c.lorry_id == lorry_id, state.c.uid.in_(uids)))
+        conn.execute(delete(cp).where(cp.c.lorry_id == lorry_id))
+        rows = conn.execute(
+            select(t.c.id, t.c.lorry_id, t.c.uid, t.c.action, t.c.transaction_date).where(
+                t.c.lorry_id == lorry_id, t.c.uid.in_(uids)
+            )
+        ).mappings()
+        apply_transactions(conn, rows)
+
+
+@event.listens_for(Session, "after_flush")
+def _maintain_lorry_stock_state(session: Session, flush_context) -> None:
+    new_rows = [
+        {
+            "id": obj.id,
+            "lorry_id": obj.lorry_id,
+            "uid": obj.uid,
+            "action": obj.action,
+            "transaction_date": obj.transaction_date,
+        }
+        for obj in session.new
+        if isinstance(obj, LorryStockTransaction)
+    ]
+
+    stale: Set[Tuple[str, str]] = set()
+    for obj in session.dirty:
+        if not isinstance(obj, LorryStockTransaction):
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[a].history.has_changes() for a in _STATE_ATTRS):
+            continue
+        stale.add((obj.lorry_id, obj.uid))
+        # The row may have moved off its previous (lorry, uid)
+        old_lorry = state.attrs.lorry_id.history.deleted or [obj.lorry_id]
+        old_uid = state.attrs.uid.history.deleted or [obj.uid]
+        stale.add((old_lorry[0], old_uid[0]))
+    for obj in session.deleted:
+        if isinstance(obj, LorryStockTransaction):
+            stale.add((obj.lorry_id, obj.uid))
+
+    if new_rows:
+        apply_transactions(session.connection(), new_rows)
+    if stale:
+        rebuild_state(session.connection(), stale)
+
+
+def _replay_history(db: Session, lorry_id: str, end_utc: datetime) -> List[str]:
+    """Stock before ``end_utc`` from the full transaction history (no checkpoint yet)."""
+    t = LorryStockTransaction
+
+    # row_number() over (lorry_id, uid) by transaction_date desc, id desc
+    rn = func.row_number().over(
+        partition_by=(t.lorry_id, t.uid),
+        order_by=(t.transaction_date.desc(), t.id.desc())
+    ).label("rn")
+
+    subq = (
+        select(t.lorry_id, t.uid, t.action, rn)
+        .where(
+            and_(
+                t.lorry_id == lorry_id,
+                t.transaction_date < end_utc  # half-open: include all events strictly before next day 00:00 KL
+            )
+        )
+    ).subquery()
+
+    rows = db.execute(
+        select(subq.c.uid, subq.c.action).where(subq.c.rn == 1)
+    ).all()
+
+    return [uid for (uid, action) in rows if action in IN_ACTIONS]
+
+
+def stock_as_of(db: Session, lorry_id: str, as_of_date: date) -> List[str]:
+    """UIDs on ``lorry_id`` at the end of ``as_of_date``: nearest checkpoint plus the transactions since."""
+    _, end_utc = _kl_day_bounds(as_of_date)
+    cp = db.execute(
+        select(LorryStockCheckpoint.as_of_date, LorryStockCheckpoint.uids)
+        .where(LorryStockCheckpoint.lorry_id == lorry_id, LorryStockCheckpoint.as_of_date <= as_of_date)
+        .order_by(LorryStockCheckpoint.as_of_date.desc())
+        .limit(1)
+    ).first()
+    if cp is None:
+        return _replay_history(db, lorry_id, end_utc)
+    if cp.as_of_date == as_of_date:
+        return list(cp.uids)
+
+    stock = set(cp.uids)
+    _, start_utc = _kl_day_bounds(cp.as_of_date)
+    t = LorryStockTransaction
+    delta = db.execute(
+        select(t.uid, t.action)
+        .where(t.lorry_id == lorry_id, t.transaction_date >= start_utc, t.transaction_date < end_utc)
+        .order_by(t.transaction_date, t.id)
+    )
+    for uid, action in delta:
+        if action in IN_ACTIONS:
+            stock.add(uid)
+        else:
+            stock.discard(uid)
+    return list(stock)
+
+
+def current_stock(db: Session, lorry_id: str, as_of_date: date) -> List[str]:
+    """UIDs on ``lorry_id`` at the end of ``as_of_date``, from the state table when it applies.
+
+    The state holds each UID's latest transaction, which answers the as-of
+    question exactly unless the lorry has transactions dated after that day.
+    """
+    _, end_utc = _kl_day_bounds(as_of_date)
+    s = LorryStockState
+    later = db.execute(
+        select(s.uid).where(s.lorry_id == lorry_id, s.transaction_date >= end_utc).limit(1)
+    ).first()
+    if later is not None:
+        return stock_as_of(db, lorry_id, as_of_date)
+    return list(
+        db.execute(select(s.uid).where(s.lorry_id == lorry_id, s.action.in_(IN_ACTIONS))).scalars()
+    )
+
+
+def stock_by_lorry(db: Session) -> Dict[str, List[str]]:
+    """Current UIDs of every lorry that has any transaction (empty lists included)."""
+    s = LorryStockState
+    out: Dict[str, List[str]] = {
+        lorry_id: [] for lorry_id in db.execute(select(s.lorry_id).distinct().order_by(s.lorry_id)).scalars()
+    }
+    for lorry_id, uid in db.execute(select(s.lorry_id, s.uid).where(s.action.in_(IN_ACTIONS))):
+        out[lorry_id].append(uid)
+    return out
+
+
+def settled_day(now: datetime | None = None) -> date:
+    """Latest KL day that can be checkpointed."""
+    now = now or datetime.now(timezone.utc)
+    return (now - CHECKPOINT_SETTLE).astimezone(KL_TZ).date() - timedelta(days=1)
+
+
+def write_checkpoints(db: Session, day: date | None = None) -> int:
+    """Checkpoint every lorry at the end of ``day`` (the settled day by default). The caller commits."""
+    day = day or settled_day()
+    lorries = db.execute(select(LorryStockState.lorry_id).distinct()).scalars().all()
+    rows = [
+        {"lorry_id": lorry_id, "as_of_date": day, "uids": sorted(stock_as_of(db, lorry_id, day))}
+        for lorry_id in lorries
+    ]
+    if rows:
+        conn = db.connection()
+        stmt = _insert_for(conn)(LorryStockCheckpoint.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["lorry_id", "as_of_date"],
+            set_={"uids": stmt.excluded.uids},
+        )
+        conn.execute(stmt, rows)
+    return len(rows)
@@ -0,0 +1,92 @@
+"""Rule-based fast path for stage 1 (DELIVERY vs RETURN) classification
+
+Scores a message against the same indicators ``CLASSIFIER_PROMPT`` lists for
+the model. Clear-cut messages - a full order with phone, address and
+"hantar", or a one-liner "WC2024 buyback RM500" - are settled locally; anything
+with mixed or weak signals returns None and is escalated to the LLM.
+
+Benchmark against the labelled corpus with
+``python -m app.scripts.benchmark_classifier``.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# (pattern, weight, label)
+_DELIVERY_RULES: List[Tuple[re.Pattern, int, str]] = [
+    (re.compile(r"\b(hantar|deliver(y|ed)?|penghantaran|pasang|install(ation)?)\b"), 2, "delivery keyword"),
+    (re.compile(r"\b(sewa|rent(al)?|beli(?!\s+(balik|semula))|buy|ansuran|installment)\b"), 1, "sale/rental keyword"),
+    (re.compile(r"\bx\s*\d+\s*(bulan|months?)\b"), 1, "installment plan"),
+    (re.compile(r"(\+?6?01\d[\s-]?\d{3,4}[\s-]?\d{4})"), 2, "phone number"),
+    (re.compile(r"\b(jalan|jln|taman|tmn|lorong|lrg|kampung|kg|bandar|persiaran|lebuh)\b"), 1, "address"),
+    (re.compile(r"\b\d{5}\b(?!\s*(rm|ringgit))"), 1, "postcode"),
+]
+
+_RETURN_RULES: List[Tuple[re.Pattern, int, str]] = [
+    (re.compile(r"\b(buy\s?back|beli\s+balik)\b"), 3, "buyback"),
+    (re.compile(r"\b(cancel(led|lation)?|batal|pembatalan)\b"), 3, "cancellation"),
+    (re.compile(r"\b(return(ed)?|ambil\s+(balik|semula)|tamat\s+sewa|pulang(kan)?)\b"), 3, "return"),
+    (re.compile(r"\b(refund|bayar\s+balik)\b"), 3, "refund"),
+    (re.compile(r"\b(denda|penalty|fine)\b"), 2, "penalty"),
+]
+
+_ORDER_CODE = re.compile(r"\b[a-z]{2,4}\d{3,6}\b")
+
+# A side must reach this score, with nothing pointing the other way, to settle
+_MIN_SCORE = 3
+# ... or beat the other side by this factor when both have signals
+_DOMINANCE = 3
+
+
+@dataclass
+class RuleScore:
+    delivery: int = 0
+    returns: int = 0
+    matched: List[str] = field(default_factory=list)
+
+
+def score_message(text: str) -> RuleScore:
+    lowered = (text or "").lower()
+    score = RuleScore()
+    for pattern, weight, label in _DELIVERY_RULES:
+        if pattern.search(lowered):
+            score.delivery += weight
+            score.matched.append(label)
+    for pattern, weight, label in _RETURN_RULES:
+        if pattern.search(lowered):
+            score.returns += weight
+            score.matched.append(label)
+
+    # An order code on its own short line without customer details reads as
+    # a reference to an existing order
+    lines = [line for line in lowered.splitlines() if line.strip()]
+    if _ORDER_CODE.search(lowered) and len(lines) <= 2 and "phone number" not in score.matched:
+        score.returns += 1
+        score.matched.append("bare order code")
+    return score
+
+
+def classify_by_rules(text: str) -> Optional[Dict[str, Any]]:
+    """Classification in the LLM's dict shape, or None when not clear-cut."""
+    score = score_message(text)
+    winner, loser = max(score.delivery, score.returns), min(score.delivery, score.returns)
+    if winner < _MIN_SCORE or score.delivery == score.returns:
+        return None
+    if loser == 0:
+        confidence = 0.95 if winner >= _MIN_SCORE + 2 else 0.9
+    elif winner >= _DOMINANCE * loser and winner >= _MIN_SCORE + 2:
+        confidence = 0.85
+    else:
+        return None
+    message_type = "DELIVERY" if score.delivery > score.returns else "RETURN"
+    return {
+        "message_type": message_type,
+        "confidence": confidence,
+        "reasoning": (
+            f"Rule-based: {', '.join(score.matched)} "
+            f"(delivery={score.delivery}, return={score.returns})"
+        ),
+    }
@@ -8,7 +8,9 @@ from sqlalchemy import or_
 
 from ..core.config import settings
 from ..models import Order, Customer
-from .parser import _openai_client
+from .message_classifier import classify_by_rules
+from .parse_cache import parse_cache, prompt_version
+from .parser import MODEL, _openai_client
 
 
 # Stage 1: Message Classification
@@ -183,6 +185,11 @@ Examples:
 Return ONLY JSON matching the schema."""
 
 
+CLASSIFIER_VERSION = prompt_version(MODEL, CLASSIFIER_PROMPT, CLASSIFIER_SCHEMA)
+MOTHER_FINDER_VERSION = prompt_version(MODEL, MOTHER_FINDER_PROMPT, MOTHER_FINDER_SCHEMA)
+RETURN_PARSER_VERSION = prompt_version(MODEL, RETURN_PARSER_PROMPT, RETURN_PARSER_SCHEMA)
+
+
 class MultiStageParser:
     def __init__(self):
         if not settings.OPENAI_API_KEY:
@@ -191,8 +198,15 @@ class MultiStageParser:
 
     def classify_message(self, text: str) -> Dict[str, Any]:
         """Stage 1: Classify message as DELIVERY or RETURN"""
+        if settings.CLASSIFIER_RULES_ENABLED:
+            ruled = classify_by_rules(text)
+            if ruled is not None:
+                return ruled
+        return parse_cache.get_or_compute("classify", CLASSIFIER_VERSION, text, self._classify_message)
+
+    def _classify_message(self, text: str) -> Dict[str, Any]:
         response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=MODEL,
             response_format={
                 "type": "json_schema",
                 "json_schema": {"name": "classification", "schema": CLASSIFIER_SCHEMA, "strict": True}
@@ -211,8 +225,11 @@ class MultiStageParser:
 
     def find_mother_order_identifiers(self, text: str) -> Dict[str, Any]:
         """Stage 3: Extract identifiers to find original order"""
+        return parse_cache.get_or_compute("mother_finder", MOTHER_FINDER_VERSION, text, self._find_mother_order_identifiers)
+
+    def _find_mother_order_identifiers(self, text: str) -> Dict[str, Any]:
         response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=MODEL,
             response_format={
                 "type": "json_schema", 
                 "json_schema": {"name": "identifiers", "schema": MOTHER_FINDER_SCHEMA, "strict": True}
@@ -231,8 +248,11 @@ class MultiStageParser:
 
     def parse_return_adjustment(self, text: str) -> Dict[str, Any]:
         """Stage 4: Parse return/adjustment details"""
+        return parse_cache.get_or_compute("return", RETURN_PARSER_VERSION, text, self._parse_return_adjustment)
+
+    def _parse_return_adjustment(self, text: str) -> Dict[str, Any]:
         response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=MODEL,
             response_format={
                 "type": "json_schema",
                 "json_schema": {"name": "adjustment", "schema": RETURN_PARSER_SCHEMA, "strict": True}
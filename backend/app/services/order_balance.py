@@ -0,0 +1,256 @@
+"""Materialized order balances
+
+``compute_balance`` walks an order's plan, payments, trip and adjustment
+orders; calling it per row of a 500-order page lazily loads all of those one
+order at a time. ``order_balances`` keeps the result per order instead:
+
+- Writes to an order, its plan, payments, trip or adjustment orders bump the
+  order's ``version`` (``after_flush`` hook below, inserting the row if there
+  is none yet). A snapshot is served only while ``computed_version`` equals
+  ``version``, and is stored only if the version it was computed from is
+  still current, so a read racing a write cannot store a stale balance.
+- ``get_order_balances`` returns snapshots for a page of orders and recomputes
+  missing or expired ones in one batch (a fixed number of queries). It stores
+  them on a short session of its own so the read path never commits the
+  caller's session.
+- Accruals grow with time alone, so each snapshot records ``valid_until``, the
+  day before its next monthly step. ``roll_forward_order_balances`` refreshes
+  expired rows ahead of time (run daily from
+  ``python -m app.scripts.roll_forward_order_balances``).
+"""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event, func, inspect, literal, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, selectinload
+
+from ..models import Order, OrderBalance, Payment, Plan, Trip
+from ..reports.outstanding import (
+    _resolve_start_and_cutoff,
+    compute_expected_for_order,
+    months_between,
+)
+from .ordersvc import _sum_posted_payments, q2
+
+DEC0 = Decimal("0")
+_BATCH = 500
+
+# Trip attributes that feed delivery gating and the accrual start
+_TRIP_ATTRS = ("status", "delivered_at", "order_id")
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_order_balances(session: Session, flush_context) -> None:
+    order_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Order):
+            order_ids.add(obj.id)
+            if obj.parent_id:
+                order_ids.add(obj.parent_id)
+        elif isinstance(obj, (Payment, Plan)):
+            order_ids.add(obj.order_id)
+        elif isinstance(obj, Trip):
+            state = inspect(obj)
+            if obj in session.dirty and not any(state.attrs[a].history.has_changes() for a in _TRIP_ATTRS):
+                continue
+            order_ids.add(obj.order_id)
+    order_ids.discard(None)
+    if not order_ids:
+        return
+    # Payments and changes on an adjustment order move its parent's balance too
+    parents = select(Order.parent_id).where(Order.id.in_(order_ids), Order.parent_id.isnot(None))
+    # Deleted orders drop out of the select; their rows go with the FK cascade
+    targets = select(Order.id, literal(1)).where(or_(Order.id.in_(order_ids), Order.id.in_(parents)))
+    conn = session.connection()
+    tbl = OrderBalance.__table__
+    stmt = _insert_for(conn)(tbl).from_select(["order_id", "version"], targets)
+    stmt = stmt.on_conflict_do_update(index_elements=["order_id"], set_={"version": tbl.c.version + 1})
+    conn.execute(stmt)
+
+
+def _insert_for(conn):
+    return sqlite_insert if conn.dialect.name == "sqlite" else pg_insert
+
+
+def _next_accrual_step(order, trip, as_of: date) -> Optional[date]:
+    """First day after ``as_of`` on which the order's expected amount changes
+    without any write, or None if it never does."""
+    order_type = (getattr(order, "type", "") or "").upper()
+    if order_type == "OUTRIGHT":
+        return None
+    start, cutoff, is_delivered = _resolve_start_and_cutoff(order, trip)
+    plan = getattr(order, "plan", None)
+    monthly_amount = q2(getattr(plan, "monthly_amount", 0) or 0)
+    if not is_delivered or monthly_amount <= DEC0 or not start:
+        # Only a delivery or plan write can start accrual
+        return None
+    if cutoff and cutoff <= as_of:
+        return None
+    months = months_between(start, as_of, cutoff=cutoff)
+    if order_type == "INSTALLMENT":
+        total_months = int(getattr(plan, "months", 0) or 0)
+        if total_months > 0 and months >= total_months:
+            return None
+
+    # months_between only steps on the start date, a monthly anniversary or
+    # the first of a month (when the anniversary day does not exist)
+    candidates = {start}
+    year, month = as_of.year, as_of.month
+    for _ in range(3):
+        candidates.add(date(year, month, 1))
+        try:
+            candidates.add(date(year, month, start.day))
+        except ValueError:
+            pass
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    for candidate in sorted(c for c in candidates if c > as_of):
+        if months_between(start, candidate, cutoff=cutoff) > months:
+            return candidate
+    return None
+
+
+def _load_orders(db: Session, order_ids: Iterable[int]) -> List[Order]:
+    return (
+        db.execute(
+            select(Order)
+            .where(Order.id.in_(list(order_ids)))
+            # Orders already in the session may predate the version just read
+            .execution_options(populate_existing=True)
+            .options(
+                selectinload(Order.plan),
+                selectinload(Order.payments),
+                selectinload(Order.trip),
+                selectinload(Order.adjustments).selectinload(Order.payments),
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+
+def _snapshot(order: Order, as_of: date) -> dict:
+    trip = order.trip
+    expected = compute_expected_for_order(order, as_of, trip)
+    paid = q2(
+        _sum_posted_payments(order)
+        + sum((_sum_posted_payments(ch) for ch in order.adjustments or []), DEC0)
+    )
+    step = _next_accrual_step(order, trip, as_of)
+    return {
+        "order_id": order.id,
+        "expected": expected,
+        "paid": paid,
+        "balance": q2(expected - paid),
+        "as_of": as_of,
+        "valid_until": step - timedelta(days=1) if step else None,
+    }
+
+
+def _upsert(db: Session, rows: List[dict]) -> None:
+    """Store snapshots whose ``version`` is still the row's current version."""
+    tbl = OrderBalance.__table__
+    stmt = _insert_for(db.connection())(tbl)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["order_id"],
+        set_={
+            **{c: stmt.excluded[c] for c in ("expected", "paid", "balance", "as_of", "valid_until")},
+            "computed_version": stmt.excluded.version,
+            "computed_at": func.now(),
+        },
+        where=tbl.c.version == stmt.excluded.version,
+    )
+    db.execute(stmt, [{**r, "computed_version": r["version"]} for r in rows])
+
+
+def _versions(db: Session, order_ids: List[int]) -> Dict[int, int]:
+    return dict(
+        db.execute(
+            select(OrderBalance.order_id, OrderBalance.version).where(OrderBalance.order_id.in_(order_ids))
+        ).all()
+    )
+
+
+def _compute(db: Session, order_ids: List[int], as_of: date, versions: Dict[int, int]) -> List[dict]:
+    """Snapshots for ``order_ids``, each tagged with the version read before loading its data."""
+    rows = []
+    for i in range(0, len(order_ids), _BATCH):
+        for order in _load_orders(db, order_ids[i:i + _BATCH]):
+            rows.append({**_snapshot(order, as_of), "version": versions.get(order.id, 0)})
+    return rows
+
+
+def refresh_order_balances(db: Session, order_ids: Iterable[int], as_of: Optional[date] = None) -> Dict[int, dict]:
+    """Recompute and store snapshots for ``order_ids``. The caller commits."""
+    as_of = as_of or date.today()
+    order_ids = list(order_ids)
+    rows = _compute(db, order_ids, as_of, _versions(db, order_ids))
+    if rows:
+        _upsert(db, rows)
+    return {r["order_id"]: r for r in rows}
+
+
+def get_order_balances(db: Session, order_ids: Iterable[int], as_of: Optional[date] = None) -> Dict[int, Decimal]:
+    """Balance per order id as of ``as_of`` (today by default).
+
+    Snapshots are written only for today, on a separate short session; other
+    dates are computed on the fly. ``db`` must not hold uncommitted writes to
+    these orders, or storing would wait on its own row locks.
+    """
+    today = date.today()
+    as_of = as_of or today
+    order_ids = list(dict.fromkeys(order_ids))
+    if not order_ids:
+        return {}
+
+    balances: Dict[int, Decimal] = {}
+    versions: Dict[int, int] = {}
+    # Plain columns, not entities: _upsert bypasses the identity map
+    rows = db.execute(
+        select(
+            OrderBalance.order_id, OrderBalance.version, OrderBalance.computed_version,
+            OrderBalance.balance, OrderBalance.as_of, OrderBalance.valid_until,
+        ).where(OrderBalance.order_id.in_(order_ids))
+    )
+    for row in rows:
+        versions[row.order_id] = row.version
+        if (
+            row.computed_version == row.version
+            and row.as_of <= as_of
+            and (row.valid_until is None or as_of <= row.valid_until)
+        ):
+            balances[row.order_id] = row.balance
+
+    missing = [oid for oid in order_ids if oid not in balances]
+    if missing:
+        computed = _compute(db, missing, as_of, versions)
+        if as_of == today and computed:
+            with Session(bind=db.get_bind()) as writer:
+                _upsert(writer, computed)
+                writer.commit()
+        balances.update({snap["order_id"]: snap["balance"] for snap in computed})
+    return balances
+
+
+def roll_forward_order_balances(db: Session, as_of: Optional[date] = None) -> int:
+    """Refresh every snapshot whose accrual has moved on by ``as_of``. Commits per batch."""
+    as_of = as_of or date.today()
+    refreshed = 0
+    while True:
+        # Only current snapshots: a skipped (outdated) store leaves the row stale,
+        # and the next read recomputes it
+        ids = db.execute(
+            select(OrderBalance.order_id)
+            .where(OrderBalance.valid_until < as_of, OrderBalance.computed_version == OrderBalance.version)
+            .limit(_BATCH)
+        ).scalars().all()
+        if not ids:
+            return refreshed
+        refresh_order_balances(db, ids, as_of)
+        db.commit()
+        refreshed += len(ids)
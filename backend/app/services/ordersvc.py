@@ -12,6 +12,7 @@ from sqlalchemy import select
 from ..models import Customer, Order, OrderItem, Plan  # models/__init__.py exports these
 from ..utils.dates import parse_relaxed_date
 from ..utils.normalize import to_decimal
+from .geocoding import apply_map_url_coordinates
 
 
 # -------------------------------
@@ -90,12 +91,15 @@ def _get_or_create_customer(db: Session, data: Dict[str, Any]) -> Customer:
         if not cust.map_url and map_url:
             cust.map_url = map_url
             updated = True
+        if cust.lat is None and apply_map_url_coordinates(cust):
+            updated = True
         if updated:
             db.add(cust)
         return cust
 
     # Create new
     cust = Customer(name=name, phone=phone, address=address, map_url=map_url)
+    apply_map_url_coordinates(cust)
     db.add(cust)
     db.flush()  # get cust.id
     return cust
@@ -0,0 +1,216 @@
+"""Content-addressed cache for LLM parse results
+
+Every LLM stage (order parser, classifier, mother-order finder, return parser)
+is a pure function of its prompt, schema, model and the message text, so its
+result can be reused whenever the same message is parsed again - operators
+re-submitting a WhatsApp message, ``/parse/classify`` followed by
+``/parse/advanced``, or a PARSE_CREATE job retry.
+
+The key is sha256(stage, prompt version, normalised text). ``prompt_version``
+hashes the prompt, schema and model, so editing any of them invalidates old
+entries without a manual bump. Lookups go to an in-process LRU first, then the
+``parse_cache`` table (shared by web and worker replicas), and only then to
+OpenAI. The table is accessed through its own short session so a cache write
+never joins or breaks the caller's transaction.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .. import db as db_module
+from ..core.config import settings
+from ..models import ParseCacheEntry
+
+logger = logging.getLogger(__name__)
+
+_ZERO_WIDTH = re.compile("[\u200b\u200c\u200d\u2060\ufeff]")
+_SPACES = re.compile("[ \t\u00a0]+")
+
+_PURGE_INTERVAL_SECS = 3600.0
+
+
+def normalize_message(text: Optional[str]) -> str:
+    """Canonical form of a message for cache keys.
+
+    Case and line structure are kept (names, codes and item lines matter to
+    the parser); whitespace noise, blank lines and zero-width characters from
+    WhatsApp copy/paste are not.
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFC", text)
+    text = _ZERO_WIDTH.sub("", text).replace("\r\n", "\n").replace("\r", "\n")
+    lines = (_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def prompt_version(*parts: Any) -> str:
+    """Short fingerprint of everything besides the text that shapes a result."""
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(stage: str, version: str, normalized: str) -> str:
+    return hashlib.sha256(f"{stage}\0{version}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    def __init__(self, max_entries: int, ttl_hours: float):
+        self.max_entries = max_entries
+        self.ttl = timedelta(hours=ttl_hours)
+        self._memory: "OrderedDict[str, Tuple[datetime, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"memory_hits": 0, "db_hits": 0, "misses": 0}
+        )
+        self._last_purge = 0.0
+
+    def get_or_compute(
+        self,
+        stage: str,
+        version: str,
+        text: str,
+        compute: Callable[[str], Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """Cached ``compute(text)`` for this stage and prompt version.
+
+        Callers get their own copy of the result and may mutate it freely.
+        """
+        if not settings.PARSE_CACHE_ENABLED:
+            return compute(text)
+
+        key = cache_key(stage, version, normalize_message(text))
+        now = datetime.now(timezone.utc)
+
+        result = self._memory_get(key, now)
+        if result is not None:
+            self._count(stage, "memory_hits")
+            return copy.deepcopy(result)
+
+        result = self._db_get(key, now)
+        if result is not None:
+            self._count(stage, "db_hits")
+            self._memory_put(key, now + self.ttl, result)
+            return copy.deepcopy(result)
+
+        self._count(stage, "misses")
+        result = compute(text)
+        self._memory_put(key, now + self.ttl, result)
+        self._db_put(key, stage, now + self.ttl, result)
+        return copy.deepcopy(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-stage hit counts and hit rates since process start."""
+        with self._lock:
+            stages = {stage: dict(counts) for stage, counts in self._stats.items()}
+            memory_entries = len(self._memory)
+        totals = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+        for counts in stages.values():
+            for name in totals:
+                totals[name] += counts[name]
+            counts["hit_rate"] = _hit_rate(counts)
+        totals["hit_rate"] = _hit_rate(totals)
+        return {"stages": stages, "total": totals, "memory_entries": memory_entries}
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+    def _count(self, stage: str, name: str) -> None:
+        with self._lock:
+            self._stats[stage][name] += 1
+
+    def _memory_get(self, key: str, now: datetime) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, result = entry
+            if expires_at <= now:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return result
+
+    def _memory_put(self, key: str, expires_at: datetime, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, copy.deepcopy(result))
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _db_get(self, key: str, now: datetime) -> Optional[Dict[str, Any]]:
+        if db_module.SessionLocal is None:
+            return None
+        try:
+            with db_module.SessionLocal() as session:
+                row = session.execute(
+                    select(ParseCacheEntry.id, ParseCacheEntry.result).where(
+                        ParseCacheEntry.cache_key == key,
+                        ParseCacheEntry.expires_at > now,
+                    )
+                ).first()
+                if row is None:
+                    return None
+                session.execute(
+                    update(ParseCacheEntry)
+                    .where(ParseCacheEntry.id == row.id)
+                    .values(hits=ParseCacheEntry.hits + 1)
+                )
+                session.commit()
+                return row.result
+        except Exception as e:
+            logger.warning("parse_cache_read_failed error=%s", e)
+            return None
+
+    def _db_put(self, key: str, stage: str, expires_at: datetime, result: Dict[str, Any]) -> None:
+        if db_module.SessionLocal is None:
+            return
+        try:
+            with db_module.SessionLocal() as session:
+                # Replace an expired row for the same key, if any
+                session.execute(delete(ParseCacheEntry).where(ParseCacheEntry.cache_key == key))
+                session.add(
+                    ParseCacheEntry(
+                        cache_key=key, stage=stage, result=result, hits=0, expires_at=expires_at
+                    )
+                )
+                if time.monotonic() - self._last_purge > _PURGE_INTERVAL_SECS:
+                    self._last_purge = time.monotonic()
+                    session.execute(
+                        delete(ParseCacheEntry).where(
+                            ParseCacheEntry.expires_at <= datetime.now(timezone.utc)
+                        )
+                    )
+                session.commit()
+        except IntegrityError:
+            # Another replica stored the same parse first
+            pass
+        except Exception as e:
+            logger.warning("parse_cache_write_failed stage=%s error=%s", stage, e)
+
+
+def _hit_rate(counts: Dict[str, int]) -> float:
+    hits = counts["memory_hits"] + counts["db_hits"]
+    total = hits + counts["misses"]
+    return round(hits / total, 4) if total else 0.0
+
+
+parse_cache = ParseCache(
+    max_entries=settings.PARSE_CACHE_MEMORY_ENTRIES,
+    ttl_hours=settings.PARSE_CACHE_TTL_HOURS,
+)
@@ -4,6 +4,9 @@ from typing import Any, Dict
 import json
 
 from ..core.config import settings
+from .parse_cache import parse_cache, prompt_version
+
+MODEL = "gpt-4o-mini"
 
 
 def _openai_client():
@@ -164,13 +167,21 @@ STRICT rules:
 Return only JSON that conforms to the provided schema. No extra keys. No comments."""
 
 
+# Changes whenever the model, prompt or schema does, invalidating cached parses
+ORDER_PARSER_VERSION = prompt_version(MODEL, SYSTEM, SCHEMA)
+
+
 def parse_whatsapp_text(text: str) -> Dict[str, Any]:
+    return parse_cache.get_or_compute("order", ORDER_PARSER_VERSION, text, _parse_whatsapp_text)
+
+
+def _parse_whatsapp_text(text: str) -> Dict[str, Any]:
     if not settings.OPENAI_API_KEY:
         raise RuntimeError("OPENAI_API_KEY is not configured")
 
     client = _openai_client()
     resp = client.chat.completions.create(
-        model="gpt-4o-mini",
+        model=MODEL,
         response_format={
             "type": "json_schema",
             "json_schema": {"name": "order", "schema": SCHEMA, "strict": True},
@@ -0,0 +1,132 @@
+"""Background processing of proof-of-delivery photos
+
+The upload request only checks the bytes are an image (header parse, no
+decode), stages the original in ``pod_photo_uploads``, reserves the trip's
+photo slot and queues a ``POD_PHOTO`` job, all in one transaction and without
+touching the storage backend. app.worker then decodes the photo once, renders
+the size variants, uploads them (``app.utils.storage.get_storage``) and writes
+the result back to the trip. Originals, EXIF included, are never published,
+and queued photos survive a restart or redeploy.
+
+Object keys are chosen up front and storage URLs are deterministic, so the
+slot already holds the final full-size URL when the request returns: the
+DELIVERED check (at least one POD photo) keeps working while the job is
+pending. A failed job is retried with backoff (see app.worker); only once it
+runs out of attempts is the staged original dropped and the slot cleared
+again, unless a newer photo has replaced it meanwhile.
+"""
+
+from __future__ import annotations
+
+import logging
+import uuid
+from io import BytesIO
+from typing import Dict
+
+from PIL import Image, ImageOps
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from ..models import Job, PodPhotoUpload, Trip
+from ..utils.storage import MAX_BYTES, encode_jpeg, get_storage
+from .job_signal import notify_job_enqueued
+
+logger = logging.getLogger(__name__)
+
+POD_PHOTO_KIND = "POD_PHOTO"
+
+# Variant name -> longest side in pixels. "full" is what goes in the trip slot
+# (verification); "thumb" is for admin lists, see Trip.pod_thumbnail_urls.
+VARIANTS = {"full": 1280, "thumb": 320}
+
+SLOT_COLUMNS = {1: "pod_photo_url_1", 2: "pod_photo_url_2", 3: "pod_photo_url_3"}
+
+
+def validate_image(data: bytes) -> None:
+    """Reject oversize or non-image uploads without decoding the pixels."""
+    if len(data) > MAX_BYTES:
+        raise ValueError("Image too large")
+    try:
+        Image.open(BytesIO(data)).verify()
+    except Exception as e:
+        raise ValueError(f"Not a valid image: {e}") from e
+
+
+def photo_keys(name: str) -> Dict[str, str]:
+    return {variant: f"pod-images/{name}_{variant}.jpg" for variant in VARIANTS}
+
+
+def render_variants(data: bytes) -> Dict[str, bytes]:
+    img = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    img.load()
+    return {variant: encode_jpeg(img, side) for variant, side in VARIANTS.items()}
+
+
+def _slot_values(photo_number: int, url) -> dict:
+    values = {SLOT_COLUMNS[photo_number]: url}
+    if photo_number == 1:
+        # Legacy single-photo field
+        values["pod_photo_url"] = url
+    return values
+
+
+def _reserved(payload: dict):
+    """UPDATE of the payload's slot, applied only while it still holds this photo."""
+    column = getattr(Trip, SLOT_COLUMNS[payload["photo_number"]])
+    return update(Trip).where(Trip.id == payload["trip_id"], column == payload["urls"]["full"])
+
+
+def reserve_pod_photo(db: Session, trip: Trip, photo_number: int, data: bytes) -> dict:
+    """Validate and stage the upload, point ``trip``'s slot at its final URL and
+    queue the POD_PHOTO job. The caller commits; returns the job payload."""
+    validate_image(data)
+    upload = PodPhotoUpload(trip_id=trip.id, data=data)
+    db.add(upload)
+    db.flush()
+    storage = get_storage()
+    keys = photo_keys(uuid.uuid4().hex)
+    payload = {
+        "trip_id": trip.id,
+        "photo_number": photo_number,
+        "upload_id": upload.id,
+        "keys": keys,
+        "urls": {variant: storage.url_for(key) for variant, key in keys.items()},
+    }
+    for column, value in _slot_values(photo_number, payload["urls"]["full"]).items():
+        setattr(trip, column, value)
+    db.add(Job(kind=POD_PHOTO_KIND, status="queued", payload=payload))
+    notify_job_enqueued(db, POD_PHOTO_KIND)
+    return payload
+
+
+def release_pod_photo(db: Session, payload: dict) -> None:
+    """Drop a photo that will never be processed: its staged original and, unless
+    a newer photo took it, its slot. The caller commits."""
+    db.execute(delete(PodPhotoUpload).where(PodPhotoUpload.id == payload["upload_id"]))
+    db.execute(_reserved(payload).values(**_slot_values(payload["photo_number"], None)))
+
+
+def run_pod_photo_job(db: Session, payload: dict) -> dict:
+    """POD_PHOTO job body for app.worker, which commits.
+
+    Errors propagate so the worker can retry; it calls ``release_pod_photo``
+    once the job runs out of attempts.
+    """
+    trip_id, photo_number = payload["trip_id"], payload["photo_number"]
+    upload = db.get(PodPhotoUpload, payload["upload_id"])
+    if upload is None:
+        logger.warning("pod_photo_missing trip_id=%s slot=%s upload_id=%s", trip_id, photo_number, payload["upload_id"])
+        release_pod_photo(db, payload)
+        return {"trip_id": trip_id, "photo_number": photo_number, "url": None}
+
+    storage = get_storage()
+    variants = render_variants(upload.data)
+    # Full size last: once it exists the photo is complete
+    for variant in sorted(variants, key=lambda v: v == "full"):
+        url = storage.put(payload["keys"][variant], variants[variant], "image/jpeg")
+
+    # Written back only if no newer photo has taken the slot meanwhile
+    db.execute(_reserved(payload).values(**_slot_values(photo_number, url)))
+    db.delete(upload)
+    logger.info("pod_photo_stored trip_id=%s slot=%s url=%s", trip_id, photo_number, url)
+    return {"trip_id": trip_id, "photo_number": photo_number, "url": url}
@@ -0,0 +1,194 @@
+"""Local, deterministic order-to-driver assignment solver
+
+Capacity-aware cheapest-insertion heuristic for the multi-depot problem that
+``AssignmentService`` used to hand to the LLM. Works on the same order/driver
+dicts that ``_get_orders_to_assign`` and ``_get_available_drivers`` build and
+returns the same ``{"order_id", "driver_id", "reason"}`` list, so either engine
+can feed ``_apply_assignment``.
+
+Rules carried over from the LLM prompt:
+- Orders are served from their nearest depot; Sabah orders only go to
+  Kota Kinabalu drivers and Peninsular orders only to Batu Caves drivers.
+- Clocked-in drivers (priority 1) are preferred over scheduled-only ones.
+- Geography beats pure workload balance, but each driver has a daily cap.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config.clock_config import HOME_BASE_LAT, HOME_BASE_LNG
+from ..utils.geofencing import haversine_distance
+
+Point = Tuple[float, float]
+
+DEPOTS: Dict[str, Point] = {
+    "BATU_CAVES": (HOME_BASE_LAT, HOME_BASE_LNG),
+    "KOTA_KINABALU": (5.9804, 116.0735),
+}
+DEFAULT_DEPOT = "BATU_CAVES"
+
+# Used when an order has no coordinates yet
+SABAH_KEYWORDS = (
+    "sabah",
+    "kota kinabalu",
+    "sandakan",
+    "tawau",
+    "lahad datu",
+    "kota belud",
+    "keningau",
+    "semporna",
+    "kudat",
+    "penampang",
+    "putatan",
+    "papar",
+)
+
+# Extra km charged for giving an order to a driver who is not clocked in yet
+SCHEDULED_ONLY_PENALTY_KM = 25.0
+# Extra km per order already on a driver, keeps loads from piling on one driver
+LOAD_PENALTY_KM = 2.0
+
+
+def _point(item: Dict[str, Any]) -> Optional[Point]:
+    lat, lng = item.get("lat"), item.get("lng")
+    if lat is None or lng is None:
+        return None
+    return float(lat), float(lng)
+
+
+def order_depot(order: Dict[str, Any]) -> str:
+    """Depot an order must be served from."""
+    point = _point(order)
+    if point is not None:
+        return min(DEPOTS, key=lambda d: haversine_distance(*point, *DEPOTS[d]))
+    address = (order.get("address") or "").lower()
+    if any(k in address for k in SABAH_KEYWORDS):
+        return "KOTA_KINABALU"
+    return DEFAULT_DEPOT
+
+
+def _insertion_cost(route: List[Point], point: Point) -> Tuple[float, int]:
+    """Cheapest (extra_km, index) to insert ``point`` into closed tour ``route``.
+
+    ``route[0]`` is the depot; the tour returns to it after the last stop.
+    """
+    best_cost, best_idx = float("inf"), len(route)
+    n = len(route)
+    for i in range(n):
+        a = route[i]
+        b = route[(i + 1) % n]
+        cost = (
+            haversine_distance(*a, *point)
+            + haversine_distance(*point, *b)
+            - haversine_distance(*a, *b)
+        )
+        if cost < best_cost:
+            best_cost, best_idx = cost, i + 1
+    return best_cost, best_idx
+
+
+def tour_km(route: List[Point]) -> float:
+    """Length of the closed tour through ``route`` (depot first)."""
+    if len(route) < 2:
+        return 0.0
+    return sum(
+        haversine_distance(*route[i], *route[(i + 1) % len(route)])
+        for i in range(len(route))
+    )
+
+
+def solve_assignments(
+    orders: List[Dict[str, Any]],
+    drivers: List[Dict[str, Any]],
+    max_orders_per_driver: int = 20,
+) -> List[Dict[str, Any]]:
+    """Assign orders to drivers by cheapest insertion, farthest orders first.
+
+    Deterministic for a given input: ties break on order_id / driver_id.
+    Orders that no eligible driver has capacity for are left unassigned.
+    """
+    if not orders or not drivers:
+        return []
+
+    routes: Dict[int, List[Point]] = {}
+    capacity: Dict[int, int] = {}
+    load: Dict[int, int] = {}
+    by_depot: Dict[str, List[Dict[str, Any]]] = {d: [] for d in DEPOTS}
+    for d in sorted(drivers, key=lambda d: d["driver_id"]):
+        depot = d.get("base_warehouse") or DEFAULT_DEPOT
+        if depot not in DEPOTS:
+            depot = DEFAULT_DEPOT
+        route = [DEPOTS[depot]]
+        # Orders already on the driver's route anchor the clustering
+        for loc in d.get("existing_trip_locations") or []:
+            point = _point(loc)
+            if point is not None:
+                route.insert(_insertion_cost(route, point)[1], point)
+        routes[d["driver_id"]] = route
+        active = int(d.get("active_trips") or 0)
+        capacity[d["driver_id"]] = max(0, max_orders_per_driver - active)
+        load[d["driver_id"]] = active
+        by_depot[depot].append(d)
+
+    def sort_key(o: Dict[str, Any]):
+        point = _point(o)
+        depot = DEPOTS[order_depot(o)]
+        dist = haversine_distance(*depot, *point) if point else 0.0
+        return (-dist, o["order_id"])
+
+    assignments: List[Dict[str, Any]] = []
+    for order in sorted(orders, key=sort_key):
+        depot = order_depot(order)
+        point = _point(order) or DEPOTS[depot]
+        best = None
+        for d in by_depot[depot]:
+            driver_id = d["driver_id"]
+            if capacity[driver_id] <= 0:
+                continue
+            extra_km, idx = _insertion_cost(routes[driver_id], point)
+            score = extra_km + LOAD_PENALTY_KM * load[driver_id]
+            if d.get("priority", 2) != 1:
+                score += SCHEDULED_ONLY_PENALTY_KM
+            if best is None or score < best[0]:
+                best = (score, driver_id, idx, extra_km)
+        if best is None:
+            continue
+        _, driver_id, idx, extra_km = best
+        routes[driver_id].insert(idx, point)
+        capacity[driver_id] -= 1
+        load[driver_id] += 1
+        assignments.append(
+            {
+                "order_id": order["order_id"],
+                "driver_id": driver_id,
+                "reason": "geographic_clustering" if extra_km < 10 else "route_efficiency",
+            }
+        )
+    return assignments
+
+
+def assignment_route_km(
+    assignments: List[Dict[str, Any]],
+    orders: List[Dict[str, Any]],
+    drivers: List[Dict[str, Any]],
+) -> float:
+    """Total tour km for a set of assignments, for comparing engines.
+
+    Each driver's stops are sequenced by cheapest insertion from their depot,
+    so assignments from any engine are costed the same way.
+    """
+    order_points = {o["order_id"]: o for o in orders}
+    depots = {
+        d["driver_id"]: DEPOTS.get(d.get("base_warehouse") or DEFAULT_DEPOT, DEPOTS[DEFAULT_DEPOT])
+        for d in drivers
+    }
+    routes: Dict[int, List[Point]] = {}
+    for a in assignments:
+        order = order_points.get(a["order_id"])
+        if order is None or a["driver_id"] not in depots:
+            continue
+        route = routes.setdefault(a["driver_id"], [depots[a["driver_id"]]])
+        point = _point(order) or DEPOTS[order_depot(order)]
+        route.insert(_insertion_cost(route, point)[1], point)
+    return sum(tour_km(r) for r in routes.values())
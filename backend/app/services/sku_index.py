@@ -0,0 +1,228 @@
+"""Process-local index for resolving free-text product names to SKUs
+
+Stock sheets and parsed messages name products loosely ("hospital bed 3
+function", "BED001", an operator-defined alias). Resolving them used to load
+every SKU row per name and score it in a Python loop, with an unindexable
+``ilike('%...%')`` for aliases.
+
+``get_index(db)`` returns an immutable snapshot of SKU codes, names and
+aliases with the fuzzy-match choices already normalised. Its version is a
+fingerprint of the ``sku`` and ``sku_alias`` tables (row counts, newest
+``updated_at``, newest alias id), read with one small query per lookup, so a write
+from any replica is picked up on the next resolve. Writes made in this process
+also drop the snapshot straight away through an ``after_flush`` hook.
+
+``SKUIndex.resolve_many`` resolves a whole sheet against one snapshot:
+repeated names are scored once and each distinct name is a single rapidfuzz
+``process.extract`` call over the precomputed choices.
+"""
+
+from __future__ import annotations
+
+import bisect
+import re
+import threading
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from rapidfuzz import fuzz, process
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from ..models import SKU, SKUAlias
+
+# Minimum token_set_ratio (0-1) for a FUZZY match in ``resolve``
+FUZZY_CUTOFF = 0.85
+SUGGESTION_LIMIT = 5
+
+_SPACES = re.compile(r"\s+")
+# Never produced by ``normalise``, so a search cannot match across two aliases
+_ALIAS_SEP = "\n"
+
+
+def normalise(text: Optional[str]) -> str:
+    return _SPACES.sub(" ", text or "").strip().lower()
+
+
+class SKUIndex:
+    def __init__(self, version: Tuple, skus: Iterable[Tuple], aliases: Iterable[Tuple]):
+        self.version = version
+        self.names: Dict[int, str] = {}
+        self.by_code: Dict[str, int] = {}
+        self.by_name: Dict[str, int] = {}
+        # Fuzzy choices: every SKU name (``match``), active names/codes (``resolve``)
+        self.all_ids: List[int] = []
+        self.all_names: List[str] = []
+        self.active_ids: List[int] = []
+        self.active_names: List[str] = []
+        self.active_codes: List[str] = []
+
+        for sku_id, code, name, is_active in skus:
+            norm_name, norm_code = normalise(name), normalise(code)
+            self.names[sku_id] = name
+            self.by_code.setdefault(norm_code, sku_id)
+            self.by_name.setdefault(norm_name, sku_id)
+            self.all_ids.append(sku_id)
+            self.all_names.append(norm_name)
+            if is_active:
+                self.active_ids.append(sku_id)
+                self.active_names.append(norm_name)
+                self.active_codes.append(norm_code)
+
+        # Aliases in priority order (highest weight first), joined into one
+        # string so a substring search is a single str.find
+        self.alias_exact: Dict[str, List[int]] = {}
+        self._alias_sku_ids: List[int] = []
+        self._alias_offsets: List[int] = []
+        parts: List[str] = []
+        offset = 0
+        for alias_text, sku_id in aliases:
+            norm = normalise(alias_text)
+            self.alias_exact.setdefault(norm, []).append(sku_id)
+            self._alias_sku_ids.append(sku_id)
+            self._alias_offsets.append(offset)
+            parts.append(norm)
+            offset += len(norm) + len(_ALIAS_SEP)
+        self._alias_blob = _ALIAS_SEP.join(parts)
+
+    def _alias_containing(self, query: str) -> Optional[int]:
+        """SKU of the highest-weight alias containing ``query``."""
+        pos = self._alias_blob.find(query)
+        if pos < 0:
+            return None
+        return self._alias_sku_ids[bisect.bisect_right(self._alias_offsets, pos) - 1]
+
+    def resolve(self, raw: str) -> Dict[str, Any]:
+        """Best SKU for a stock-sheet name: exact code, alias, fuzzy, else NONE."""
+        raw = (raw or "").strip()
+        query = normalise(raw)
+        result = {"raw": raw, "sku_id": None, "match_type": "NONE", "score": 0.0, "suggestions": []}
+        if not query:
+            return result
+
+        sku_id = self.by_code.get(query)
+        if sku_id is not None:
+            return {**result, "sku_id": sku_id, "match_type": "EXACT", "score": 1.0}
+
+        sku_id = self._alias_containing(query)
+        if sku_id is not None:
+            return {**result, "sku_id": sku_id, "match_type": "ALIAS", "score": 0.9}
+
+        # Best of name and code score per SKU
+        scores: Dict[int, float] = {}
+        cutoff = FUZZY_CUTOFF * 100
+        for choices in (self.active_names, self.active_codes):
+            for _, score, idx in process.extract(
+                query, choices, scorer=fuzz.token_set_ratio, score_cutoff=cutoff, limit=None
+            ):
+                if score > scores.get(idx, 0):
+                    scores[idx] = score
+        if scores:
+            ranked = sorted(scores, key=lambda idx: (-scores[idx], idx))
+            best = ranked[0]
+            return {
+                **result,
+                "sku_id": self.active_ids[best],
+                "match_type": "FUZZY",
+                "score": scores[best] / 100,
+                "suggestions": [self.active_ids[idx] for idx in ranked[:SUGGESTION_LIMIT]],
+            }
+
+        result["suggestions"] = [
+            sku_id for sku_id, name in zip(self.active_ids, self.active_names) if query in name
+        ][:SUGGESTION_LIMIT]
+        return result
+
+    def resolve_many(self, raws: Iterable[str]) -> List[Dict[str, Any]]:
+        """``resolve`` for every line of a sheet; repeated names are scored once."""
+        resolved: Dict[str, Dict[str, Any]] = {}
+        results = []
+        for raw in raws:
+            key = normalise(raw)
+            if key not in resolved:
+                resolved[key] = self.resolve(raw)
+            results.append({**resolved[key], "raw": (raw or "").strip()})
+        return results
+
+    def match(self, query: str, threshold: float = 0.8) -> List[Dict[str, Any]]:
+        """Every candidate for ``query``: exact name, exact alias, then fuzz.ratio >= threshold."""
+        query = normalise(query)
+        if not query:
+            return []
+
+        matches = []
+        sku_id = self.by_name.get(query)
+        if sku_id is not None:
+            matches.append({"sku_id": sku_id, "sku_name": self.names[sku_id], "match_type": "exact", "confidence": 1.0})
+        for sku_id in self.alias_exact.get(query, []):
+            matches.append({"sku_id": sku_id, "sku_name": self.names[sku_id], "match_type": "alias", "confidence": 1.0})
+
+        matched = {m["sku_id"] for m in matches}
+        for _, score, idx in process.extract(
+            query, self.all_names, scorer=fuzz.ratio, score_cutoff=threshold * 100, limit=None
+        ):
+            sku_id = self.all_ids[idx]
+            if sku_id in matched:
+                continue
+            matches.append({"sku_id": sku_id, "sku_name": self.names[sku_id], "match_type": "fuzzy", "confidence": score / 100})
+
+        matches.sort(key=lambda m: m["confidence"], reverse=True)
+        return matches
+
+    def suggest(self, query: str, limit: int = SUGGESTION_LIMIT) -> List[str]:
+        """Names of SKUs whose name contains ``query``."""
+        query = normalise(query)
+        if not query:
+            return []
+        return [self.names[sku_id] for sku_id, name in zip(self.all_ids, self.all_names) if query in name][:limit]
+
+
+_index: Optional[SKUIndex] = None
+_build_lock = threading.Lock()
+
+
+def _fingerprint(db: Session) -> Tuple:
+    return tuple(
+        db.execute(
+            select(
+                select(func.count()).select_from(SKU).scalar_subquery(),
+                select(func.max(SKU.updated_at)).scalar_subquery(),
+                select(func.count()).select_from(SKUAlias).scalar_subquery(),
+                select(func.max(SKUAlias.id)).scalar_subquery(),
+                select(func.max(SKUAlias.updated_at)).scalar_subquery(),
+            )
+        ).one()
+    )
+
+
+def _build(db: Session, version: Tuple) -> SKUIndex:
+    skus = db.execute(select(SKU.id, SKU.code, SKU.name, SKU.is_active).order_by(SKU.id)).all()
+    aliases = db.execute(
+        select(SKUAlias.alias_text, SKUAlias.sku_id).order_by(SKUAlias.weight.desc(), SKUAlias.id)
+    ).all()
+    return SKUIndex(version, skus, aliases)
+
+
+def get_index(db: Session) -> SKUIndex:
+    """Current snapshot, rebuilt when the SKU or alias tables have changed."""
+    global _index
+    version = _fingerprint(db)
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _build_lock:
+        index = _index
+        if index is None or index.version != version:
+            index = _index = _build(db, version)
+        return index
+
+
+def invalidate() -> None:
+    global _index
+    _index = None
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_on_sku_write(session: Session, flush_context) -> None:
+    if any(isinstance(obj, (SKU, SKUAlias)) for obj in chain(session.new, session.dirty, session.deleted)):
+        invalidate()
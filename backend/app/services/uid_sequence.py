@@ -0,0 +1,68 @@
+"""Range allocation of UID sequence numbers
+
+Item UIDs look like ``SKU001-DRV003-20260316-007``; the two labels of a NEW
+item add ``-C1`` / ``-C2``. The sequence used to be found by counting items
+``LIKE 'prefix-%'`` for every UID, which is O(n) per label and lets two admins
+generating at the same time pick the same number.
+
+``allocate(db, prefix, count)`` reserves ``count`` consecutive numbers with one
+upsert on the prefix's ``uid_sequences`` row. The row stays locked until the
+caller commits, so concurrent allocations for a prefix queue instead of
+colliding, and a rolled-back transaction gives its block back. The first
+allocation for a prefix seeds the counter from the highest existing item UID,
+so numbers issued before the table existed are never reused.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..models import Item, UIDSequence
+
+ADMIN_OWNER = "ADMIN"
+
+
+def driver_owner(driver_id: int) -> str:
+    return f"DRV{driver_id:03d}"
+
+
+def uid_prefix(sku_id: int, owner: str, day: date) -> str:
+    return f"SKU{sku_id:03d}-{owner}-{day.strftime('%Y%m%d')}"
+
+
+def format_uid(prefix: str, seq: int) -> str:
+    return f"{prefix}-{seq:03d}"
+
+
+def _existing_max(db: Session, prefix: str) -> int:
+    head = f"{prefix}-"
+    highest = 0
+    for uid in db.execute(select(Item.uid).where(Item.uid.like(f"{head}%"))).scalars():
+        seq = uid[len(head):].split("-", 1)[0]
+        if seq.isdigit():
+            highest = max(highest, int(seq))
+    return highest
+
+
+def allocate(db: Session, prefix: str, count: int) -> range:
+    """Reserve ``count`` consecutive sequence numbers for ``prefix``. The caller commits."""
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    seq = UIDSequence.__table__
+    known = db.execute(select(seq.c.last_value).where(seq.c.prefix == prefix)).first()
+    seed = 0 if known else _existing_max(db, prefix)
+
+    insert_fn = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+    stmt = insert_fn(seq).values(prefix=prefix, last_value=seed + count)
+    # A concurrent first allocation that wins the insert is simply added to
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["prefix"],
+        set_={"last_value": seq.c.last_value + count, "updated_at": func.now()},
+    ).returning(seq.c.last_value)
+    last = db.execute(stmt).scalar_one()
+    return range(last - count + 1, last + 1)
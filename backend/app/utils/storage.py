@@ -1,39 +1,109 @@
 import os
 import uuid
+from datetime import timedelta
 from io import BytesIO
+from urllib.parse import quote
 
 from PIL import Image, ImageOps
 from firebase_admin import storage
 
+from ..core.config import settings
+
 MAX_SIDE = 1280
 MAX_BYTES = 5 * 1024 * 1024
 FIREBASE_STORAGE_BUCKET = os.getenv("FIREBASE_STORAGE_BUCKET")
 
 
+class FirebaseStorage:
+    """Public objects in the Firebase Storage bucket."""
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        blob = _bucket().blob(key)
+        blob.upload_from_string(data, content_type=content_type)
+        blob.make_public()
+        return blob.public_url
+
+    def url_for(self, key: str) -> str:
+        # Same form as Blob.public_url, known before the upload happens
+        return f"https://storage.googleapis.com/{FIREBASE_STORAGE_BUCKET}/{quote(key, safe='/~')}"
+
+
+class LocalStorage:
+    """Files under LOCAL_STORAGE_DIR, served at LOCAL_STORAGE_BASE_URL (dev and tests)."""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return self.url_for(key)
+
+    def url_for(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+_backend = None
+
+
+def get_storage():
+    """Storage backend selected by STORAGE_BACKEND (firebase | local)."""
+    global _backend
+    if _backend is None:
+        if settings.STORAGE_BACKEND == "local":
+            _backend = LocalStorage(settings.LOCAL_STORAGE_DIR, settings.LOCAL_STORAGE_BASE_URL)
+        else:
+            if not FIREBASE_STORAGE_BUCKET:
+                raise ValueError("FIREBASE_STORAGE_BUCKET environment variable is required")
+            _backend = FirebaseStorage()
+    return _backend
+
+
+def encode_jpeg(img: Image.Image, max_side: int, quality: int = 70) -> bytes:
+    """Downscale a decoded image to ``max_side`` and encode it as JPEG."""
+    variant = img.copy()
+    variant.thumbnail((max_side, max_side))
+    if variant.mode not in ("RGB", "L"):
+        variant = variant.convert("RGB")
+    out = BytesIO()
+    variant.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
 def save_pod_image(file_bytes: bytes) -> str:
     if len(file_bytes) > MAX_BYTES:
         raise ValueError("Image too large")
-    
+
     img = Image.open(BytesIO(file_bytes))
     img = ImageOps.exif_transpose(img)
-    img.thumbnail((MAX_SIDE, MAX_SIDE))
-    out = BytesIO()
-    img.save(out, format="JPEG", quality=70, optimize=True)
-    processed_bytes = out.getvalue()
-    
+    processed_bytes = encode_jpeg(img, MAX_SIDE)
+
     name = f"{uuid.uuid4().hex}.jpg"
-    
-    # ONLY use Firebase Storage - no local fallback to save Render disk space
+    return get_storage().put(f"pod-images/{name}", processed_bytes, "image/jpeg")
+
+
+def _bucket():
     if not FIREBASE_STORAGE_BUCKET:
         raise ValueError("FIREBASE_STORAGE_BUCKET environment variable is required")
-    
-    print(f"DEBUG: Using Firebase Storage bucket: {FIREBASE_STORAGE_BUCKET}")
-    bucket = storage.bucket(FIREBASE_STORAGE_BUCKET)
-    blob_path = f"pod-images/{name}"
-    blob = bucket.blob(blob_path)
-    print(f"DEBUG: Uploading to Firebase Storage path: {blob_path}")
-    blob.upload_from_string(processed_bytes, content_type="image/jpeg")
-    blob.make_public()
-    public_url = blob.public_url
-    print(f"DEBUG: Firebase Storage upload successful: {public_url}")
-    return public_url
+    from ..auth.firebase import _get_app
+
+    return storage.bucket(FIREBASE_STORAGE_BUCKET, app=_get_app())
+
+
+def upload_export(fileobj, blob_path: str, content_type: str) -> str:
+    """Upload a generated export (kept private) and return its blob path."""
+    blob = _bucket().blob(blob_path)
+    blob.upload_from_file(fileobj, content_type=content_type, rewind=True)
+    return blob_path
+
+
+def export_download_url(blob_path: str, minutes: int) -> str:
+    """Short-lived signed link to a blob written by ``upload_export``."""
+    return _bucket().blob(blob_path).generate_signed_url(
+        expiration=timedelta(minutes=minutes), version="v4", method="GET"
+    )
@@ -6,21 +6,60 @@ import time
 import traceback
 from contextlib import contextmanager
 from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
 
-from sqlalchemy import text, update
+import psycopg
+from sqlalchemy import func, text, update
 from sqlalchemy.orm import Session
 
 from .core.config import settings
-from .db import engine
+from . import db as database
 from .models import Job
+from .services.job_signal import JOBS_CHANNEL, notify_job_enqueued
 from .services.ordersvc import create_order_from_parsed
 from .services.parser import parse_whatsapp_text
 from .services.assignment_service import AssignmentService
+from .services.assignment_scheduler import request_auto_assign
+from .services.cash_export import run_cash_export_job
+from .services.document_batch import run_document_batch
+from .services.fcm import deliver_push_job
+from .services.pod_pipeline import POD_PHOTO_KIND, release_pod_photo, run_pod_photo_job
+from .services import order_balance  # noqa: F401 - registers balance invalidation on flush
 
 logger = logging.getLogger(__name__)
 
+# Job kinds whose failures are requeued with backoff until max_attempts
+RETRY_KINDS = {POD_PHOTO_KIND}
+
 stop_event = threading.Event()
-executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix="worker-bg")
+# Set by the LISTEN thread, finished jobs (or shutdown) to cut the idle wait short
+wake_event = threading.Event()
+executor = ThreadPoolExecutor(
+    max_workers=settings.WORKER_CONCURRENCY, thread_name_prefix="worker-bg"
+)
+
+# Job ids claimed by this process and not yet finished. Claims are capped by
+# free executor slots so a burst stays 'queued' for other replicas instead of
+# piling up in the executor's in-memory queue.
+_inflight: set[int] = set()
+_inflight_lock = threading.Lock()
+
+
+def free_slots() -> int:
+    with _inflight_lock:
+        return max(0, settings.WORKER_CONCURRENCY - len(_inflight))
+
+
+def inflight_ids() -> list[int]:
+    with _inflight_lock:
+        return list(_inflight)
+
+
+def _on_job_done(job_id: int, _future):
+    with _inflight_lock:
+        _inflight.discard(job_id)
+    wake_event.set()
 
 
 def _setup_logging():
@@ -30,6 +69,7 @@ def _setup_logging():
 def _handle_signal(signum, frame):
     logger.info("signal_received signal=%s", signum)
     stop_event.set()
+    wake_event.set()
 
 
 for _sig in (signal.SIGINT, signal.SIGTERM):
@@ -37,9 +77,9 @@ for _sig in (signal.SIGINT, signal.SIGTERM):
 
 @contextmanager
 def session_scope():
-    if engine is None:
+    if database.engine is None:
         raise RuntimeError("DATABASE_URL not configured for worker.")
-    session = Session(bind=engine, future=True)
+    session = Session(bind=database.engine, future=True)
     try:
         yield session
         session.commit()
@@ -78,6 +118,7 @@ def fetch_jobs(sess: Session, limit: int):
          WHERE id IN (
             SELECT id FROM jobs
              WHERE status = 'queued'
+               AND (run_at IS NULL OR run_at <= now())
              ORDER BY id
              FOR UPDATE SKIP LOCKED
              LIMIT :lim
@@ -90,10 +131,108 @@ def fetch_jobs(sess: Session, limit: int):
     return rows
 
 
-def process_job_background(job_id: int, kind: str, payload: dict, max_attempts: int):
+def seconds_until_next_job(sess: Session) -> float | None:
+    """Seconds until the earliest deferred (run_at in the future) queued job."""
+    delay = sess.execute(
+        text(
+            """
+            SELECT EXTRACT(EPOCH FROM min(run_at) - now())
+              FROM jobs
+             WHERE status = 'queued' AND run_at > now()
+        """
+        )
+    ).scalar()
+    return max(0.0, float(delay)) if delay is not None else None
+
+
+def renew_leases(sess: Session, job_ids: list[int]):
+    """Heartbeat: bump updated_at on jobs this process is still running."""
+    if not job_ids:
+        return
+    retry_db(
+        sess,
+        sess.execute,
+        update(Job)
+        .where(Job.id.in_(job_ids), Job.status == "running")
+        .values(updated_at=func.now()),
+    )
+
+
+def reap_expired_jobs(sess: Session, lease_secs: float, max_attempts: int):
+    """Return 'running' jobs whose lease ran out to the queue.
+
+    A job's lease is renewed by its owner every maintenance tick, so an expired
+    one belongs to a replica that died. Jobs that already used up
+    ``max_attempts`` are failed instead of requeued. Expired AUTO_ASSIGN
+    passes are failed and a fresh coalesced pass is requested, since only one
+    AUTO_ASSIGN may be queued at a time. Failed POD_PHOTO jobs drop their
+    staged original and release their trip slot, which would otherwise point
+    at an object never uploaded.
+    """
+    stmt = text(
+        """
+        UPDATE jobs
+           SET status = CASE WHEN attempts >= :max_attempts OR kind = 'AUTO_ASSIGN'
+                             THEN 'error' ELSE 'queued' END,
+               last_error = CASE WHEN attempts >= :max_attempts OR kind = 'AUTO_ASSIGN'
+                                 THEN 'lease expired after ' || attempts || ' attempts'
+                                 ELSE last_error END,
+               updated_at = now()
+         WHERE status = 'running'
+           AND updated_at < now() - make_interval(secs => :lease)
+        RETURNING id, kind, status, payload
+    """
+    )
+    rows = retry_db(
+        sess, sess.execute, stmt, {"lease": lease_secs, "max_attempts": max_attempts}
+    ).mappings().all()
+    if rows:
+        requeued = [r["id"] for r in rows if r["status"] == "queued"]
+        failed = [r["id"] for r in rows if r["status"] == "error"]
+        logger.warning("reap_expired_jobs requeued=%s failed=%s", requeued, failed)
+        if requeued:
+            notify_job_enqueued(sess, "REQUEUE")
+        if any(r["kind"] == "AUTO_ASSIGN" for r in rows):
+            request_auto_assign(sess, reason="lease_expired", delay_secs=0)
+        for r in rows:
+            if r["kind"] == POD_PHOTO_KIND and r["status"] == "error":
+                release_pod_photo(sess, r["payload"])
+    return rows
+
+
+def process_job_background(job_id: int, kind: str, payload: dict, max_attempts: int, attempts: int = 1):
     """Process job in background thread with fresh session"""
     logger.info("background_start id=%s kind=%s", job_id, kind)
-    
+    started = time.perf_counter()
+    with database.track_queries() as stats:
+        try:
+            _process_job(job_id, kind, payload, max_attempts, attempts)
+        finally:
+            logger.info(
+                "background_done id=%s kind=%s duration_ms=%.0f statements=%s db_ms=%.0f pool_wait_ms=%.0f",
+                job_id,
+                kind,
+                (time.perf_counter() - started) * 1000,
+                stats.statements,
+                stats.duration_ms,
+                stats.pool_wait_ms,
+            )
+
+
+def _schedule_retry(sess: Session, job_id: int, attempts: int, error: Exception):
+    """Requeue a failed job with exponential backoff (WORKER_RETRY_BACKOFF_SECS)."""
+    delay = settings.WORKER_RETRY_BACKOFF_SECS * 2 ** (attempts - 1)
+    retry_db(
+        sess,
+        sess.execute,
+        update(Job)
+        .where(Job.id == job_id)
+        .values(status="queued", run_at=func.now() + timedelta(seconds=delay), last_error=str(error)),
+    )
+    logger.warning("background_retry id=%s attempt=%s delay_secs=%.0f", job_id, attempts, delay)
+
+
+def _process_job(job_id: int, kind: str, payload: dict, max_attempts: int, attempts: int = 1):
     with session_scope() as sess:
         try:
             result = None
@@ -101,38 +240,21 @@ def process_job_background(job_id: int, kind: str, payload: dict, max_attempts:
                 text = payload.get("text", "")
                 parsed = parse_whatsapp_text(text)
                 order = retry_db(sess, create_order_from_parsed, sess, parsed)
-                
-                # Trigger auto-assignment after order creation (same as API endpoints)
-                print(f"🚀 WORKER: Starting auto-assignment for order {order.id} ({order.code})")
-                logger.info(f"🚀 WORKER: Starting auto-assignment for order {order.id} ({order.code})")
+
+                # Mark assignment dirty; bursts of orders share one debounced pass
                 try:
-                    print(f"🔍 WORKER: Creating assignment service...")
-                    assignment_service = AssignmentService(sess)
-                    
-                    print(f"🔍 WORKER: Calling auto_assign_all() with retry_db...")
-                    assignment_result = retry_db(sess, assignment_service.auto_assign_all)
-                    
-                    print(f"✅ WORKER: Auto-assignment completed for order {order.id}: {assignment_result}")
-                    logger.info(f"✅ WORKER: Auto-assignment completed for order {order.id}: {assignment_result}")
-                    
-                    if assignment_result.get('success'):
-                        assigned_count = assignment_result.get('total', 0)
-                        print(f"🎯 WORKER: Successfully assigned {assigned_count} orders including {order.id}")
-                    else:
-                        print(f"⚠️ WORKER: Assignment completed but no orders assigned: {assignment_result}")
-                        
+                    with sess.begin_nested():
+                        assignment_result = request_auto_assign(sess, reason=f"order:{order.id}")
                 except Exception as e:
-                    print(f"❌ WORKER: Auto-assignment FAILED for order {order.id}: {type(e).__name__}: {e}")
-                    logger.error(f"❌ WORKER: Auto-assignment FAILED for order {order.id}: {type(e).__name__}: {e}")
-                    import traceback
-                    print(f"🔥 WORKER: Full traceback: {traceback.format_exc()}")
-                    logger.error(f"🔥 WORKER: Full traceback: {traceback.format_exc()}")
-                    # Don't fail job if assignment fails
-                
+                    # Don't fail the job; the order still gets picked up by the next pass
+                    logger.error("auto_assign_request_failed order_id=%s error=%s", order.id, e)
+                    assignment_result = {"success": False, "error": str(e)}
+
                 result = {
                     "order_id": order.id,
                     "order_code": order.code,
                     "parsed": parsed,
+                    "assignment": assignment_result,
                 }
             elif kind == "AUTO_ASSIGN":
                 service = AssignmentService(sess)
@@ -143,6 +265,14 @@ def process_job_background(job_id: int, kind: str, payload: dict, max_attempts:
                     "message": assignment_result.get("message", ""),
                     "assignments": assignment_result.get("assigned", [])
                 }
+            elif kind == "CASH_EXPORT":
+                result = run_cash_export_job(sess, job_id, payload)
+            elif kind == "RENDER_DOCUMENTS":
+                result = run_document_batch(sess, job_id, payload)
+            elif kind == "PUSH_NOTIFY":
+                result = deliver_push_job(sess, payload)
+            elif kind == POD_PHOTO_KIND:
+                result = run_pod_photo_job(sess, payload)
             else:
                 result = {"ok": True}
             
@@ -156,7 +286,7 @@ def process_job_background(job_id: int, kind: str, payload: dict, max_attempts:
             )
             
             # Sync result back to background job if needed
-            if kind == "PARSE_CREATE" and "background_job_id" in payload:
+            if "background_job_id" in payload:
                 background_job_id = payload["background_job_id"]
                 try:
                     from .services.background_jobs import job_service
@@ -169,6 +299,12 @@ def process_job_background(job_id: int, kind: str, payload: dict, max_attempts:
             
         except Exception as e:
             logger.error("background_error id=%s error=%s", job_id, e)
+            if kind in RETRY_KINDS:
+                # Each attempt starts over; keep nothing from the failed one
+                sess.rollback()
+                if attempts < max_attempts:
+                    _schedule_retry(sess, job_id, attempts, e)
+                    return
             # Mark as failed
             retry_db(
                 sess,
@@ -177,9 +313,11 @@ def process_job_background(job_id: int, kind: str, payload: dict, max_attempts:
                 .where(Job.id == job_id)
                 .values(status="error", last_error=f"{e}\n{traceback.format_exc()}"),
             )
+            if kind == POD_PHOTO_KIND:
+                release_pod_photo(sess, payload)
             
             # Sync error back to background job if needed
-            if kind == "PARSE_CREATE" and "background_job_id" in payload:
+            if "background_job_id" in payload:
                 background_job_id = payload["background_job_id"]
                 try:
                     from .services.background_jobs import job_service
@@ -198,30 +336,134 @@ def process_one(row, sess: Session, max_attempts: int):
     logger.info("process_dispatch id=%s kind=%s attempt=%s", jid, kind, row["attempts"])
     
     # Job is already marked as "running" by fetch_jobs - no additional update needed
-    
+    with _inflight_lock:
+        _inflight.add(jid)
+
     # Dispatch to background thread - NON-BLOCKING!
-    future = executor.submit(process_job_background, jid, kind, payload, max_attempts)
+    future = executor.submit(process_job_background, jid, kind, payload, max_attempts, row["attempts"])
+    future.add_done_callback(partial(_on_job_done, jid))
     logger.info("process_dispatched id=%s", jid)
     
     # Worker immediately continues to next job - no waiting!
 
 
-def main_loop(batch_size: int, poll_secs: float, max_attempts: int):
+class JobListener(threading.Thread):
+    """LISTENs on ``JOBS_CHANNEL`` and sets ``wake_event`` for every NOTIFY.
+
+    Runs on its own autocommit psycopg connection, outside the SQLAlchemy pool.
+    ``connected`` is cleared while the connection is down so the main loop
+    drops back to fast polling until it is re-established.
+    """
+
+    def __init__(self, conninfo: str, reconnect_secs: float = 5.0):
+        super().__init__(name="worker-listen", daemon=True)
+        self.conninfo = conninfo
+        self.reconnect_secs = reconnect_secs
+        self.connected = threading.Event()
+
+    def run(self):
+        while not stop_event.is_set():
+            try:
+                with psycopg.connect(self.conninfo, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {JOBS_CHANNEL}")
+                    self.connected.set()
+                    logger.info("listen_connected channel=%s", JOBS_CHANNEL)
+                    # Anything enqueued while we were disconnected gets fetched now
+                    wake_event.set()
+                    while not stop_event.is_set():
+                        for _ in conn.notifies(timeout=1.0):
+                            wake_event.set()
+            except Exception as e:  # pragma: no cover - network failures
+                logger.warning("listen_error error=%s", e)
+            finally:
+                self.connected.clear()
+            stop_event.wait(self.reconnect_secs)
+
+
+def start_listener() -> JobListener | None:
+    """Start the NOTIFY listener when the database supports it."""
+    engine = database.engine
+    if engine is None or engine.dialect.name != "postgresql":
+        return None
+    conninfo = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    listener = JobListener(conninfo)
+    listener.start()
+    return listener
+
+
+def main_loop(
+    batch_size: int,
+    poll_secs: float,
+    max_attempts: int,
+    idle_poll_secs: float | None = None,
+    listen: bool = True,
+    lease_secs: float | None = None,
+):
+    """Fetch and dispatch jobs until stopped.
+
+    With ``listen`` enabled the loop sleeps until a producer NOTIFY arrives and
+    only polls every ``idle_poll_secs`` as a safety net. Without it (or while
+    the listener is disconnected) it polls every ``poll_secs``.
+
+    Each pass claims at most as many jobs as there are free executor slots.
+    Every ``lease_secs / 3`` it renews the leases of its in-flight jobs and
+    requeues jobs whose lease expired on a dead replica.
+    """
+    listener = start_listener() if listen else None
+    if idle_poll_secs is None:
+        idle_poll_secs = settings.WORKER_IDLE_POLL_SECS
+    if lease_secs is None:
+        lease_secs = settings.WORKER_LEASE_SECS
+    maintenance_secs = lease_secs / 3
+    last_maintenance = 0.0
     logger.info(
-        "worker_loop_start batch_size=%s poll_secs=%.2f max_attempts=%s",
+        "worker_loop_start batch_size=%s concurrency=%s poll_secs=%.2f idle_poll_secs=%.2f "
+        "lease_secs=%.0f listen=%s max_attempts=%s",
         batch_size,
+        settings.WORKER_CONCURRENCY,
         poll_secs,
+        idle_poll_secs,
+        lease_secs,
+        listener is not None,
         max_attempts,
     )
     while not stop_event.is_set():
+        wake_event.clear()
+        jobs = []
+        next_due = None
+        claim = min(batch_size, free_slots())
+        now = time.monotonic()
+        if now - last_maintenance >= maintenance_secs:
+            # Own session and schedule: a failing claim must not starve lease
+            # renewal, and a failing maintenance pass must not retry every loop
+            last_maintenance = now
+            try:
+                with session_scope() as s:
+                    renew_leases(s, inflight_ids())
+                    reap_expired_jobs(s, lease_secs, max_attempts)
+            except Exception:  # pragma: no cover - logged for visibility
+                logger.exception("worker_maintenance_error")
         with session_scope() as s:
             try:
-                jobs = fetch_jobs(s, batch_size)
-                for j in jobs:
-                    process_one(j, s, max_attempts)
+                if claim > 0:
+                    jobs = fetch_jobs(s, claim)
+                    for j in jobs:
+                        process_one(j, s, max_attempts)
+                next_due = seconds_until_next_job(s)
             except Exception:  # pragma: no cover - logged for visibility
                 logger.exception("worker_iteration_error")
-        stop_event.wait(poll_secs)
+        if claim > 0 and len(jobs) >= claim and free_slots() > 0:
+            # Backlog left over from a burst; keep draining without waiting
+            continue
+        # With no free slots, a finishing job sets wake_event
+        listening = listener is not None and listener.connected.is_set()
+        wait_secs = idle_poll_secs if listening else poll_secs
+        if next_due is not None:
+            # Deferred job (e.g. debounced AUTO_ASSIGN) comes due before the next poll
+            wait_secs = min(wait_secs, next_due)
+        wake_event.wait(min(wait_secs, maintenance_secs))
+    logger.info("worker_loop_draining inflight=%s", len(inflight_ids()))
+    executor.shutdown(wait=True)
     logger.info("worker_loop_exit")
 
 
@@ -231,7 +473,25 @@ def parse_args():
         "--poll-interval",
         type=float,
         default=settings.WORKER_POLL_SECS,
-        help="Polling interval in seconds",
+        help="Polling interval in seconds when LISTEN/NOTIFY is unavailable",
+    )
+    parser.add_argument(
+        "--idle-poll-interval",
+        type=float,
+        default=settings.WORKER_IDLE_POLL_SECS,
+        help="Safety-net polling interval in seconds while listening for NOTIFY",
+    )
+    parser.add_argument(
+        "--lease-secs",
+        type=float,
+        default=settings.WORKER_LEASE_SECS,
+        help="Seconds without a heartbeat before a running job is requeued",
+    )
+    parser.add_argument(
+        "--no-listen",
+        action="store_true",
+        default=not settings.WORKER_LISTEN_ENABLED,
+        help="Disable LISTEN/NOTIFY wake-ups and poll only",
     )
     parser.add_argument(
         "--batch-size",
@@ -251,5 +511,13 @@ def parse_args():
 if __name__ == "__main__":
     _setup_logging()
     args = parse_args()
-    logger.info("worker_starting")
-    main_loop(args.batch_size, args.poll_interval, args.max_attempts)
+    database.configure_engine("worker")
+    logger.info("worker_starting pool=%s", database.pool_status())
+    main_loop(
+        args.batch_size,
+        args.poll_interval,
+        args.max_attempts,
+        idle_poll_secs=args.idle_poll_interval,
+        listen=not args.no_listen,
+        lease_secs=args.lease_secs,
+    )